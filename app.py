@@ -1,17 +1,35 @@
 import os, requests
-from flask import Flask, jsonify, request
+import atexit
+from flask import Flask, Response, jsonify, request
 import logging
 from flask_cors import CORS
 import psycopg2
 from psycopg2 import pool
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from datetime import datetime, timedelta, timezone
 import uuid
 import json
 import jwt
 from functools import wraps
+from contextlib import contextmanager
 import threading
+import hashlib
+import base64
+import random
+import time
 from genetic_web_scraper import search_all_sources
+from ttl_cache import TTLCache
+import transcript_export
+import conversation_diagnostics
+import llm_usage
+import gemini_context_cache
+import source_retrieval
+import prompt_templates
+import llm_json
+import llm_routing
+import gemini_prewarm
+import http_compression
+from fast_json import OrjsonProvider, orjson
 from google import genai
 from google.genai import types
 
@@ -31,7 +49,7 @@ TAVUS_REPLICA_ID = os.getenv("TAVUS_REPLICA_ID")
 TAVUS_PERSONA_ID = os.getenv("TAVUS_PERSONA_ID")
 TAVUS_CALLBACK_URL = os.getenv("TAVUS_CALLBACK_URL", "")
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*")
-TAVUS_BASE = "https://tavusapi.com/v2"
+TAVUS_BASE = os.getenv("TAVUS_BASE_URL", "https://tavusapi.com/v2").rstrip("/")
 
 # Tavus Recording Configuration (optional)
 TAVUS_ENABLE_RECORDING = os.getenv("TAVUS_ENABLE_RECORDING", "false").lower() == "true"
@@ -55,14 +73,46 @@ VERTEX_PROJECT_ID = os.getenv("VERTEX_PROJECT_ID")
 VERTEX_LOCATION = os.getenv("VERTEX_LOCATION", "global")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 CUSTOM_LLM_BASE_URL = os.getenv("CUSTOM_LLM_BASE_URL")
+# Point the Gemini client at another endpoint (e.g. benchmarks/fake_upstreams.py); unset = Google's
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+# Cap on source_document text sent inline when it cannot be served from the context cache
+GEMINI_INLINE_DOCUMENT_MAX_CHARS = int(os.getenv("GEMINI_INLINE_DOCUMENT_MAX_CHARS", "32000"))
 
 # JWT Configuration
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
 JWT_EXP_HOURS = int(os.getenv("JWT_EXP_HOURS", "12"))
+JWT_CACHE_MAXSIZE = int(os.getenv("JWT_CACHE_MAXSIZE", "10000"))
+JWT_LOG_SAMPLE_RATE = float(os.getenv("JWT_LOG_SAMPLE_RATE", "0.01"))
 
 # Tavus Pre-warming Configuration
 TAVUS_CUSTOM_LLM_ENABLE = os.getenv("TAVUS_CUSTOM_LLM_ENABLE", "false").lower() == "true"
 
+# Reference Data Cache Configuration (persona test types, classification types)
+REFERENCE_DATA_TTL_SEC = int(os.getenv("REFERENCE_DATA_TTL_SEC", "3600"))
+REFERENCE_DATA_MAX_AGE_SEC = int(os.getenv("REFERENCE_DATA_MAX_AGE_SEC", "300"))
+
+# Email -> user id cache (populated at login, read on call start)
+USER_ID_CACHE_TTL_SEC = int(os.getenv("USER_ID_CACHE_TTL_SEC", "3600"))
+USER_ID_CACHE_MAXSIZE = int(os.getenv("USER_ID_CACHE_MAXSIZE", "10000"))
+
+# Transcript export: emails allowed to export their whole company (scope=company)
+EXPORT_ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("EXPORT_ADMIN_EMAILS", "").split(",") if e.strip()}
+
+# Response encoding: JSON provider (orjson | default) and negotiated gzip/brotli compression
+JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson").lower()
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))  # 0 disables compression
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "4"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_BROTLI_ENABLED = os.getenv("COMPRESSION_BROTLI_ENABLED", "true").lower() == "true"
+
+if JSON_PROVIDER == "orjson" and orjson is not None:
+    app.json = OrjsonProvider(app)
+if COMPRESSION_MIN_BYTES > 0:
+    http_compression.init_app(
+        app, COMPRESSION_MIN_BYTES, COMPRESSION_GZIP_LEVEL,
+        COMPRESSION_BROTLI_QUALITY, COMPRESSION_BROTLI_ENABLED,
+    )
+
 # Log environment variables at startup (sanitized)
 app.logger.info("=" * 60)
 app.logger.info("ENVIRONMENT VARIABLES AT STARTUP")
@@ -80,13 +130,29 @@ app.logger.info(f"COMPANY_ID: {COMPANY_ID}")
 app.logger.info(f"LLM_PROVIDER: {LLM_PROVIDER}")
 app.logger.info(f"GEMINI_API_MODE: {GEMINI_API_MODE}")
 app.logger.info(f"GEMINI_MODEL: {GEMINI_MODEL}")
+if GEMINI_BASE_URL:
+    app.logger.info(f"GEMINI_BASE_URL: {GEMINI_BASE_URL}")
+app.logger.info(f"GEMINI_CONTEXT_CACHE_ENABLED: {gemini_context_cache.CONTEXT_CACHE_ENABLED} "
+                f"(ttl={gemini_context_cache.CONTEXT_CACHE_TTL_SEC}s, min_chars={gemini_context_cache.CONTEXT_CACHE_MIN_CHARS})")
+app.logger.info(f"LLM_RESPONSE_SCHEMA_ENABLED: {llm_json.RESPONSE_SCHEMA_ENABLED} "
+                f"(max_output_tokens basic={llm_json.max_output_tokens('basic')} detailed={llm_json.max_output_tokens('detailed')} "
+                f"full={llm_json.max_output_tokens('full')})")
+if TAVUS_BASE != "https://tavusapi.com/v2":
+    app.logger.info(f"TAVUS_BASE_URL: {TAVUS_BASE}")
 app.logger.info(f"VERTEX_PROJECT_ID: {VERTEX_PROJECT_ID or 'NOT SET'}")
 app.logger.info(f"VERTEX_LOCATION: {VERTEX_LOCATION}")
 app.logger.info(f"GOOGLE_API_KEY: {'SET' if GOOGLE_API_KEY else 'NOT SET'}")
 app.logger.info(f"CUSTOM_LLM_BASE_URL: {CUSTOM_LLM_BASE_URL or 'NOT SET'}")
 app.logger.info(f"JWT_SECRET: {'SET' if JWT_SECRET and JWT_SECRET != 'your-secret-key-change-in-production' else 'NOT SET'}")
 app.logger.info(f"JWT_EXP_HOURS: {JWT_EXP_HOURS}")
+app.logger.info(f"JWT_CACHE_MAXSIZE: {JWT_CACHE_MAXSIZE} (log sample rate={JWT_LOG_SAMPLE_RATE})")
 app.logger.info(f"TAVUS_CUSTOM_LLM_ENABLE: {TAVUS_CUSTOM_LLM_ENABLE}")
+app.logger.info(f"REFERENCE_DATA_TTL_SEC: {REFERENCE_DATA_TTL_SEC} (Cache-Control max-age={REFERENCE_DATA_MAX_AGE_SEC})")
+app.logger.info(f"USER_ID_CACHE_TTL_SEC: {USER_ID_CACHE_TTL_SEC} (maxsize={USER_ID_CACHE_MAXSIZE})")
+app.logger.info(f"EXPORT_ADMIN_EMAILS: {len(EXPORT_ADMIN_EMAILS)} configured")
+app.logger.info(f"JSON_PROVIDER: {type(app.json).__name__}" + (" (orjson not installed)" if JSON_PROVIDER == "orjson" and orjson is None else ""))
+app.logger.info(f"COMPRESSION_MIN_BYTES: {COMPRESSION_MIN_BYTES} (gzip level={COMPRESSION_GZIP_LEVEL}, "
+                f"brotli quality={COMPRESSION_BROTLI_QUALITY}, brotli={'on' if COMPRESSION_BROTLI_ENABLED and http_compression.brotli else 'off'})")
 if DB_CONNECTION_STRING:
     # Sanitize connection string for logging
     sanitized = DB_CONNECTION_STRING.split('@')[1] if '@' in DB_CONNECTION_STRING else 'MALFORMED'
@@ -96,28 +162,93 @@ else:
 app.logger.info("=" * 60)
 
 # Database Connection Pool
+# Sized per worker process. gunicorn.conf.py derives DB_POOL_MAXCONN from the
+# worker model (threads or greenlets per worker), capped by DB_MAX_CONNECTIONS
+# across workers. When the cap leaves fewer connections than in-flight requests,
+# getconn() waits up to DB_POOL_TIMEOUT_SEC for one instead of raising PoolError.
+# ThreadedConnectionPool is required for the gthread and gevent workers;
+# SimpleConnectionPool is not thread-safe.
+DB_POOL_MINCONN = int(os.getenv("DB_POOL_MINCONN", "1"))
+DB_POOL_MAXCONN = int(os.getenv("DB_POOL_MAXCONN", "10"))
+DB_POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT_SEC", "30"))
+
+class BlockingConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool whose getconn() waits for a free connection (PoolError after timeout)"""
+
+    def __init__(self, minconn: int, maxconn: int, *args, timeout: float = DB_POOL_TIMEOUT_SEC, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        # threading primitives are cooperative under gevent's monkey patching
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._timeout = timeout
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise psycopg2.pool.PoolError(f"no database connection free within {self._timeout:g}s")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        super().putconn(conn, key, close)
+        self._slots.release()
+
 db_pool = None
-if DB_CONNECTION_STRING:
+_db_pool_pid = None
+
+def init_db_pool():
+    """
+    Create the connection pool for the current process.
+    Safe to call more than once: a pool inherited across fork() (gunicorn
+    preload_app) is replaced so workers never share a server connection.
+    """
+    global db_pool, _db_pool_pid
+    if not DB_CONNECTION_STRING:
+        app.logger.warning("⚠️  DB_CONNECTION_STRING not set - database endpoints will not work")
+        return None
+    if db_pool is not None and _db_pool_pid == os.getpid():
+        return db_pool
     try:
         app.logger.info("Attempting to create database connection pool...")
-        db_pool = psycopg2.pool.SimpleConnectionPool(1, 10, DB_CONNECTION_STRING)
-        app.logger.info("✅ Database connection pool created successfully (min=1, max=10)")
+        db_pool = BlockingConnectionPool(DB_POOL_MINCONN, DB_POOL_MAXCONN, DB_CONNECTION_STRING)
+        _db_pool_pid = os.getpid()
+        app.logger.info(f"✅ Database connection pool created successfully (min={DB_POOL_MINCONN}, max={DB_POOL_MAXCONN}, pid={_db_pool_pid})")
     except Exception as e:
+        db_pool = None
         app.logger.error(f"❌ Failed to create database connection pool: {e}")
         app.logger.error(f"Error type: {type(e).__name__}")
-else:
-    app.logger.warning("⚠️  DB_CONNECTION_STRING not set - database endpoints will not work")
+    return db_pool
+
+def close_db_pool():
+    """Close every pooled connection (used by the gunicorn master before forking workers)"""
+    global db_pool, _db_pool_pid
+    if db_pool is not None:
+        try:
+            db_pool.closeall()
+            app.logger.info("🔌 Database connection pool closed (pid=%s)", os.getpid())
+        except Exception as e:
+            app.logger.warning(f"⚠️  Error closing database connection pool: {e}")
+    db_pool = None
+    _db_pool_pid = None
+
+init_db_pool()
 
 def log_pool_status():
     """Log current connection pool statistics for debugging"""
     if not db_pool:
         return
     try:
-        # Note: SimpleConnectionPool doesn't expose metrics directly, but we can log attempts
+        # Note: psycopg2 pools don't expose metrics directly, but we can log attempts
         app.logger.debug("📊 Connection pool status requested")
     except Exception as e:
         app.logger.error(f"Error checking pool status: {e}")
 
+reference_cache = TTLCache(maxsize=8, ttl=REFERENCE_DATA_TTL_SEC)
+user_id_cache = TTLCache(maxsize=USER_ID_CACHE_MAXSIZE, ttl=USER_ID_CACHE_TTL_SEC)
+# Verified JWT payloads keyed by token digest; each entry lives until the token's exp
+jwt_cache = TTLCache(maxsize=JWT_CACHE_MAXSIZE, ttl=JWT_EXP_HOURS * 3600)
+
 HEADERS = {"Content-Type": "application/json"}
 if TAVUS_API_KEY:
     HEADERS["x-api-key"] = TAVUS_API_KEY
@@ -128,7 +259,8 @@ CORS(
         r"/*": {"origins": CORS_ORIGINS},
     },
     methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization"],  # Allow Authorization header for JWT
+    allow_headers=["Content-Type", "Authorization", "If-None-Match"],  # Allow Authorization header for JWT
+    expose_headers=["ETag"],
     supports_credentials=True,  # Enable for auth
 )
 
@@ -139,6 +271,43 @@ def _log_request():
     except Exception:
         pass
 
+# ============================================================================
+# HTTP CACHING HELPERS
+# ============================================================================
+def compute_etag(body) -> str:
+    """Strong ETag value for a response body (str or bytes)"""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.sha256(body).hexdigest()[:32]
+
+def conditional_json_response(body: str, etag: str, cache_control: str):
+    """
+    JSON response carrying a strong ETag; returns 304 Not Modified when the
+    request's If-None-Match already matches
+    """
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response.make_conditional(request)
+
+def etag_matches(etag: str) -> bool:
+    """Does the request's If-None-Match already name this ETag?"""
+    return request.if_none_match.contains_weak(etag)
+
+def with_etag(response, etag: str, cache_control: str):
+    """Attach a strong ETag and Cache-Control to a response"""
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+def not_modified_response(etag: str, cache_control: str):
+    """304 for a client whose copy is current - the payload is never queried or serialized"""
+    return with_etag(app.response_class(status=304), etag, cache_control)
+
+def raw_json_response(body: str, status: int = 200):
+    """Response for JSON text that is already serialized (e.g. a JSONB column read as ::text)"""
+    return app.response_class(body, status=status, mimetype="application/json")
+
 # ============================================================================
 # JWT HELPER FUNCTIONS
 # ============================================================================
@@ -154,13 +323,63 @@ def create_jwt_token(user_id: str, email: str, company_id: str = None) -> str:
     return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
 
 def decode_jwt_token(token: str) -> dict:
-    """Decode and validate JWT token"""
+    """
+    Decode and validate JWT token.
+    Verified payloads are cached by token digest until their exp, so repeat requests
+    (e.g. transcript polling) skip signature verification.
+    """
+    cache_key = hashlib.sha256(token.encode()).digest()
+    cached = jwt_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached)
     try:
-        return jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
     except jwt.ExpiredSignatureError:
         raise ValueError("Token has expired")
     except jwt.InvalidTokenError:
         raise ValueError("Invalid token")
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        # Non-positive remaining lifetime is ignored by TTLCache.set
+        jwt_cache.set(cache_key, payload, ttl=exp - time.time())
+    return dict(payload)
+
+def resolve_jwt_payload(auth_header: str, optional: bool = False, endpoint: str = None):
+    """
+    Authenticate a raw Authorization header value.
+    Shared by jwt_required and the async handlers in asgi.py.
+    Returns (payload, error_message); error_message is set only when the request must be rejected with 401.
+    """
+    token = None
+    if auth_header and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ')[1]
+
+    if not token:
+        if not optional:
+            app.logger.warning("jwt:missing_token endpoint=%s", endpoint)
+            return None, "No token provided"
+        # Optional: continue without user info
+        return None, None
+
+    try:
+        payload = decode_jwt_token(token)
+        if random.random() < JWT_LOG_SAMPLE_RATE:
+            app.logger.info("jwt:valid user_id=%s email=%s endpoint=%s (sampled)", payload.get('sub'), payload.get('email'), endpoint)
+        return payload, None
+    except ValueError as e:
+        if not optional:
+            app.logger.warning("jwt:invalid_token error=%s", str(e))
+            return None, str(e)
+        # Optional + expired: decode without expiry check to still get user_id for context loading
+        if "expired" in str(e).lower():
+            try:
+                payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"], options={"verify_exp": False})
+                app.logger.info("jwt:expired_grace user_id=%s email=%s (token expired but user_id recovered for context)", payload.get('sub'), payload.get('email'))
+                return payload, None
+            except Exception:
+                pass
+        # Optional: continue without user info
+        return None, None
 
 def jwt_required(optional=False):
     """
@@ -170,66 +389,63 @@ def jwt_required(optional=False):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            token = None
-            auth_header = request.headers.get('Authorization')
-            
-            if auth_header and auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-            
-            if not token:
-                if not optional:
-                    app.logger.warning("jwt:missing_token endpoint=%s", request.path)
-                    return jsonify({"error": "unauthorized", "message": "No token provided"}), 401
-                # Optional: continue without user info
-                return f(None, *args, **kwargs)
-            
-            try:
-                payload = decode_jwt_token(token)
-                app.logger.info("jwt:valid user_id=%s email=%s", payload.get('sub'), payload.get('email'))
-                return f(payload, *args, **kwargs)
-            except ValueError as e:
-                if not optional:
-                    app.logger.warning("jwt:invalid_token error=%s", str(e))
-                    return jsonify({"error": "unauthorized", "message": str(e)}), 401
-                # Optional + expired: decode without expiry check to still get user_id for context loading
-                if "expired" in str(e).lower():
-                    try:
-                        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"], options={"verify_exp": False})
-                        app.logger.info("jwt:expired_grace user_id=%s email=%s (token expired but user_id recovered for context)", payload.get('sub'), payload.get('email'))
-                        return f(payload, *args, **kwargs)
-                    except Exception:
-                        pass
-                # Optional: continue without user info
-                return f(None, *args, **kwargs)
+            payload, error = resolve_jwt_payload(request.headers.get('Authorization'), optional, request.path)
+            if error:
+                return jsonify({"error": "unauthorized", "message": error}), 401
+            return f(payload, *args, **kwargs)
         return decorated_function
     return decorator
 
 # ============================================================================
 # GEMINI LLM FUNCTION
 # ============================================================================
-_gemini_client = None
+_gemini_clients = {}  # Vertex location (None = VERTEX_LOCATION) -> genai.Client
+
+# Explicit Gemini caches for COUNSELOR_SYSTEM_INSTRUCTION + source document (see GEMINI_CONTEXT_CACHE.md)
+llm_context_cache = gemini_context_cache.GeminiContextCache(lambda: _get_gemini_client(), GEMINI_MODEL)
+
+# Model per call class (fast / strong) with timeout fallback to another model or region (see LLM_ROUTING.md)
+llm_router = llm_routing.Router(GEMINI_MODEL, vertex=GEMINI_API_MODE != "public")
+app.logger.info(f"GEMINI_ROUTES: {llm_router.describe()}")
+
+# Clients, credentials and connections primed per worker before the first user call (see GEMINI_PREWARM.md)
+gemini_prewarmer = gemini_prewarm.GeminiPrewarmer(
+    lambda location: _get_gemini_client(location),
+    lambda: [target for chain in llm_router.chains.values() for target in chain],
+    lambda: call_custom_llm("Reply with OK.", max_tokens=8, call_site="prewarm"),
+)
+
+# Token/cost counters per call site; flushed to gencom.llm_usage_daily from each worker
+llm_usage_tracker = llm_usage.UsageTracker(lambda: db_pool)
+atexit.register(llm_usage_tracker.flush)
+
+def _get_gemini_client(location: str = None):
+    """Shared client for VERTEX_LOCATION, or for another Vertex region (routing fallback)"""
+    client = _gemini_clients.get(location)
+    if client is not None:
+        return client
 
-def _get_gemini_client():
-    global _gemini_client
-    if _gemini_client is not None:
-        return _gemini_client
+    http_options = types.HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None
 
     if GEMINI_API_MODE == "public":
         if not GOOGLE_API_KEY:
             raise ValueError("GOOGLE_API_KEY not set for public Gemini mode")
-        _gemini_client = genai.Client(api_key=GOOGLE_API_KEY)
+        client = genai.Client(api_key=GOOGLE_API_KEY, http_options=http_options)
     else:
         if not VERTEX_PROJECT_ID:
             raise ValueError("VERTEX_PROJECT_ID not set for Vertex Gemini mode")
-        _gemini_client = genai.Client(
+        client = genai.Client(
             vertexai=True,
             project=VERTEX_PROJECT_ID,
-            location=VERTEX_LOCATION,
+            location=location or VERTEX_LOCATION,
+            http_options=http_options,
         )
 
-    return _gemini_client
+    _gemini_clients[location] = client
+    return client
 
-def _build_gemini_config(max_tokens: int, system_instruction: str | None = None, response_format: str = None):
+def _build_gemini_config(max_tokens: int, system_instruction: str | None = None, response_format: str = None,
+                         response_schema=None):
     config = types.GenerateContentConfig(
         temperature=1.0,
         top_p=0.95,
@@ -246,22 +462,22 @@ def _build_gemini_config(max_tokens: int, system_instruction: str | None = None,
     if system_instruction:
         config.system_instruction = system_instruction
     
-    if response_format == "json":
+    if response_format == "json" or response_schema:
         config.response_mime_type = "application/json"
+    if response_schema and llm_json.RESPONSE_SCHEMA_ENABLED:
+        config.response_schema = llm_json.response_schema(response_schema)
 
     return config
 
-def call_custom_llm(user_message: str, conversation_id: str = None, max_tokens: int = 1024, stream: bool = False, response_format: str = None):
+def _prepare_gemini_request(user_message: str, conversation_id: str, max_tokens: int, stream: bool, response_format: str,
+                            system_instruction: str = None, context_document: str = None, cached_content: str = None,
+                            response_schema=None, timeout_sec: float = None):
     """
-    Call Gemini 3 Flash Preview using google-genai SDK.
-    Returns an OpenAI-style payload to preserve existing callers.
-    
-    Args:
-        user_message: The prompt to send to Gemini
-        conversation_id: Optional conversation tracking ID
-        max_tokens: Max output tokens (default 1024, increased from 512)
-        stream: Not implemented (raises error if True)
-        response_format: If "json", forces Gemini to return valid JSON via response_mime_type
+    Validate settings and build (contents, config) for a Gemini generate_content call.
+
+    With cached_content the system instruction and context document already live in that cache
+    and only the per-call message is sent. Without it they are sent inline in the same order
+    (system instruction, document, message), so the prompt prefix stays identical across calls.
     """
     if LLM_PROVIDER.lower() != "gemini":
         raise ValueError("LLM_PROVIDER must be set to 'gemini'")
@@ -273,31 +489,229 @@ def call_custom_llm(user_message: str, conversation_id: str = None, max_tokens:
     if not conversation_id:
         conversation_id = str(uuid.uuid4())
 
-    app.logger.info(f"🤖 gemini:call conversation_id={conversation_id} json_mode={response_format == 'json'}")
-    app.logger.info(f"🤖 gemini:prompt_length={len(user_message)} chars")
+    if max_tokens is None:
+        max_tokens = llm_json.max_output_tokens(response_schema) if response_schema else 1024
+    schema_name = response_schema if isinstance(response_schema, str) else ",".join(response_schema or []) or "none"
+    app.logger.info(f"🤖 gemini:call conversation_id={conversation_id} json_mode={response_format == 'json' or bool(response_schema)} "
+                    f"schema={schema_name} max_output_tokens={max_tokens}")
+    app.logger.info(f"🤖 gemini:prompt_length={len(user_message)} chars context_cache={cached_content or 'none'}")
+
+    parts = [{"text": user_message}]
+    if cached_content:
+        config = _build_gemini_config(max_tokens=max_tokens, response_format=response_format, response_schema=response_schema)
+        config.cached_content = cached_content
+    else:
+        config = _build_gemini_config(max_tokens=max_tokens, system_instruction=system_instruction, response_format=response_format,
+                                      response_schema=response_schema)
+        if context_document:
+            parts.insert(0, {"text": context_document[:GEMINI_INLINE_DOCUMENT_MAX_CHARS]})
+    if timeout_sec:
+        config.http_options = types.HttpOptions(timeout=int(timeout_sec * 1000))
+    contents = [{"role": "user", "parts": parts}]
+    return contents, config
+
+def _usage_from_response(response) -> dict:
+    """OpenAI-style token usage from a Gemini response's usage_metadata (zeros when absent)"""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = (usage.prompt_token_count if usage else None) or 0
+    completion_tokens = (usage.candidates_token_count if usage else None) or 0
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": (usage.total_token_count if usage else None) or prompt_tokens + completion_tokens,
+        "cached_tokens": (usage.cached_content_token_count if usage else None) or 0,
+        # thoughts_token_count only exists in newer google-genai releases
+        "thoughts_tokens": getattr(usage, "thoughts_token_count", None) or 0,
+    }
 
-    client = _get_gemini_client()
-    contents = [{"role": "user", "parts": [{"text": user_message}]}]
-    config = _build_gemini_config(max_tokens=max_tokens, response_format=response_format)
+def _record_llm_usage(call_site: str, usage: dict | None, started: float, ok: bool, target: llm_routing.Target):
+    """Add one Gemini call to the per-site token/cost counters (llm_usage.py) and log it"""
+    latency_ms = (time.perf_counter() - started) * 1000
+    llm_usage_tracker.record(call_site, target.model, usage, latency_ms, ok=ok)
+    if ok:
+        gemini_prewarmer.observe_call(call_site, latency_ms)
+    usage = usage or {}
+    app.logger.info(
+        f"📊 gemini:usage site={call_site} route={target.label} ok={ok} prompt={usage.get('prompt_tokens', 0)} "
+        f"cached={usage.get('cached_tokens', 0)} output={usage.get('completion_tokens', 0)} "
+        f"thoughts={usage.get('thoughts_tokens', 0)} latency={latency_ms:.0f}ms"
+    )
 
-    try:
-        response = client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=contents,
-            config=config,
-        )
+def _uses_context_cache(target: llm_routing.Target, context_document: str | None) -> bool:
+    """Explicit caches belong to one model and region: only the primary target uses them"""
+    return bool(context_document) and not target.fallback
+
+def _gemini_request(target: llm_routing.Target, request: dict, cached_content: str = None) -> dict:
+    """generate_content kwargs (model, contents, config) for one attempt at a routing target"""
+    contents, config = _prepare_gemini_request(**request, cached_content=cached_content, timeout_sec=target.timeout_sec)
+    return {"model": target.model, "contents": contents, "config": config}
+
+def _context_cache_rejected(cached_content: str | None, error: Exception) -> bool:
+    """True (after forgetting the cache) when the call failed because its explicit cache is gone"""
+    if not (cached_content and gemini_context_cache.is_cache_error(error)):
+        return False
+    # The cache expired or was deleted server-side: forget it so the retry sends everything inline
+    app.logger.warning(f"⚠️  gemini:context_cache {cached_content} rejected ({error}) - retrying inline")
+    llm_context_cache.invalidate(cached_content)
+    return True
+
+def _gemini_served(call_site: str, target: llm_routing.Target, response, started: float, mode: str = "") -> dict:
+    """Record a served attempt and build the OpenAI-style payload callers expect"""
+    text = response.text or ""
+    app.logger.info(f"✅ gemini:response_length={len(text)} chars{mode}")
+    usage = _usage_from_response(response)
+    _record_llm_usage(call_site, usage, started, ok=True, target=target)
+    llm_router.record(target, "served")
+    return {
+        "choices": [
+            {"message": {"content": text}}
+        ],
+        "usage": usage,
+        "model": target.model,
+        "route": target.label
+    }
+
+def _gemini_failed(call_site: str, chain: tuple, attempt: int, error: Exception, started: float) -> bool:
+    """Record a failed attempt; True when the next target of the chain should take the call"""
+    target = chain[attempt - 1]
+    _record_llm_usage(call_site, None, started, ok=False, target=target)
+    if attempt < len(chain) and llm_routing.should_fall_back(error):
+        llm_router.record(target, "fell_back")
+        app.logger.warning(f"⏱️  gemini:route {target.label} failed ({type(error).__name__}: {error}) "
+                           f"- falling back to {chain[attempt].label}")
+        return True
+    llm_router.record(target, "failed")
+    app.logger.error(f"❌ gemini:error {type(error).__name__}: {error}")
+    return False
+
+def call_custom_llm(user_message: str, conversation_id: str = None, max_tokens: int = None, stream: bool = False, response_format: str = None, call_site: str = "other",
+                    system_instruction: str = None, context_document: str = None, response_schema=None):
+    """
+    Call Gemini (the model routed for call_site) using google-genai SDK.
+    Returns an OpenAI-style payload to preserve existing callers.
+    
+    Args:
+        user_message: The prompt to send to Gemini
+        conversation_id: Optional conversation tracking ID
+        max_tokens: Max output tokens (default: llm_json.max_output_tokens(response_schema), else 1024)
+        stream: Not implemented (raises error if True)
+        response_format: If "json", forces Gemini to return valid JSON via response_mime_type
+        call_site: Which feature made the call (llm_usage.CALL_SITES), for token/cost accounting
+            and model routing (llm_routing.tier_for). Timeouts, 429 and 5xx fall back along the
+            tier's chain; the payload's "route" names the target that answered
+        system_instruction: Shared preamble (e.g. COUNSELOR_SYSTEM_INSTRUCTION)
+        context_document: Grounding text; cached together with system_instruction via
+            gemini_context_cache when possible, otherwise sent inline ahead of user_message
+        response_schema: llm_json schema name ("basic", "detailed", "full") or list of fields;
+            Gemini then returns JSON with exactly those fields (implies JSON mode)
+    """
+    chain = llm_router.chain(call_site, response_schema)
+    request = dict(user_message=user_message, conversation_id=conversation_id, max_tokens=max_tokens, stream=stream,
+                   response_format=response_format, system_instruction=system_instruction,
+                   context_document=context_document, response_schema=response_schema)
+    for attempt, target in enumerate(chain, 1):
+        client = _get_gemini_client(target.location)
+        cached_content = (llm_context_cache.get(system_instruction, context_document, model=target.model)
+                          if _uses_context_cache(target, context_document) else None)
+        generate = _gemini_request(target, request, cached_content)
+
+        started = time.perf_counter()
+        try:
+            try:
+                response = client.models.generate_content(**generate)
+            except Exception as e:
+                if not _context_cache_rejected(cached_content, e):
+                    raise
+                response = client.models.generate_content(**_gemini_request(target, request))
+            return _gemini_served(call_site, target, response, started)
+        except Exception as e:
+            if _gemini_failed(call_site, chain, attempt, e, started):
+                continue
+            raise
 
-        text = response.text or ""
-        app.logger.info(f"✅ gemini:response_length={len(text)} chars")
+async def call_custom_llm_async(user_message: str, conversation_id: str = None, max_tokens: int = None, stream: bool = False, response_format: str = None, call_site: str = "other",
+                                system_instruction: str = None, context_document: str = None, response_schema=None):
+    """
+    Async variant of call_custom_llm using the SDK's client.aio surface.
+    Used by asgi.py so a waiting Gemini call holds no thread.
+    """
+    chain = llm_router.chain(call_site, response_schema)
+    request = dict(user_message=user_message, conversation_id=conversation_id, max_tokens=max_tokens, stream=stream,
+                   response_format=response_format, system_instruction=system_instruction,
+                   context_document=context_document, response_schema=response_schema)
+    for attempt, target in enumerate(chain, 1):
+        client = _get_gemini_client(target.location)
+        cached_content = (await llm_context_cache.aget(system_instruction, context_document, model=target.model)
+                          if _uses_context_cache(target, context_document) else None)
+        generate = _gemini_request(target, request, cached_content)
+
+        started = time.perf_counter()
+        try:
+            try:
+                response = await client.aio.models.generate_content(**generate)
+            except Exception as e:
+                if not _context_cache_rejected(cached_content, e):
+                    raise
+                response = await client.aio.models.generate_content(**_gemini_request(target, request))
+            return _gemini_served(call_site, target, response, started, mode=" (async)")
+        except Exception as e:
+            if _gemini_failed(call_site, chain, attempt, e, started):
+                continue
+            raise
 
-        return {
-            "choices": [
-                {"message": {"content": text}}
-            ]
-        }
+def _repair_request(ai_content: str, schema: str, gene: str, mutation: str, classification: str):
+    """(data, missing, repair call kwargs or None) for an analysis answer; see parse_analysis"""
+    data, missing = llm_json.parse(ai_content, schema)
+    if not missing:
+        return data, missing, None
+    app.logger.warning(f"🩹 llm_json:repair schema={schema} missing={','.join(missing)}")
+    return data, missing, {
+        "user_message": llm_json.repair_prompt(gene, mutation, classification, data, missing),
+        "stream": False,
+        "response_format": "json",
+        "response_schema": missing,
+        "call_site": "repair",
+        "system_instruction": COUNSELOR_SYSTEM_INSTRUCTION,
+    }
+
+@contextmanager
+def _repair_call(ai_content: str):
+    """Turn a failed repair call into the LLMResponseError the analysis endpoints answer with"""
+    try:
+        yield
     except Exception as e:
-        app.logger.error(f"❌ gemini:error {type(e).__name__}: {e}")
-        raise
+        raise llm_json.LLMResponseError(f"Repair call failed: {e}", ai_content) from e
+
+def _merge_repair(ai_content: str, data: dict, missing: list, repair_response: dict) -> dict:
+    choices = repair_response.get("choices") or [{}]
+    still_missing = llm_json.merge_repair(data, missing, choices[0].get("message", {}).get("content", ""))
+    if still_missing:
+        raise llm_json.LLMResponseError(f"The AI response is missing {', '.join(still_missing)}", ai_content)
+    app.logger.info(f"✅ llm_json:repaired {','.join(missing)}")
+    return data
+
+def parse_analysis(ai_content: str, schema: str, gene: str, mutation: str, classification: str) -> dict:
+    """
+    The fields of an analysis answer for schema "basic", "detailed" or "full" (llm_json.parse).
+    Fences, trailing text and truncation are tolerated; fields that are still missing are asked
+    for in one small repair call rather than regenerating the whole analysis.
+    Raises llm_json.LLMResponseError when the answer cannot be used.
+    """
+    data, missing, repair = _repair_request(ai_content, schema, gene, mutation, classification)
+    if not repair:
+        return data
+    with _repair_call(ai_content):
+        repair_response = call_custom_llm(**repair)
+    return _merge_repair(ai_content, data, missing, repair_response)
+
+async def parse_analysis_async(ai_content: str, schema: str, gene: str, mutation: str, classification: str) -> dict:
+    """Async twin of parse_analysis (asgi.py)"""
+    data, missing, repair = _repair_request(ai_content, schema, gene, mutation, classification)
+    if not repair:
+        return data
+    with _repair_call(ai_content):
+        repair_response = await call_custom_llm_async(**repair)
+    return _merge_repair(ai_content, data, missing, repair_response)
 
 def prewarm_custom_llm():
     """
@@ -328,8 +742,14 @@ def prewarm_custom_llm():
 
 def resolve_system_user_id(email: str):
     """
-    Resolve system user ID from email by querying public.users table
+    Resolve system user ID from email by querying public.users table.
+    Mappings are cached (filled here and at login); misses are not cached.
     """
+    cached_id = user_id_cache.get(email)
+    if cached_id:
+        app.logger.info(f"✅ resolve_user:cache_hit email={email} user_id={cached_id}")
+        return cached_id
+
     if not db_pool:
         return None
     
@@ -341,6 +761,7 @@ def resolve_system_user_id(email: str):
             result = cur.fetchone()
             if result:
                 app.logger.info(f"✅ resolve_user:found email={email} user_id={result['id']}")
+                user_id_cache.set(email, str(result['id']))
                 return str(result['id'])
             app.logger.warning(f"⚠️  resolve_user:not_found email={email}")
             return None
@@ -351,6 +772,337 @@ def resolve_system_user_id(email: str):
         if conn:
             db_pool.putconn(conn)
 
+# ============================================================================
+# SHARED QUERIES AND PROMPTS
+# Used by the Flask endpoints below and the async handlers in asgi.py
+# ============================================================================
+GENETIC_INFO_SQL = '''
+    SELECT 
+        bi.gene,
+        bi.mutation,
+        ct.classification_type
+    FROM gencom.base_information bi
+    JOIN gencom.classification_type ct 
+        ON bi.classification_type_id = ct.classification_type_id
+    WHERE bi.user_id = %s
+'''
+
+# Fetched only when an analysis has to be generated: the scraped document can be ~100 KB.
+# source_index is its BM25 index (source_retrieval.py, database_migration_source_index.sql)
+SOURCE_DOCUMENT_SQL = '''
+    SELECT source_document, source_index
+    FROM gencom.base_information
+    WHERE user_id = %s
+'''
+
+# The cached_analysis* columns are JSONB (database_migration_jsonb_cached_analysis.sql).
+# Cache reads select ::text and hand the stored JSON straight to the response body;
+# writes pass json.dumps() text and cast it with ::jsonb.
+# cache_etag versions the stored analysis for If-None-Match (see ANALYSIS_CACHE_CONTROL)
+# Each analysis is stored with the fingerprint of the prompt template that produced it and only
+# read back while that template is current (database_migration_prompt_versions.sql).
+# Params: (user_id, *_PROMPT_FINGERPRINT)
+BASIC_CACHE_SQL = '''
+    SELECT cached_analysis_basic::text AS cached_analysis_basic, analysis_cached_at,
+           md5(cached_analysis_basic::text) AS cache_etag
+    FROM gencom.base_information
+    WHERE user_id = %s 
+      AND cached_analysis_basic IS NOT NULL
+      AND cached_analysis_basic_prompt = %s
+'''
+
+DETAILED_CACHE_SQL = '''
+    SELECT cached_analysis_detailed::text AS cached_analysis_detailed,
+           md5(cached_analysis_detailed::text) AS cache_etag
+    FROM gencom.base_information
+    WHERE user_id = %s 
+      AND cached_analysis_detailed IS NOT NULL
+      AND cached_analysis_detailed_prompt = %s
+'''
+
+FULL_CACHE_SQL = '''
+    SELECT cached_analysis::text AS cached_analysis, analysis_cached_at,
+           md5(cached_analysis::text) AS cache_etag
+    FROM gencom.base_information
+    WHERE user_id = %s 
+      AND cached_analysis IS NOT NULL
+      AND cached_analysis_prompt = %s
+'''
+
+# Params: (analysis json, *_PROMPT_FINGERPRINT, user_id)
+UPDATE_BASIC_CACHE_SQL = '''
+    UPDATE gencom.base_information
+    SET cached_analysis_basic = %s::jsonb,
+        cached_analysis_basic_prompt = %s,
+        analysis_cached_at = (now() at time zone 'utc')
+    WHERE user_id = %s
+'''
+
+UPDATE_DETAILED_CACHE_SQL = '''
+    UPDATE gencom.base_information
+    SET cached_analysis_detailed = %s::jsonb,
+        cached_analysis_detailed_prompt = %s
+    WHERE user_id = %s
+'''
+
+UPDATE_FULL_CACHE_SQL = '''
+    UPDATE gencom.base_information
+    SET cached_analysis = %s::jsonb,
+        cached_analysis_prompt = %s,
+        analysis_cached_at = (now() at time zone 'utc')
+    WHERE user_id = %s
+'''
+
+# Greeting context for tavus_start / vapi_start: only the two keys the greeting needs are
+# extracted server-side instead of fetching and parsing the whole basic analysis.
+# Params: (BASIC_PROMPT_FINGERPRINT, user_id) - an analysis from an older prompt counts as missing
+GREETING_CONTEXT_SQL = '''
+    SELECT 
+        bi.gene,
+        bi.mutation,
+        ct.classification_type,
+        basic.analysis->>'condition' AS cached_condition,
+        basic.analysis->>'description' AS cached_description
+    FROM gencom.base_information bi
+    LEFT JOIN gencom.classification_type ct 
+        ON bi.classification_type_id = ct.classification_type_id
+    CROSS JOIN LATERAL (
+        SELECT CASE WHEN bi.cached_analysis_basic_prompt = %s THEN bi.cached_analysis_basic END AS analysis
+    ) basic
+    WHERE bi.user_id = %s
+'''
+
+# Fetch all recent conversations for the user (both Tavus and Vapi)
+# Sort by created_at DESC so most recent messages appear first.
+# User-scoped queries filter on conversations_users.user_id (the JWT sub) so the planner starts
+# from idx_conversations_users_user_created instead of joining every user's turns and filtering
+# by email last (see database_migration_add_query_indexes.sql). The custom LLM service creates
+# the conversations row when it stores the first turns, so those turns are a few seconds OLDER
+# than C.created_at. The day of margin keeps them while still letting a partitioned
+# conversation_turns skip the months before each conversation (run-time pruning).
+# conversations.created_at is nullable; such a conversation keeps all its turns.
+TRANSCRIPT_SQL = """
+    SELECT 
+        C.id as conversation_id,
+        CT.ordinal,
+        CT.created_at,
+        U.user_email,
+        C.user_id,
+        CT.role,
+        CT.content,
+        CT.feedback,
+        CT.feedback_status
+    FROM public.conversations_users CU
+    INNER JOIN public.users U ON U.id = CU.user_id
+    INNER JOIN public.conversations C
+        ON C.tavus_conversation_id = CU.tavus_conversation_id
+    INNER JOIN public.conversation_turns CT ON CT.conversation_id = C.id
+    WHERE CU.user_id = %s
+      AND CT.created_at >= coalesce(C.created_at - interval '1 day', '-infinity')
+    ORDER BY CT.created_at DESC
+    LIMIT 1000
+"""
+
+# Version of TRANSCRIPT_SQL's result for ETag/304 on the 3-second poll. Turns are append-only
+# apart from feedback, so the window's size, newest turn and feedback values identify its
+# contents without reading turn content.
+TRANSCRIPT_VERSION_SQL = """
+    SELECT
+        count(*) AS turns,
+        max(created_at) AS latest,
+        md5(string_agg(
+            conversation_id::text || ':' || ordinal || ':' || coalesce(feedback_status, 0) || ':' || coalesce(feedback, ''),
+            ',' ORDER BY created_at DESC, conversation_id, ordinal
+        )) AS feedback_digest
+    FROM (
+        SELECT CT.conversation_id, CT.ordinal, CT.created_at, CT.feedback, CT.feedback_status
+        FROM public.conversations_users CU
+        INNER JOIN public.conversations C
+            ON C.tavus_conversation_id = CU.tavus_conversation_id
+        INNER JOIN public.conversation_turns CT ON CT.conversation_id = C.id
+        WHERE CU.user_id = %s
+          AND CT.created_at >= coalesce(C.created_at - interval '1 day', '-infinity')
+        ORDER BY CT.created_at DESC
+        LIMIT 1000
+    ) window_turns
+"""
+
+# Browsers keep the response but revalidate on every request (If-None-Match -> 304)
+TRANSCRIPT_CACHE_CONTROL = "private, no-cache"
+ANALYSIS_CACHE_CONTROL = "private, no-cache"
+
+# Newest call that has at least one stored turn: a primary-key read of the pointer maintained
+# by triggers on conversation_turns / conversations_users (database_migration_add_latest_conversation.sql)
+RECENT_CONVERSATION_SQL = """
+    SELECT tavus_conversation_id, created_at
+    FROM public.user_latest_conversation
+    WHERE user_id = %s
+"""
+
+# Does the conversation (internal id) belong to the user?
+CONVERSATION_OWNERSHIP_SQL = """
+    SELECT 1
+    FROM public.conversations C
+    INNER JOIN public.conversations_users CU ON C.tavus_conversation_id = CU.tavus_conversation_id
+    WHERE C.id = %s AND CU.user_id = %s
+    LIMIT 1
+"""
+
+# Which of these conversations (internal ids) belong to the user? One round trip for a feedback batch.
+OWNED_CONVERSATIONS_SQL = """
+    SELECT DISTINCT C.id
+    FROM public.conversations C
+    INNER JOIN public.conversations_users CU ON C.tavus_conversation_id = CU.tavus_conversation_id
+    WHERE C.id = ANY(%s::uuid[]) AND CU.user_id = %s
+"""
+
+# Apply a whole feedback batch in one statement (rows supplied by execute_values)
+BATCH_TURN_FEEDBACK_SQL = """
+    UPDATE public.conversation_turns CT
+    SET feedback_status = V.feedback_status, feedback = V.feedback
+    FROM (VALUES %s) AS V (conversation_id, ordinal, feedback_status, feedback)
+    WHERE CT.conversation_id = V.conversation_id AND CT.ordinal = V.ordinal
+    RETURNING CT.conversation_id, CT.ordinal
+"""
+BATCH_TURN_FEEDBACK_TEMPLATE = "(%s::uuid, %s::integer, %s::integer, %s::text)"
+MAX_FEEDBACK_BATCH = 500
+
+# Keyset-paginated conversation list: the user's calls newest first, each with its turn count and
+# last activity. Pages continue strictly after the (created_at, id) of the previous page's last row,
+# so every page is an index range scan on idx_conversations_users_user_created - no OFFSET.
+CONVERSATION_LIST_SQL = """
+    SELECT
+        C.id AS conversation_id,
+        CU.tavus_conversation_id,
+        CU.conversation_type_id,
+        CU.created_at,
+        CU.id AS call_id,
+        T.turn_count,
+        T.last_activity
+    FROM public.conversations_users CU
+    INNER JOIN public.conversations C
+        ON C.tavus_conversation_id = CU.tavus_conversation_id
+    CROSS JOIN LATERAL (
+        SELECT count(*) AS turn_count, max(CT.created_at) AS last_activity
+        FROM public.conversation_turns CT
+        WHERE CT.conversation_id = C.id
+    ) T
+    WHERE CU.user_id = %s
+      AND (CU.created_at, CU.id) < (%s, %s)
+      AND T.turn_count > 0
+    ORDER BY CU.created_at DESC, CU.id DESC
+    LIMIT %s
+"""
+
+# One page of a conversation's turns in spoken order, continuing after the given ordinal
+# (primary key range scan). Polling with the last ordinal seen returns only new turns.
+# The created_at bound (the conversation's start less a day, as in TRANSCRIPT_SQL: the first
+# turns are stored before the conversations row) keeps a partitioned conversation_turns from
+# probing the months before the call.
+CONVERSATION_TURNS_PAGE_SQL = """
+    SELECT
+        CT.conversation_id,
+        CT.ordinal,
+        CT.created_at,
+        CT.role,
+        CT.content,
+        CT.feedback,
+        CT.feedback_status
+    FROM public.conversation_turns CT
+    WHERE CT.conversation_id = %(conversation_id)s
+      AND CT.created_at >= coalesce(
+          (SELECT C.created_at - interval '1 day' FROM public.conversations C WHERE C.id = %(conversation_id)s),
+          '-infinity')
+      AND CT.ordinal > %(after)s
+    ORDER BY CT.ordinal
+    LIMIT %(limit)s
+"""
+
+CONVERSATION_PAGE_DEFAULT, CONVERSATION_PAGE_MAX = 20, 100
+TURN_PAGE_DEFAULT, TURN_PAGE_MAX = 100, 500
+
+def encode_cursor(*values) -> str:
+    """Opaque keyset cursor for the client (base64url of the last row's sort key)"""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"invalid cursor: {e}")
+
+def page_limit(value, default: int, maximum: int) -> int:
+    """?limit= clamped to 1..maximum; raises ValueError when not an integer"""
+    if value in (None, ""):
+        return default
+    return max(1, min(int(value), maximum))
+
+def transcript_etag(user_id: str, version: dict) -> str:
+    """ETag for a user's transcript from a TRANSCRIPT_VERSION_SQL row"""
+    latest = version["latest"].isoformat() if version["latest"] else ""
+    return compute_etag(f"{user_id}|{version['turns']}|{latest}|{version['feedback_digest'] or ''}")
+
+def resolve_request_user_id(user_payload: dict):
+    """User id for user-scoped queries: the JWT sub, falling back to an email lookup"""
+    user_id = user_payload.get('sub')
+    if user_id:
+        return str(user_id)
+    email = user_payload.get('email')
+    return resolve_system_user_id(email) if email else None
+
+def build_genetic_context(gene: str, mutation: str, classification: str, condition: str = None, description: str = None) -> str:
+    """Patient context handed to the Tavus/Vapi counselor at call start"""
+    return prompt_templates.GENETIC_CONTEXT.render(
+        gene=gene, mutation=mutation, classification=classification,
+        condition=condition or 'Pending analysis', description=description or 'Analysis in progress')
+
+# Prompts live in prompt_templates.py; the builders below are the call-site API.
+# *_PROMPT_FINGERPRINT is stored with each cached analysis and must match for a cache hit
+COUNSELOR_SYSTEM_INSTRUCTION = prompt_templates.COUNSELOR_SYSTEM.text
+BASIC_PROMPT_FINGERPRINT = prompt_templates.BASIC_ANALYSIS.fingerprint
+DETAILED_PROMPT_FINGERPRINT = prompt_templates.DETAILED_ANALYSIS.fingerprint
+FULL_PROMPT_FINGERPRINT = prompt_templates.FULL_ANALYSIS.fingerprint
+GENERIC_GREETING = prompt_templates.GENERIC_GREETING.render()
+
+def build_context_document(source_document: str | None, source_index: dict = None, queries: list = None) -> str | None:
+    """
+    The cached/inline grounding block built from base_information.source_document.
+    With queries, only the chunks BM25 ranks highest for them are kept (source_retrieval.py).
+    """
+    if not source_document:
+        return None
+    if queries and source_retrieval.RETRIEVAL_ENABLED:
+        source_document = source_retrieval.select_context(source_document, source_index, queries)
+    return prompt_templates.CONTEXT_DOCUMENT.render(document=source_document) if source_document else None
+
+def fetch_context_document(cur, user_id: str, section: str, gene: str, mutation: str) -> str | None:
+    """Grounding block for one analysis section (basic | detailed | full); None until the scrape has stored a document"""
+    cur.execute(SOURCE_DOCUMENT_SQL, (user_id,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    return build_context_document(row["source_document"], row["source_index"],
+                                  [source_retrieval.section_query(section, gene, mutation)])
+
+def build_basic_analysis_prompt(gene: str, mutation: str, classification: str) -> str:
+    """PART 1: Basic prompt (fast response - only condition, risk, description)"""
+    return prompt_templates.BASIC_ANALYSIS.render(gene=gene, mutation=mutation, classification=classification)
+
+def build_detailed_analysis_prompt(gene: str, mutation: str, classification: str) -> str:
+    """PART 2: Detailed prompt (implications, recommendations, resources)"""
+    return prompt_templates.DETAILED_ANALYSIS.render(gene=gene, mutation=mutation, classification=classification)
+
+def build_full_analysis_prompt(gene: str, mutation: str, classification: str) -> str:
+    """Single-call prompt for the legacy /condition-analysis/<user_id> endpoint"""
+    return prompt_templates.FULL_ANALYSIS.render(gene=gene, mutation=mutation, classification=classification)
+
+def build_greeting(gene: str, mutation: str, description: str) -> str:
+    """Personalised opening line for the Tavus/Vapi counselor"""
+    return prompt_templates.GREETING.render(gene=gene, mutation=mutation, description=description)
+
 # ============================================================================
 # ENDPOINTS
 # ============================================================================
@@ -370,6 +1122,10 @@ def healthz():
         "backend": "ok",
         "llm_warmup": {"status": "initiated", "note": "warmup running in background"}
     }
+
+    # Gemini prewarm normally starts with the worker; this covers servers that skip the startup hooks
+    gemini_prewarmer.start()
+    response["gemini_warmup"] = gemini_prewarmer.status()
     
     # Trigger LLM warmup in background thread (non-blocking)
     if TAVUS_CUSTOM_LLM_ENABLE:
@@ -479,6 +1235,58 @@ def db_health():
         if conn:
             db_pool.putconn(conn)
 
+@app.get("/metrics/llm-usage")
+@jwt_required()
+def llm_usage_metrics(user_payload):
+    """
+    Gemini token usage and estimated cost per call site (EXPORT_ADMIN_EMAILS only).
+    process: this worker's counters since start; json_parsing: its llm_json parse outcomes;
+    routing: calls served / fallen back / failed per routing target; daily: gencom.llm_usage_daily for the last
+    `days` days (default 7, max 90), summed over every worker that has flushed.
+    """
+    user_email = (user_payload.get('email') or '').lower()
+    if user_email not in EXPORT_ADMIN_EMAILS:
+        return jsonify({"error": "Only support admins can read LLM usage"}), 403
+
+    try:
+        days = page_limit(request.args.get('days'), 7, 90)
+    except ValueError:
+        return jsonify({"error": "days must be an integer"}), 400
+    response = {
+        "pid": os.getpid(),
+        "prices_per_mtok": {
+            "input": llm_usage.PRICE_INPUT_PER_MTOK,
+            "cached_input": llm_usage.PRICE_CACHED_INPUT_PER_MTOK,
+            "output": llm_usage.PRICE_OUTPUT_PER_MTOK,
+        },
+        "process": llm_usage_tracker.snapshot(),
+        "json_parsing": llm_json.snapshot(),
+        "routing": llm_router.snapshot(),
+        "prewarm": gemini_prewarmer.snapshot(),
+        "daily": None,
+    }
+    if not db_pool:
+        return jsonify(response), 200
+
+    llm_usage_tracker.flush()
+    conn = None
+    try:
+        conn = db_pool.getconn()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(llm_usage.DAILY_USAGE_SQL, (days,))
+            response["daily"] = [
+                {**row, "usage_date": row["usage_date"].isoformat(),
+                 "estimated_cost_usd": float(row["estimated_cost_usd"])}
+                for row in cur.fetchall()
+            ]
+        return jsonify(response), 200
+    except Exception as e:
+        app.logger.error(f"❌ llm-usage: Error reading daily rollup: {e}")
+        return jsonify({**response, "error": str(e)}), 500
+    finally:
+        if conn:
+            db_pool.putconn(conn)
+
 @app.get("/tavus/start")
 @jwt_required(optional=True)
 def tavus_start(user_payload):
@@ -522,17 +1330,7 @@ def tavus_start(user_payload):
             conn = db_pool.getconn()
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 # Fetch base information and analysis
-                cur.execute('''
-                    SELECT 
-                        bi.gene,
-                        bi.mutation,
-                        ct.classification_type,
-                        bi.cached_analysis_basic
-                    FROM gencom.base_information bi
-                    LEFT JOIN gencom.classification_type ct 
-                        ON bi.classification_type_id = ct.classification_type_id
-                    WHERE bi.user_id = %s
-                ''', (jwt_user_id,))
+                cur.execute(GREETING_CONTEXT_SQL, (BASIC_PROMPT_FINGERPRINT, jwt_user_id))
                 
                 result = cur.fetchone()
                 if result:
@@ -540,72 +1338,36 @@ def tavus_start(user_payload):
                     mutation = result.get("mutation", "").strip()
                     classification = result.get("classification_type", "").strip()
                     
-                    # Parse cached analysis for condition and description
-                    condition = None
-                    description = None
-                    if result.get("cached_analysis_basic"):
-                        try:
-                            cached = json.loads(result["cached_analysis_basic"])
-                            condition = cached.get("condition")
-                            description = cached.get("description")
-                        except json.JSONDecodeError:
-                            pass
+                    # Condition and description from the cached basic analysis (extracted in SQL)
+                    condition = result.get("cached_condition")
+                    description = result.get("cached_description")
                     
                     # If cache is empty, generate condition & description on-the-fly
                     if not condition or not description:
                         app.logger.info("🔄 Cache empty - generating condition & description for greeting...")
                         
-                        # Build prompt for basic analysis
-                        basic_prompt = f"""You are a professional genetic counselor providing educational information about genetic test results. 
-
-Given the following genetic information:
-- Gene: {gene}
-- Variant/Mutation: {mutation}
-- Classification: {classification}
-
-Please provide a BRIEF initial analysis in the following JSON format:
-
-{{
-  "condition": "Primary condition name associated with this gene variant",
-  "riskLevel": "High/Moderate/Low",
-  "description": "A clear, patient-friendly 2-3 sentence description of what this variant means"
-}}
-
-CRITICAL: Respond ONLY with the JSON object, no additional text."""
+                        basic_prompt = build_basic_analysis_prompt(gene, mutation, classification)
                         
                         try:
                             llm_response = call_custom_llm(
                                 user_message=basic_prompt,
-                                max_tokens=1024,
                                 stream=False,
-                                response_format="json"
+                                response_format="json",
+                                response_schema="basic",
+                                call_site="greeting",
+                                system_instruction=COUNSELOR_SYSTEM_INSTRUCTION
                             )
                             
                             if "choices" in llm_response and len(llm_response["choices"]) > 0:
                                 ai_content = llm_response["choices"][0].get("message", {}).get("content", "")
                                 
-                                # Parse JSON from LLM response
-                                cleaned_content = ai_content.strip()
-                                if cleaned_content.startswith("```json"):
-                                    cleaned_content = cleaned_content[7:]
-                                if cleaned_content.startswith("```"):
-                                    cleaned_content = cleaned_content[3:]
-                                if cleaned_content.endswith("```"):
-                                    cleaned_content = cleaned_content[:-3]
-                                cleaned_content = cleaned_content.strip()
-                                
-                                basic_data = json.loads(cleaned_content)
+                                basic_data = parse_analysis(ai_content, "basic", gene, mutation, classification)
                                 condition = basic_data.get("condition")
                                 description = basic_data.get("description")
                                 
                                 # Cache the result for future use
                                 cache_json = json.dumps(basic_data)
-                                cur.execute('''
-                                    UPDATE gencom.base_information
-                                    SET cached_analysis_basic = %s,
-                                        analysis_cached_at = (now() at time zone 'utc')
-                                    WHERE user_id = %s
-                                ''', (cache_json, jwt_user_id))
+                                cur.execute(UPDATE_BASIC_CACHE_SQL, (cache_json, BASIC_PROMPT_FINGERPRINT, jwt_user_id))
                                 conn.commit()
                                 
                                 app.logger.info(f"✅ Generated and cached basic analysis: condition={condition}")
@@ -615,24 +1377,17 @@ CRITICAL: Respond ONLY with the JSON object, no additional text."""
                     
                     # Build custom greeting for Tavus conversation
                     if condition and description:
-                        custom_greeting = f"Hi, I understand you're here to discuss the results of your genetic testing. I can see you have results for the {gene} gene — specifically the {mutation} variant. {description} I know these kinds of results can bring up a lot of questions or uncertainties, and I'm here to help you understand them fully. Please feel free to ask anything or share any concerns you have."
+                        custom_greeting = build_greeting(gene, mutation, description)
                         app.logger.info(f"👋 Custom greeting created for gene={gene}, mutation={mutation}, condition: {condition}")
                     else:
                         app.logger.info("⚠️  Skipping custom greeting - condition or description not available")
                     
                     # Build context string for Tavus AI counselor
-                    context_parts = [f"""Patient Genetic Information:
-- Gene: {gene}
-- Variant/Mutation: {mutation}
-- Classification: {classification}
-- Condition: {condition or 'Pending analysis'}
-- Description: {description or 'Analysis in progress'}
-
-Please use this information to provide personalized genetic counseling to the patient."""]
+                    context_parts = [build_genetic_context(gene, mutation, classification, condition, description)]
                     
                     # Add continuation context if resuming a previous conversation
                     if continue_conversation_id:
-                        context_parts.append(f"\n\nIMPORTANT: This is a continuation of a previous conversation (ID: {continue_conversation_id}). Please reference and build upon the previous discussion context when appropriate.")
+                        context_parts.append(prompt_templates.CONTINUATION_NOTE.render(conversation_id=continue_conversation_id))
                     
                     genetic_context = "\n".join(context_parts)
                     
@@ -858,17 +1613,7 @@ def vapi_start(user_payload):
             conn = db_pool.getconn()
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 # Fetch base information and analysis
-                cur.execute('''
-                    SELECT 
-                        bi.gene,
-                        bi.mutation,
-                        ct.classification_type,
-                        bi.cached_analysis_basic
-                    FROM gencom.base_information bi
-                    LEFT JOIN gencom.classification_type ct 
-                        ON bi.classification_type_id = ct.classification_type_id
-                    WHERE bi.user_id = %s
-                ''', (jwt_user_id,))
+                cur.execute(GREETING_CONTEXT_SQL, (BASIC_PROMPT_FINGERPRINT, jwt_user_id))
                 
                 result = cur.fetchone()
                 if result:
@@ -876,72 +1621,36 @@ def vapi_start(user_payload):
                     mutation = result.get("mutation", "").strip()
                     classification = result.get("classification_type", "").strip()
                     
-                    # Parse cached analysis for condition and description
-                    condition = None
-                    description = None
-                    if result.get("cached_analysis_basic"):
-                        try:
-                            cached = json.loads(result["cached_analysis_basic"])
-                            condition = cached.get("condition")
-                            description = cached.get("description")
-                        except json.JSONDecodeError:
-                            pass
+                    # Condition and description from the cached basic analysis (extracted in SQL)
+                    condition = result.get("cached_condition")
+                    description = result.get("cached_description")
                     
                     # If cache is empty, generate condition & description on-the-fly
                     if not condition or not description:
                         app.logger.info("🔄 vapi: Cache empty - generating condition & description for greeting...")
                         
-                        # Build prompt for basic analysis
-                        basic_prompt = f"""You are a professional genetic counselor providing educational information about genetic test results. 
-
-Given the following genetic information:
-- Gene: {gene}
-- Variant/Mutation: {mutation}
-- Classification: {classification}
-
-Please provide a BRIEF initial analysis in the following JSON format:
-
-{{
-  "condition": "Primary condition name associated with this gene variant",
-  "riskLevel": "High/Moderate/Low",
-  "description": "A clear, patient-friendly 2-3 sentence description of what this variant means"
-}}
-
-CRITICAL: Respond ONLY with the JSON object, no additional text."""
+                        basic_prompt = build_basic_analysis_prompt(gene, mutation, classification)
                         
                         try:
                             llm_response = call_custom_llm(
                                 user_message=basic_prompt,
-                                max_tokens=1024,
                                 stream=False,
-                                response_format="json"
+                                response_format="json",
+                                response_schema="basic",
+                                call_site="greeting",
+                                system_instruction=COUNSELOR_SYSTEM_INSTRUCTION
                             )
                             
                             if "choices" in llm_response and len(llm_response["choices"]) > 0:
                                 ai_content = llm_response["choices"][0].get("message", {}).get("content", "")
                                 
-                                # Parse JSON from LLM response
-                                cleaned_content = ai_content.strip()
-                                if cleaned_content.startswith("```json"):
-                                    cleaned_content = cleaned_content[7:]
-                                if cleaned_content.startswith("```"):
-                                    cleaned_content = cleaned_content[3:]
-                                if cleaned_content.endswith("```"):
-                                    cleaned_content = cleaned_content[:-3]
-                                cleaned_content = cleaned_content.strip()
-                                
-                                basic_data = json.loads(cleaned_content)
+                                basic_data = parse_analysis(ai_content, "basic", gene, mutation, classification)
                                 condition = basic_data.get("condition")
                                 description = basic_data.get("description")
                                 
                                 # Cache the result for future use
                                 cache_json = json.dumps(basic_data)
-                                cur.execute('''
-                                    UPDATE gencom.base_information
-                                    SET cached_analysis_basic = %s,
-                                        analysis_cached_at = (now() at time zone 'utc')
-                                    WHERE user_id = %s
-                                ''', (cache_json, jwt_user_id))
+                                cur.execute(UPDATE_BASIC_CACHE_SQL, (cache_json, BASIC_PROMPT_FINGERPRINT, jwt_user_id))
                                 conn.commit()
                                 
                                 app.logger.info(f"✅ vapi: Generated and cached basic analysis: condition={condition}")
@@ -950,36 +1659,29 @@ CRITICAL: Respond ONLY with the JSON object, no additional text."""
                     
                     # Build custom greeting for Vapi conversation (same format as Tavus)
                     if condition and description:
-                        custom_greeting = f"Hi, I understand you're here to discuss the results of your genetic testing. I can see you have results for the {gene} gene — specifically the {mutation} variant. {description} I know these kinds of results can bring up a lot of questions or uncertainties, and I'm here to help you understand them fully. Please feel free to ask anything or share any concerns you have."
+                        custom_greeting = build_greeting(gene, mutation, description)
                         app.logger.info(f"👋 vapi: Custom greeting created for gene={gene}, mutation={mutation}, condition: {condition}")
                     else:
                         # Fallback to generic greeting if no genetic data
-                        custom_greeting = "Hi, I'm here to help you understand your genetic testing results. Please feel free to ask any questions or share any concerns you have."
+                        custom_greeting = GENERIC_GREETING
                         app.logger.info("⚠️  vapi: Using generic greeting - condition or description not available")
                     
                     # Build context string for Vapi AI counselor
-                    genetic_context = f"""Patient Genetic Information:
-- Gene: {gene}
-- Variant/Mutation: {mutation}
-- Classification: {classification}
-- Condition: {condition or 'Pending analysis'}
-- Description: {description or 'Analysis in progress'}
-
-Please use this information to provide personalized genetic counseling to the patient."""
+                    genetic_context = build_genetic_context(gene, mutation, classification, condition, description)
                     
                     app.logger.info(f"🧬 vapi: Genetic context loaded for user {jwt_user_id}: gene={gene}, mutation={mutation}")
                 else:
                     app.logger.warning(f"⚠️  vapi: No genetic data found for user {jwt_user_id}")
-                    custom_greeting = "Hi, I'm here to help you understand your genetic testing results. Please feel free to ask any questions or share any concerns you have."
+                    custom_greeting = GENERIC_GREETING
         except Exception as e:
             app.logger.error(f"❌ vapi: Error fetching genetic context: {e}")
-            custom_greeting = "Hi, I'm here to help you understand your genetic testing results. Please feel free to ask any questions or share any concerns you have."
+            custom_greeting = GENERIC_GREETING
         finally:
             if conn:
                 db_pool.putconn(conn)
     else:
         # Unauthenticated user - use generic greeting
-        custom_greeting = "Hi, I'm here to help you understand your genetic testing results. Please feel free to ask any questions or share any concerns you have."
+        custom_greeting = GENERIC_GREETING
         app.logger.info("👋 vapi: Using generic greeting for unauthenticated user")
     
     # Pre-generate a conversation ID for this session (UUID, used for DB tracking)
@@ -1073,21 +1775,17 @@ def get_recent_tavus_conversation(user_payload):
         app.logger.error("❌ recent-conversation: Database not configured")
         return jsonify({"error": "Database not configured"}), 500
     
+    user_id = resolve_request_user_id(user_payload)
+    if not user_id:
+        app.logger.info(f"ℹ️  recent-conversation: No user found for {user_email}")
+        return jsonify({"found": False}), 200
+    
     conn = None
     try:
         conn = db_pool.getconn()
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Fetch most recent conversation_id using the provided SQL
-            cur.execute("""
-                SELECT C.tavus_conversation_id, CU.created_at
-                FROM public.conversations C 
-                INNER JOIN public.conversation_turns CT ON C.id = CT.conversation_id 
-                INNER JOIN public.conversations_users CU ON C.tavus_conversation_id = CU.tavus_conversation_id
-                INNER JOIN public.users U ON CU.user_id = U.id
-                WHERE U.user_email = %s
-                ORDER BY CU.created_at DESC 
-                LIMIT 1
-            """, (user_email,))
+            # Fetch most recent conversation_id
+            cur.execute(RECENT_CONVERSATION_SQL, (user_id,))
             
             result = cur.fetchone()
             
@@ -1132,42 +1830,33 @@ def get_recent_transcript(user_payload):
         app.logger.error("❌ transcript: Database not configured")
         return jsonify({"error": "Database not configured"}), 500
     
+    user_id = resolve_request_user_id(user_payload)
+    if not user_id:
+        app.logger.info(f"ℹ️  transcript: No user found for {user_email}")
+        return jsonify({"turns": [], "count": 0}), 200
+    
     conn = None
     try:
         conn = db_pool.getconn()
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Fetch all recent conversations for the user (both Tavus and Vapi)
-            # Sort by created_at DESC so most recent messages appear first
+            cur.execute(TRANSCRIPT_VERSION_SQL, (user_id,))
+            etag = transcript_etag(user_id, cur.fetchone())
+            if etag_matches(etag):
+                app.logger.info(f"✅ transcript: Not modified for {user_email}")
+                return not_modified_response(etag, TRANSCRIPT_CACHE_CONTROL)
+            
             app.logger.info(f"📋 transcript: Fetching recent conversations for {user_email}")
-            cur.execute("""
-                SELECT 
-                    C.id as conversation_id,
-                    CT.ordinal,
-                    CT.created_at,
-                    U.user_email,
-                    C.user_id,
-                    CT.role,
-                    CT.content,
-                    CT.feedback,
-                    CT.feedback_status
-                FROM public.conversations C 
-                INNER JOIN public.conversation_turns CT ON C.id = CT.conversation_id  
-                INNER JOIN public.conversations_users CU
-                    ON C.tavus_conversation_id = CU.tavus_conversation_id
-                INNER JOIN public.users U ON CU.user_id = U.id 
-                WHERE U.user_email = %s
-                ORDER BY CT.created_at DESC
-                LIMIT 1000
-            """, (user_email,))
+            cur.execute(TRANSCRIPT_SQL, (user_id,))
             
             turns = cur.fetchall()
             
             app.logger.info(f"✅ transcript: Fetched {len(turns)} turns for {user_email}")
             
-            return jsonify({
+            response = jsonify({
                 "turns": [dict(t) for t in turns],
                 "count": len(turns)
-            }), 200
+            })
+            return with_etag(response, etag, TRANSCRIPT_CACHE_CONTROL), 200
             
     except Exception as e:
         app.logger.error(f"❌ transcript: Error fetching: {e}")
@@ -1176,12 +1865,129 @@ def get_recent_transcript(user_payload):
         if conn:
             db_pool.putconn(conn)
 
+@app.get("/conversations")
+@jwt_required()
+def list_conversations(user_payload):
+    """
+    The user's conversations (Tavus and Vapi) newest first, with turn counts and last activity.
+    Keyset pagination: pass the previous response's next_cursor as ?cursor= (null on the last page).
+    Query params: limit (default 20, max 100), cursor.
+    """
+    user_email = user_payload.get('email')
+    
+    if not db_pool:
+        app.logger.error("❌ conversations:list: Database not configured")
+        return jsonify({"error": "Database not configured"}), 500
+    
+    try:
+        limit = page_limit(request.args.get('limit'), CONVERSATION_PAGE_DEFAULT, CONVERSATION_PAGE_MAX)
+        cursor = request.args.get('cursor')
+        if cursor:
+            before_created, before_id = decode_cursor(cursor)
+            before_created = datetime.fromisoformat(before_created)
+            before_id = int(before_id)
+        else:
+            before_created, before_id = datetime.max, 0
+    except (TypeError, ValueError) as e:
+        app.logger.warning(f"⚠️  conversations:list: Bad paging params: {e}")
+        return jsonify({"error": "limit must be an integer and cursor must come from a previous response"}), 400
+    
+    user_id = resolve_request_user_id(user_payload)
+    if not user_id:
+        app.logger.info(f"ℹ️  conversations:list: No user found for {user_email}")
+        return jsonify({"conversations": [], "next_cursor": None}), 200
+    
+    conn = None
+    try:
+        conn = db_pool.getconn()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # One extra row tells us whether another page exists
+            cur.execute(CONVERSATION_LIST_SQL, (user_id, before_created, before_id, limit + 1))
+            rows = cur.fetchall()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["call_id"]) if has_more else None
+        conversations = [{k: v for k, v in row.items() if k != "call_id"} for row in rows]
+        
+        app.logger.info(f"✅ conversations:list: {len(conversations)} conversations for {user_email} (more={has_more})")
+        return jsonify({"conversations": conversations, "next_cursor": next_cursor}), 200
+    
+    except Exception as e:
+        app.logger.error(f"❌ conversations:list: Error fetching: {e}")
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if conn:
+            db_pool.putconn(conn)
+
+@app.get("/conversations/<conversation_id>/turns")
+@jwt_required()
+def get_conversation_turns(user_payload, conversation_id):
+    """
+    One page of a conversation's turns in spoken order (same turn fields as recent-transcript).
+    Query params: after (ordinal, default 0), limit (default 100, max 500).
+    next_after is the ordinal to pass as ?after= for the next page (null when this page is the last);
+    during a live call, polling with the last ordinal seen returns only the new turns.
+    """
+    user_email = user_payload.get('email')
+    
+    if not db_pool:
+        app.logger.error("❌ conversations:turns: Database not configured")
+        return jsonify({"error": "Database not configured"}), 500
+    
+    try:
+        conversation_id = str(uuid.UUID(conversation_id))
+        after = int(request.args.get('after') or 0)
+        limit = page_limit(request.args.get('limit'), TURN_PAGE_DEFAULT, TURN_PAGE_MAX)
+    except (TypeError, ValueError) as e:
+        app.logger.warning(f"⚠️  conversations:turns: Bad params: {e}")
+        return jsonify({"error": "conversation_id must be a UUID; after and limit must be integers"}), 400
+    
+    user_id = resolve_request_user_id(user_payload)
+    if not user_id:
+        app.logger.warning(f"⚠️  conversations:turns: No user found for {user_email}")
+        return jsonify({"error": "Unauthorized: You do not own this conversation"}), 403
+    
+    conn = None
+    try:
+        conn = db_pool.getconn()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(CONVERSATION_OWNERSHIP_SQL, (conversation_id, user_id))
+            if not cur.fetchone():
+                app.logger.warning(f"⚠️  conversations:turns: Conversation {conversation_id} not found or not owned by {user_email}")
+                return jsonify({"error": "Unauthorized: You do not own this conversation"}), 403
+            
+            cur.execute(CONVERSATION_TURNS_PAGE_SQL, {"conversation_id": conversation_id, "after": after, "limit": limit + 1})
+            turns = cur.fetchall()
+        
+        has_more = len(turns) > limit
+        turns = turns[:limit]
+        next_after = turns[-1]["ordinal"] if has_more else None
+        
+        app.logger.info(f"✅ conversations:turns: {len(turns)} turns of {conversation_id} after={after} for {user_email}")
+        return jsonify({
+            "conversation_id": conversation_id,
+            "turns": [dict(t) for t in turns],
+            "count": len(turns),
+            "next_after": next_after
+        }), 200
+    
+    except Exception as e:
+        app.logger.error(f"❌ conversations:turns: Error fetching: {e}")
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if conn:
+            db_pool.putconn(conn)
+
 @app.get("/conversations/debug-vapi")
 @jwt_required(optional=True)
 def debug_vapi_conversations(user_payload):
     """
-    Debug endpoint to check Vapi conversation data in the database.
-    Shows what's in conversations_users, conversations, and conversation_turns for Vapi calls.
+    Debug endpoint to check conversation data in the database.
+    Shows what's in conversations_users, conversations, and conversation_turns for the user's
+    recent calls, in one query (conversation_diagnostics.DIAGNOSTICS_SQL).
+    Query params: type (vapi | tavus | all, default vapi), since / until (ISO dates),
+    email (inspect another user; EXPORT_ADMIN_EMAILS only).
     """
     user_email = user_payload.get('email') if user_payload else None
     
@@ -1191,83 +1997,32 @@ def debug_vapi_conversations(user_payload):
     if not db_pool:
         return jsonify({"error": "Database not configured"}), 500
     
+    target_email = request.args.get('email') or user_email
+    if target_email != user_email and user_email.lower() not in EXPORT_ADMIN_EMAILS:
+        app.logger.warning(f"⚠️  debug-vapi: {user_email} is not allowed to inspect {target_email}")
+        return jsonify({"error": "Only support admins can inspect another user"}), 403
+    
+    conversation_type = request.args.get('type', 'vapi')
+    try:
+        params = conversation_diagnostics.build_params(
+            target_email, conversation_type, request.args.get('since'), request.args.get('until'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     conn = None
     try:
         conn = db_pool.getconn()
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Check conversations_users for Vapi entries (conversation_type_id=3)
-            cur.execute("""
-                SELECT 
-                    CU.id, 
-                    CU.user_id, 
-                    CU.tavus_conversation_id, 
-                    CU.conversation_type_id,
-                    CU.created_at,
-                    U.user_email
-                FROM public.conversations_users CU
-                INNER JOIN public.users U ON CU.user_id = U.id
-                WHERE U.user_email = %s 
-                  AND CU.conversation_type_id = 3
-                ORDER BY CU.created_at DESC
-                LIMIT 10
-            """, (user_email,))
-            conversations_users_entries = cur.fetchall()
-            
-            # Check if there are conversations records with matching tavus_conversation_id
-            conversation_ids = [dict(e)['tavus_conversation_id'] for e in conversations_users_entries]
-            conversations_records = []
-            if conversation_ids:
-                cur.execute("""
-                    SELECT 
-                        C.id,
-                        C.user_id,
-                        C.tavus_conversation_id,
-                        C.conversation_type_id,
-                        C.created_at
-                    FROM public.conversations C
-                    WHERE C.tavus_conversation_id = ANY(%s)
-                    LIMIT 50
-                """, (conversation_ids,))
-                conversations_records = cur.fetchall()
-            
-            # Check conversation_turns for these conversations
-            conversation_db_ids = [dict(c)['id'] for c in conversations_records]
-            turns = []
-            if conversation_db_ids:
-                cur.execute("""
-                    SELECT 
-                        CT.id,
-                        CT.conversation_id,
-                        CT.ordinal,
-                        CT.role,
-                        LEFT(CT.content::text, 100) as content_preview,
-                        CT.created_at
-                    FROM public.conversation_turns CT
-                    WHERE CT.conversation_id = ANY(%s)
-                    ORDER BY CT.created_at DESC
-                    LIMIT 50
-                """, (conversation_db_ids,))
-                turns = cur.fetchall()
-            
-            return jsonify({
-                "user_email": user_email,
-                "conversations_users_count": len(conversations_users_entries),
-                "conversations_users": [dict(e) for e in conversations_users_entries],
-                "conversations_count": len(conversations_records),
-                "conversations": [dict(c) for c in conversations_records],
-                "turns_count": len(turns),
-                "turns": [dict(t) for t in turns],
-                "diagnosis": {
-                    "has_tracked_calls": len(conversations_users_entries) > 0,
-                    "has_conversation_records": len(conversations_records) > 0,
-                    "has_turns": len(turns) > 0,
-                    "issue": "Unknown" if len(conversations_users_entries) == 0 else (
-                        "No conversations table records with matching tavus_conversation_id" if len(conversations_records) == 0 else (
-                            "No conversation_turns for the conversations" if len(turns) == 0 else "Data looks good"
-                        )
-                    )
-                }
-            }), 200
+            report = conversation_diagnostics.run_diagnostics(cur, params)
+        
+        app.logger.info(f"🔍 debug-vapi: {target_email} type={conversation_type} -> {report['diagnosis']['issue']}")
+        return jsonify({
+            "user_email": target_email,
+            "type": conversation_type,
+            "since": params["since"],
+            "until": params["until"],
+            **report
+        }), 200
             
     except Exception as e:
         app.logger.error(f"❌ debug-vapi: Error: {e}")
@@ -1313,6 +2068,11 @@ def save_turn_feedback(user_payload):
     if feedback_status not in [0, 1, 2]:
         return jsonify({"error": "feedback_status must be 0, 1, or 2"}), 400
     
+    user_id = resolve_request_user_id(user_payload)
+    if not user_id:
+        app.logger.warning(f"⚠️  feedback: No user found for {user_email}")
+        return jsonify({"error": "Unauthorized: You do not own this conversation"}), 403
+    
     conn = None
     try:
         conn = db_pool.getconn()
@@ -1320,13 +2080,7 @@ def save_turn_feedback(user_payload):
             # Verify that this turn belongs to the user
             # We use a simpler check: does the conversation belong to the user?
             app.logger.info(f"🔍 feedback: Verifying ownership for conv={conversation_id} user={user_email}")
-            cur.execute("""
-                SELECT 1
-                FROM public.conversations C
-                INNER JOIN public.conversations_users CU ON C.tavus_conversation_id = CU.tavus_conversation_id
-                INNER JOIN public.users U ON CU.user_id = U.id
-                WHERE C.id = %s AND U.user_email = %s
-            """, (conversation_id, user_email))
+            cur.execute(CONVERSATION_OWNERSHIP_SQL, (conversation_id, user_id))
             
             if not cur.fetchone():
                 app.logger.warning(f"⚠️  feedback: Conversation {conversation_id} not found or not owned by {user_email}")
@@ -1358,96 +2112,322 @@ def save_turn_feedback(user_payload):
         if conn:
             db_pool.putconn(conn)
 
-# Database Endpoints
-@app.get("/persona-test-types")
-def get_persona_test_types():
-    start_time = datetime.now(timezone.utc)
-    app.logger.info("⏱️ persona-test-types:start")
+@app.post("/conversations/turn-feedback/batch")
+@jwt_required()
+def save_turn_feedback_batch(user_payload):
+    """
+    Save feedback for many conversation turns at once (QAScreen "Save Feedback").
+    Expects: { "items": [ { "conversation_id", "ordinal", "feedback_status", "feedback" }, ... ] }
+    Ownership is checked once per conversation and every update runs in a single
+    UPDATE ... FROM (VALUES ...) statement; the batch is saved entirely or not at all.
+    """
+    user_email = user_payload.get('email')
+    
+    if not user_email:
+        app.logger.warning("⚠️  feedback:batch: No email in JWT")
+        return jsonify({"error": "No email in JWT"}), 400
     
     if not db_pool:
-        return jsonify({"error": "database_not_configured"}), 500
+        app.logger.error("❌ feedback:batch: Database not configured")
+        return jsonify({"error": "Database not configured"}), 500
+    
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    if len(items) > MAX_FEEDBACK_BATCH:
+        return jsonify({"error": f"At most {MAX_FEEDBACK_BATCH} items per batch"}), 400
+    
+    # Validate every item up front; a repeated turn keeps its last entry
+    updates = {}
+    for index, item in enumerate(items):
+        try:
+            conversation_id = str(uuid.UUID(str(item.get('conversation_id'))))
+            ordinal = int(item.get('ordinal'))
+            feedback_status = int(item.get('feedback_status', 0))
+        except (AttributeError, TypeError, ValueError) as e:
+            app.logger.warning(f"⚠️  feedback:batch: Invalid item {index}: {e}")
+            return jsonify({"error": "conversation_id must be a UUID; ordinal and feedback_status must be integers", "index": index}), 400
+        if feedback_status not in [0, 1, 2]:
+            return jsonify({"error": "feedback_status must be 0, 1, or 2", "index": index}), 400
+        updates[(conversation_id, ordinal)] = (conversation_id, ordinal, feedback_status, item.get('feedback') or '')
+    
+    user_id = resolve_request_user_id(user_payload)
+    if not user_id:
+        app.logger.warning(f"⚠️  feedback:batch: No user found for {user_email}")
+        return jsonify({"error": "Unauthorized: You do not own this conversation"}), 403
+    
+    conversation_ids = sorted({conversation_id for conversation_id, _ in updates})
     
     conn = None
     try:
-        db_start = datetime.now(timezone.utc)
         conn = db_pool.getconn()
-        db_conn_time = (datetime.now(timezone.utc) - db_start).total_seconds()
-        
-        query_start = datetime.now(timezone.utc)
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute('''
-                SELECT persona_test_type_id, persona_test_type
-                FROM gencom.persona_test_type
-                ORDER BY persona_test_type
-            ''')
-            results = cur.fetchall()
-        query_time = (datetime.now(timezone.utc) - query_start).total_seconds()
-        
-        # Transform snake_case keys to PascalCase for frontend compatibility
-        transformed_results = [
-            {
-                "PersonaTestTypeID": row["persona_test_type_id"],
-                "PersonaTestType": row["persona_test_type"]
-            }
-            for row in results
-        ]
-        
-        total_time = (datetime.now(timezone.utc) - start_time).total_seconds()
-        app.logger.info(f"✅ persona-test-types:success conn={db_conn_time:.3f}s query={query_time:.3f}s total={total_time:.3f}s")
-        
-        return jsonify(transformed_results), 200
+            app.logger.info(f"🔍 feedback:batch: Verifying ownership of {len(conversation_ids)} conversation(s) user={user_email}")
+            cur.execute(OWNED_CONVERSATIONS_SQL, (conversation_ids, user_id))
+            owned = {str(row["id"]) for row in cur.fetchall()}
+            not_owned = [conversation_id for conversation_id in conversation_ids if conversation_id not in owned]
+            if not_owned:
+                app.logger.warning(f"⚠️  feedback:batch: Conversations {not_owned} not found or not owned by {user_email}")
+                return jsonify({"error": "Unauthorized: You do not own this conversation", "conversation_ids": not_owned}), 403
+            
+            app.logger.info(f"💾 feedback:batch: Updating {len(updates)} turn(s)")
+            updated = execute_values(
+                cur, BATCH_TURN_FEEDBACK_SQL, list(updates.values()),
+                template=BATCH_TURN_FEEDBACK_TEMPLATE, page_size=len(updates), fetch=True
+            )
+            updated_keys = {(str(row["conversation_id"]), row["ordinal"]) for row in updated}
+            missing = [{"conversation_id": c, "ordinal": o} for c, o in updates if (c, o) not in updated_keys]
+            if missing:
+                conn.rollback()
+                app.logger.warning(f"⚠️  feedback:batch: {len(missing)} turn(s) not found, nothing saved")
+                return jsonify({"error": "Turn not found", "missing": missing}), 404
+            
+            conn.commit()
+            app.logger.info(f"✅ feedback:batch: Saved {len(updates)} turn(s) for {user_email}")
+            
+            return jsonify({
+                "success": True,
+                "updated": len(updates),
+                "turns": [{"conversation_id": c, "ordinal": o} for c, o in updates]
+            }), 200
+            
     except Exception as e:
-        total_time = (datetime.now(timezone.utc) - start_time).total_seconds()
-        app.logger.exception(f"❌ get_persona_test_types:error {str(e)} total={total_time:.3f}s")
-        return jsonify({"error": "database_query_failed", "message": str(e)}), 500
+        if conn:
+            conn.rollback()
+        app.logger.error(f"❌ feedback:batch: Error saving: {e}")
+        return jsonify({"error": str(e)}), 500
     finally:
         if conn:
             db_pool.putconn(conn)
 
-@app.get("/classification-types")
-def get_classification_types():
-    start_time = datetime.now(timezone.utc)
-    app.logger.info("⏱️ classification-types:start")
+@app.get("/conversations/export")
+@jwt_required()
+def export_transcripts(user_payload):
+    """
+    Stream transcripts and feedback as CSV or NDJSON (QA review, model evaluation).
+    Query params: format=csv|ndjson, scope=user|company, since/until (ISO, until exclusive).
+    scope=company exports every user of the caller's company and requires EXPORT_ADMIN_EMAILS.
+    Rows come from COPY ... TO STDOUT and are sent as a chunked response (constant memory).
+    """
+    user_email = user_payload.get('email')
+    
+    if not user_email:
+        app.logger.warning("⚠️  export: No email in JWT")
+        return jsonify({"error": "No email in JWT"}), 400
     
     if not db_pool:
-        return jsonify({"error": "database_not_configured"}), 500
+        app.logger.error("❌ export: Database not configured")
+        return jsonify({"error": "Database not configured"}), 500
+    
+    export_format = request.args.get('format', 'csv').lower()
+    scope = request.args.get('scope', 'user').lower()
+    if export_format not in transcript_export.EXPORT_FORMATS:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    if scope not in transcript_export.SCOPE_FILTERS:
+        return jsonify({"error": "scope must be user or company"}), 400
+    
+    try:
+        params = {
+            "since": transcript_export.parse_export_date(request.args.get('since'), datetime.min.replace(tzinfo=timezone.utc)),
+            "until": transcript_export.parse_export_date(request.args.get('until'), datetime.now(timezone.utc)),
+        }
+    except ValueError:
+        return jsonify({"error": "since and until must be ISO dates"}), 400
+    
+    if scope == "company":
+        company_id = user_payload.get('company_id')
+        if user_email.lower() not in EXPORT_ADMIN_EMAILS or not company_id:
+            app.logger.warning(f"⚠️  export: {user_email} is not allowed to export company {company_id}")
+            return jsonify({"error": "Unauthorized: company export is not enabled for this user"}), 403
+        params["company_id"] = int(company_id)
+    else:
+        params["user_id"] = resolve_request_user_id(user_payload)
+        if not params["user_id"]:
+            app.logger.warning(f"⚠️  export: No user found for {user_email}")
+            return jsonify({"error": "User not found"}), 404
+    
+    conn = None
+    try:
+        conn = db_pool.getconn()
+        with conn.cursor() as cur:
+            copy_sql = transcript_export.build_copy_sql(cur, export_format, scope, params)
+    except pool.PoolError as e:
+        app.logger.error(f"❌ export: No database connection available: {e}")
+        return jsonify({"error": "Database busy, try again shortly"}), 503
+    except Exception as e:
+        if conn:
+            db_pool.putconn(conn)
+        app.logger.error(f"❌ export: Error preparing export: {e}")
+        return jsonify({"error": str(e)}), 500
+    
+    released = []
     
+    def release(completed):
+        if released:
+            return
+        released.append(True)
+        if completed:
+            conn.rollback()
+        # A cancelled or failed COPY leaves the connection in an unknown state
+        db_pool.putconn(conn, close=not completed)
+    
+    def generate():
+        started = time.monotonic()
+        sent = 0
+        completed = False
+        try:
+            for chunk in transcript_export.stream_copy(conn, copy_sql):
+                sent += len(chunk)
+                yield chunk
+            completed = True
+        except Exception as e:
+            app.logger.error(f"❌ export: Stream failed after {sent} bytes: {e}")
+        finally:
+            release(completed)
+            status = "complete" if completed else "aborted"
+            app.logger.info(f"📤 export:{status} scope={scope} format={export_format} user={user_email} bytes={sent} elapsed={time.monotonic() - started:.2f}s")
+    
+    mimetype, extension = transcript_export.EXPORT_FORMATS[export_format]
+    filename = f"transcripts-{scope}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{extension}"
+    app.logger.info(f"📤 export:start scope={scope} format={export_format} user={user_email}")
+    response = Response(generate(), mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",
+    })
+    # Returns the connection if the client goes away before the body starts
+    response.call_on_close(lambda: release(False))
+    return response
+
+# Database Endpoints
+# Reference data (lookup tables) is loaded at startup into an in-process TTL cache
+# and served with a strong ETag + Cache-Control, so browsers answer repeat page loads
+# from their own cache or with a 304 instead of a Postgres round trip.
+REFERENCE_QUERIES = {
+    "persona-test-types": (
+        '''
+            SELECT persona_test_type_id, persona_test_type
+            FROM gencom.persona_test_type
+            ORDER BY persona_test_type
+        ''',
+        # Transform snake_case keys to PascalCase for frontend compatibility
+        lambda row: {
+            "PersonaTestTypeID": row["persona_test_type_id"],
+            "PersonaTestType": row["persona_test_type"]
+        },
+    ),
+    "classification-types": (
+        '''
+            SELECT classification_type_id, classification_type
+            FROM gencom.classification_type
+            ORDER BY classification_type
+        ''',
+        lambda row: {
+            "ClassificationTypeID": row["classification_type_id"],
+            "ClassificationType": row["classification_type"]
+        },
+    ),
+}
+
+def _load_reference_data(name: str) -> dict:
+    """Query one lookup table and return its serialized body and ETag"""
+    sql, transform = REFERENCE_QUERIES[name]
     conn = None
     try:
         db_start = datetime.now(timezone.utc)
         conn = db_pool.getconn()
         db_conn_time = (datetime.now(timezone.utc) - db_start).total_seconds()
-        
+
         query_start = datetime.now(timezone.utc)
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute('''
-                SELECT classification_type_id, classification_type
-                FROM gencom.classification_type
-                ORDER BY classification_type
-            ''')
+            cur.execute(sql)
             results = cur.fetchall()
         query_time = (datetime.now(timezone.utc) - query_start).total_seconds()
-        
-        # Transform snake_case keys to PascalCase for frontend compatibility
-        transformed_results = [
-            {
-                "ClassificationTypeID": row["classification_type_id"],
-                "ClassificationType": row["classification_type"]
-            }
-            for row in results
-        ]
-        
+    finally:
+        if conn:
+            db_pool.putconn(conn)
+
+    # Same compact form jsonify produces
+    body = app.json.dumps([transform(row) for row in results], separators=(",", ":")) + "\n"
+    entry = {"body": body, "etag": compute_etag(body), "count": len(results)}
+    app.logger.info(f"📚 reference:{name}:loaded rows={len(results)} conn={db_conn_time:.3f}s query={query_time:.3f}s")
+    return entry
+
+def get_reference_data(name: str) -> dict:
+    """Cached reference data entry for name, loading it on a miss or after TTL expiry"""
+    entry = reference_cache.get(name)
+    if entry is None:
+        entry = _load_reference_data(name)
+        reference_cache.set(name, entry)
+    return entry
+
+def warm_reference_cache():
+    """Load every lookup table at startup (non-fatal if the database is unavailable)"""
+    if not db_pool:
+        return
+    for name in REFERENCE_QUERIES:
+        try:
+            get_reference_data(name)
+        except Exception as e:
+            app.logger.warning(f"⚠️  reference:{name}:warmup_failed {type(e).__name__}: {e}")
+
+def invalidate_reference_cache(name: str = None):
+    """Drop cached reference data (one table, or all) so the next request reloads it"""
+    if name:
+        reference_cache.invalidate(name)
+    else:
+        reference_cache.clear()
+    app.logger.info(f"🗑️  reference:invalidated {name or 'all'} pid={os.getpid()}")
+
+def _serve_reference_data(name: str):
+    start_time = datetime.now(timezone.utc)
+    app.logger.info(f"⏱️ {name}:start")
+
+    if not db_pool:
+        return jsonify({"error": "database_not_configured"}), 500
+
+    try:
+        entry = get_reference_data(name)
+        response = conditional_json_response(
+            entry["body"], entry["etag"], f"public, max-age={REFERENCE_DATA_MAX_AGE_SEC}"
+        )
         total_time = (datetime.now(timezone.utc) - start_time).total_seconds()
-        app.logger.info(f"✅ classification-types:success conn={db_conn_time:.3f}s query={query_time:.3f}s total={total_time:.3f}s")
-        
-        return jsonify(transformed_results), 200
+        app.logger.info(f"✅ {name}:success status={response.status_code} rows={entry['count']} total={total_time:.3f}s")
+        return response
     except Exception as e:
         total_time = (datetime.now(timezone.utc) - start_time).total_seconds()
-        app.logger.exception(f"❌ get_classification_types:error {str(e)} total={total_time:.3f}s")
+        app.logger.exception(f"❌ {name}:error {str(e)} total={total_time:.3f}s")
         return jsonify({"error": "database_query_failed", "message": str(e)}), 500
-    finally:
-        if conn:
-            db_pool.putconn(conn)
+
+@app.get("/persona-test-types")
+def get_persona_test_types():
+    return _serve_reference_data("persona-test-types")
+
+@app.get("/classification-types")
+def get_classification_types():
+    return _serve_reference_data("classification-types")
+
+@app.post("/reference-data/invalidate")
+@jwt_required()
+def invalidate_reference_data(user_payload):
+    """
+    Drop this worker's cached lookup tables after editing them in the database (EXPORT_ADMIN_EMAILS only).
+    Other workers reload within REFERENCE_DATA_TTL_SEC.
+    """
+    user_email = (user_payload.get('email') or '').lower()
+    if user_email not in EXPORT_ADMIN_EMAILS:
+        app.logger.warning(f"⚠️  reference:invalidate: {user_email} is not allowed to flush the reference cache")
+        return jsonify({"error": "Only support admins can invalidate reference data"}), 403
+
+    name = (request.get_json(silent=True) or {}).get("name")
+    if name and name not in REFERENCE_QUERIES:
+        return jsonify({"error": "unknown_reference_data", "valid": sorted(REFERENCE_QUERIES)}), 400
+    invalidate_reference_cache(name)
+    app.logger.info(f"🗑️  reference:invalidate requested by {user_payload.get('email')}")
+    return jsonify({"success": True, "invalidated": name or "all", "pid": os.getpid()}), 200
+
+warm_reference_cache()
 
 @app.post("/base-information")
 def save_base_information():
@@ -1521,6 +2501,7 @@ def save_base_information():
                         cached_analysis_detailed = NULL,
                         analysis_cached_at = NULL,
                         source_document = NULL,
+                        source_index = NULL,
                         source_url = NULL,
                         source_retrieved_at = NULL
                     WHERE user_id = %s
@@ -1599,6 +2580,8 @@ def save_base_information():
                     app.logger.info(f"🔄 Background: Starting web scraping + analysis generation for user {saved_user_id}")
                     
                     # STEP 0: Fetch web sources (ClinVar + MedlinePlus)
+                    source_document = None
+                    source_index = None
                     app.logger.info(f"🌐 Background: Fetching ClinVar and MedlinePlus data for {saved_gene} {saved_mutation}")
                     try:
                         web_results = search_all_sources(saved_gene, saved_mutation)
@@ -1613,18 +2596,20 @@ def save_base_information():
                         source_url = "; ".join(urls) if urls else None
                         source_document = web_results.get("combined_text") if urls else None
                         
-                        # Store web sources in database
+                        # Store web sources (and their retrieval index) in database
                         if source_document:
+                            source_index = source_retrieval.build_index(source_document)
                             bg_conn_web = db_pool.getconn()
                             try:
                                 with bg_conn_web.cursor() as bg_cur_web:
                                     bg_cur_web.execute('''
                                         UPDATE gencom.base_information
                                         SET source_document = %s,
+                                            source_index = %s::jsonb,
                                             source_url = %s,
                                             source_retrieved_at = (now() at time zone 'utc')
                                         WHERE user_id = %s
-                                    ''', (source_document, source_url, saved_user_id))
+                                    ''', (source_document, json.dumps(source_index), source_url, saved_user_id))
                                     bg_conn_web.commit()
                                 app.logger.info(f"✅ Background: Stored web sources for user {saved_user_id} from {', '.join(web_results['sources_used'])}")
                             finally:
@@ -1637,57 +2622,32 @@ def save_base_information():
                         # Continue with LLM analysis even if web scraping fails
                     
                     # STEP 1: Generate BASIC analysis (condition, risk, description)
-                    basic_prompt = f"""You are a professional genetic counselor providing educational information about genetic test results. 
-
-Given the following genetic information:
-- Gene: {saved_gene}
-- Variant/Mutation: {saved_mutation}
-- Classification: {saved_classification}
-
-Please provide a BRIEF initial analysis in the following JSON format:
-
-{{
-  "condition": "Primary condition name associated with this gene variant",
-  "riskLevel": "High/Moderate/Low",
-  "description": "A clear, patient-friendly 2-3 sentence description of what this variant means"
-}}
-
-CRITICAL: Respond ONLY with the JSON object, no additional text."""
+                    basic_prompt = build_basic_analysis_prompt(saved_gene, saved_mutation, saved_classification)
+                    context_document = build_context_document(source_document, source_index,
+                                                              [source_retrieval.section_query("basic", saved_gene, saved_mutation)])
                     
                     llm_response = call_custom_llm(
                         user_message=basic_prompt,
-                        max_tokens=1024,
                         stream=False,
-                        response_format="json"
+                        response_format="json",
+                        response_schema="basic",
+                        call_site="background",
+                        system_instruction=COUNSELOR_SYSTEM_INSTRUCTION,
+                        context_document=context_document
                     )
                     
                     basic_data = None
                     if "choices" in llm_response and len(llm_response["choices"]) > 0:
                         ai_content = llm_response["choices"][0].get("message", {}).get("content", "")
                         
-                        # Parse JSON from LLM response
-                        cleaned_content = ai_content.strip()
-                        if cleaned_content.startswith("```json"):
-                            cleaned_content = cleaned_content[7:]
-                        if cleaned_content.startswith("```"):
-                            cleaned_content = cleaned_content[3:]
-                        if cleaned_content.endswith("```"):
-                            cleaned_content = cleaned_content[:-3]
-                        cleaned_content = cleaned_content.strip()
-                        
-                        basic_data = json.loads(cleaned_content)
+                        basic_data = parse_analysis(ai_content, "basic", saved_gene, saved_mutation, saved_classification)
                         
                         # Cache basic result
                         basic_json = json.dumps(basic_data)
                         bg_conn = db_pool.getconn()
                         try:
                             with bg_conn.cursor() as bg_cur:
-                                bg_cur.execute('''
-                                    UPDATE gencom.base_information
-                                    SET cached_analysis_basic = %s,
-                                        analysis_cached_at = (now() at time zone 'utc')
-                                    WHERE user_id = %s
-                                ''', (basic_json, saved_user_id))
+                                bg_cur.execute(UPDATE_BASIC_CACHE_SQL, (basic_json, BASIC_PROMPT_FINGERPRINT, saved_user_id))
                                 bg_conn.commit()
                             
                             app.logger.info(f"✅ Background: Cached basic analysis for user {saved_user_id}: condition={basic_data.get('condition')}")
@@ -1697,70 +2657,31 @@ CRITICAL: Respond ONLY with the JSON object, no additional text."""
                     # STEP 2: Generate DETAILED analysis (implications, recommendations, resources)
                     app.logger.info(f"🔄 Background: Starting detailed analysis generation for user {saved_user_id}")
                     
-                    detailed_prompt = f"""You are a professional genetic counselor providing educational information about genetic test results. 
-
-Given the following genetic information:
-- Gene: {saved_gene}
-- Variant/Mutation: {saved_mutation}
-- Classification: {saved_classification}
-
-Please provide DETAILED guidance in the following JSON format:
-
-{{
-  "implications": [
-    "First health implication",
-    "Second health implication",
-    "Third health implication",
-    "Fourth health implication"
-  ],
-  "recommendations": [
-    "First recommended action",
-    "Second recommended action",
-    "Third recommended action",
-    "Fourth recommended action"
-  ],
-  "resources": [
-    "First educational resource name",
-    "Second educational resource name",
-    "Third educational resource name",
-    "Fourth educational resource name"
-  ]
-}}
-
-CRITICAL: Respond ONLY with the JSON object, no additional text."""
+                    detailed_prompt = build_detailed_analysis_prompt(saved_gene, saved_mutation, saved_classification)
+                    context_document = build_context_document(source_document, source_index,
+                                                              [source_retrieval.section_query("detailed", saved_gene, saved_mutation)])
                     
                     llm_response_detailed = call_custom_llm(
                         user_message=detailed_prompt,
-                        max_tokens=2048,
                         stream=False,
-                        response_format="json"
+                        response_format="json",
+                        response_schema="detailed",
+                        call_site="background",
+                        system_instruction=COUNSELOR_SYSTEM_INSTRUCTION,
+                        context_document=context_document
                     )
                     
                     if "choices" in llm_response_detailed and len(llm_response_detailed["choices"]) > 0:
                         ai_content_detailed = llm_response_detailed["choices"][0].get("message", {}).get("content", "")
                         
-                        # Parse JSON from LLM response
-                        cleaned_detailed = ai_content_detailed.strip()
-                        if cleaned_detailed.startswith("```json"):
-                            cleaned_detailed = cleaned_detailed[7:]
-                        if cleaned_detailed.startswith("```"):
-                            cleaned_detailed = cleaned_detailed[3:]
-                        if cleaned_detailed.endswith("```"):
-                            cleaned_detailed = cleaned_detailed[:-3]
-                        cleaned_detailed = cleaned_detailed.strip()
-                        
-                        detailed_data = json.loads(cleaned_detailed)
+                        detailed_data = parse_analysis(ai_content_detailed, "detailed", saved_gene, saved_mutation, saved_classification)
                         
                         # Cache detailed result
                         detailed_json = json.dumps(detailed_data)
                         bg_conn_detailed = db_pool.getconn()
                         try:
                             with bg_conn_detailed.cursor() as bg_cur_detailed:
-                                bg_cur_detailed.execute('''
-                                    UPDATE gencom.base_information
-                                    SET cached_analysis_detailed = %s
-                                    WHERE user_id = %s
-                                ''', (detailed_json, saved_user_id))
+                                bg_cur_detailed.execute(UPDATE_DETAILED_CACHE_SQL, (detailed_json, DETAILED_PROMPT_FINGERPRINT, saved_user_id))
                                 bg_conn_detailed.commit()
                             
                             app.logger.info(f"✅ Background: Cached detailed analysis for user {saved_user_id}")
@@ -1822,7 +2743,7 @@ def get_base_information(user_id):
                     bi.gene,
                     bi.mutation,
                     bi.uploaded,
-                    bi.cached_analysis,
+                    bi.cached_analysis::text AS cached_analysis,
                     bi.analysis_cached_at,
                     ptt.persona_test_type,
                     ct.classification_type
@@ -1913,6 +2834,7 @@ def auth_login():
         if user:
             user_id = str(user['id'])
             company_id = str(user['company_id']) if user['company_id'] else None
+            user_id_cache.set(email, user_id)
             
             # Time: JWT token creation
             jwt_start = datetime.now(timezone.utc)
@@ -1970,16 +2892,7 @@ def get_condition_analysis_basic(user_id):
         conn = db_pool.getconn()
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             # Fetch user's saved genetic information
-            cur.execute('''
-                SELECT 
-                    bi.gene,
-                    bi.mutation,
-                    ct.classification_type
-                FROM gencom.base_information bi
-                JOIN gencom.classification_type ct 
-                    ON bi.classification_type_id = ct.classification_type_id
-                WHERE bi.user_id = %s
-            ''', (user_id,))
+            cur.execute(GENETIC_INFO_SQL, (user_id,))
             
             result = cur.fetchone()
             
@@ -1999,12 +2912,7 @@ def get_condition_analysis_basic(user_id):
             app.logger.info(f"📊 Retrieved: gene={gene}, mutation={mutation}, classification={classification}")
             
             # Check cache for basic info
-            cur.execute('''
-                SELECT cached_analysis_basic, analysis_cached_at
-                FROM gencom.base_information
-                WHERE user_id = %s 
-                  AND cached_analysis_basic IS NOT NULL
-            ''', (user_id,))
+            cur.execute(BASIC_CACHE_SQL, (user_id, BASIC_PROMPT_FINGERPRINT))
             
             cached_result = cur.fetchone()
             
@@ -2020,47 +2928,29 @@ def get_condition_analysis_basic(user_id):
                     app.logger.info(f"📦 Found cached basic analysis (age: {cache_age.days} days)")
                 
                 if cache_valid:
-                    try:
-                        cached_data = json.loads(cached_result["cached_analysis_basic"])
-                        app.logger.info("✅ Returning cached basic analysis (fast path)")
-                        return jsonify(cached_data), 200
-                    except json.JSONDecodeError:
-                        app.logger.warning("⚠️ Invalid cached JSON, regenerating...")
+                    etag = cached_result["cache_etag"]
+                    if etag_matches(etag):
+                        app.logger.info("✅ Cached basic analysis not modified (304)")
+                        return not_modified_response(etag, ANALYSIS_CACHE_CONTROL)
+                    app.logger.info("✅ Returning cached basic analysis (fast path)")
+                    return with_etag(raw_json_response(cached_result["cached_analysis_basic"]), etag, ANALYSIS_CACHE_CONTROL)
             
             # No valid cache - generate new basic analysis
             app.logger.info("🤖 Calling custom LLM for BASIC condition analysis...")
             
-            # PART 1: Basic prompt (fast response - only condition, risk, description)
-            prompt = f"""You are a professional genetic counselor providing educational information about genetic test results. 
-
-Given the following genetic information:
-- Gene: {gene}
-- Variant/Mutation: {mutation}
-- Classification: {classification}
-
-Please provide a BRIEF initial analysis in the following JSON format:
-
-{{
-  "condition": "Primary condition name associated with this gene variant",
-  "riskLevel": "High/Moderate/Low",
-  "description": "A clear, patient-friendly 2-3 sentence description of what this variant means"
-}}
-
-Important guidelines:
-- Use clear, non-technical language suitable for patients
-- Base risk level on the classification: Pathogenic/Likely Pathogenic = High, VUS = Moderate, Benign/Likely Benign = Low
-- Be compassionate and supportive in tone
-- Provide specific, evidence-based information
-
-CRITICAL: Respond ONLY with the JSON object, no additional text."""
+            prompt = build_basic_analysis_prompt(gene, mutation, classification)
+            context_document = fetch_context_document(cur, user_id, "basic", gene, mutation)
 
             try:
                 # Call custom LLM with smaller max_tokens for faster response
                 llm_response = call_custom_llm(
                     user_message=prompt,
-                    max_tokens=1024,  # Increased to avoid truncation
                     stream=False,
-                    response_format="json"
+                    response_format="json",
+                    response_schema="basic",
+                    call_site="basic",
+                    system_instruction=COUNSELOR_SYSTEM_INSTRUCTION,
+                    context_document=context_document
                 )
                 
                 # Extract the assistant's message
@@ -2070,17 +2960,7 @@ CRITICAL: Respond ONLY with the JSON object, no additional text."""
                     
                     # Parse the JSON response
                     try:
-                        # Clean the response (remove markdown code blocks if present)
-                        cleaned_content = ai_content.strip()
-                        if cleaned_content.startswith("```json"):
-                            cleaned_content = cleaned_content[7:]
-                        if cleaned_content.startswith("```"):
-                            cleaned_content = cleaned_content[3:]
-                        if cleaned_content.endswith("```"):
-                            cleaned_content = cleaned_content[:-3]
-                        cleaned_content = cleaned_content.strip()
-                        
-                        condition_data = json.loads(cleaned_content)
+                        condition_data = parse_analysis(ai_content, "basic", gene, mutation, classification)
                         
                         # Add the gene, mutation, and classification to the response
                         condition_data["gene"] = gene
@@ -2090,12 +2970,7 @@ CRITICAL: Respond ONLY with the JSON object, no additional text."""
                         # Cache the basic analysis
                         try:
                             cache_json = json.dumps(condition_data)
-                            cur.execute('''
-                                UPDATE gencom.base_information
-                                SET cached_analysis_basic = %s,
-                                    analysis_cached_at = (now() at time zone 'utc')
-                                WHERE user_id = %s
-                            ''', (cache_json, user_id))
+                            cur.execute(UPDATE_BASIC_CACHE_SQL, (cache_json, BASIC_PROMPT_FINGERPRINT, user_id))
                             conn.commit()
                             app.logger.info("💾 Basic analysis cached to database")
                         except Exception as cache_error:
@@ -2104,13 +2979,13 @@ CRITICAL: Respond ONLY with the JSON object, no additional text."""
                         app.logger.info(f"✅ condition_analysis:basic:success condition={condition_data.get('condition')}")
                         return jsonify(condition_data), 200
                         
-                    except json.JSONDecodeError as je:
+                    except llm_json.LLMResponseError as je:
                         app.logger.error(f"❌ Failed to parse LLM response as JSON: {je}")
-                        app.logger.error(f"Raw response (first 500 chars): {ai_content[:500]}")
+                        app.logger.error(f"Raw response (first 500 chars): {je.raw}")
                         return jsonify({
                             "error": "invalid_llm_response", 
-                            "message": "The AI returned an invalid format",
-                            "raw": ai_content[:500]
+                            "message": str(je),
+                            "raw": je.raw
                         }), 500
                 else:
                     app.logger.error("❌ No choices in LLM response")
@@ -2154,16 +3029,7 @@ def get_condition_analysis_detailed(user_id):
         conn = db_pool.getconn()
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             # Fetch user's saved genetic information
-            cur.execute('''
-                SELECT 
-                    bi.gene,
-                    bi.mutation,
-                    ct.classification_type
-                FROM gencom.base_information bi
-                JOIN gencom.classification_type ct 
-                    ON bi.classification_type_id = ct.classification_type_id
-                WHERE bi.user_id = %s
-            ''', (user_id,))
+            cur.execute(GENETIC_INFO_SQL, (user_id,))
             
             result = cur.fetchone()
             
@@ -2178,74 +3044,35 @@ def get_condition_analysis_detailed(user_id):
             app.logger.info(f"📊 Retrieved: gene={gene}, mutation={mutation}, classification={classification}")
             
             # Check cache for detailed info
-            cur.execute('''
-                SELECT cached_analysis_detailed
-                FROM gencom.base_information
-                WHERE user_id = %s 
-                  AND cached_analysis_detailed IS NOT NULL
-            ''', (user_id,))
+            cur.execute(DETAILED_CACHE_SQL, (user_id, DETAILED_PROMPT_FINGERPRINT))
             
             cached_result = cur.fetchone()
             
             # Use cache if it exists
             if cached_result and cached_result.get("cached_analysis_detailed"):
-                try:
-                    cached_data = json.loads(cached_result["cached_analysis_detailed"])
-                    app.logger.info("✅ Returning cached detailed analysis (fast path)")
-                    return jsonify(cached_data), 200
-                except json.JSONDecodeError:
-                    app.logger.warning("⚠️ Invalid cached JSON, regenerating...")
+                etag = cached_result["cache_etag"]
+                if etag_matches(etag):
+                    app.logger.info("✅ Cached detailed analysis not modified (304)")
+                    return not_modified_response(etag, ANALYSIS_CACHE_CONTROL)
+                app.logger.info("✅ Returning cached detailed analysis (fast path)")
+                return with_etag(raw_json_response(cached_result["cached_analysis_detailed"]), etag, ANALYSIS_CACHE_CONTROL)
             
             # No valid cache - generate new detailed analysis
             app.logger.info("🤖 Calling custom LLM for DETAILED condition analysis...")
             
-            # PART 2: Detailed prompt (implications, recommendations, resources)
-            prompt = f"""You are a professional genetic counselor providing educational information about genetic test results. 
-
-Given the following genetic information:
-- Gene: {gene}
-- Variant/Mutation: {mutation}
-- Classification: {classification}
-
-Please provide DETAILED guidance in the following JSON format:
-
-{{
-  "implications": [
-    "First health implication",
-    "Second health implication",
-    "Third health implication",
-    "Fourth health implication"
-  ],
-  "recommendations": [
-    "First recommended action",
-    "Second recommended action",
-    "Third recommended action",
-    "Fourth recommended action"
-  ],
-  "resources": [
-    "First educational resource name",
-    "Second educational resource name",
-    "Third educational resource name",
-    "Fourth educational resource name"
-  ]
-}}
-
-Important guidelines:
-- Use clear, non-technical language suitable for patients
-- Focus on actionable information
-- Include both risks and positive steps they can take
-- Be compassionate and supportive in tone
-- Provide specific, evidence-based information
-
-CRITICAL: Respond ONLY with the JSON object, no additional text."""
+            prompt = build_detailed_analysis_prompt(gene, mutation, classification)
+            context_document = fetch_context_document(cur, user_id, "detailed", gene, mutation)
 
             try:
                 # Call custom LLM
                 llm_response = call_custom_llm(
                     user_message=prompt,
-                    max_tokens=2048,
                     stream=False,
-                    response_format="json"
+                    response_format="json",
+                    response_schema="detailed",
+                    call_site="detailed",
+                    system_instruction=COUNSELOR_SYSTEM_INSTRUCTION,
+                    context_document=context_document
                 )
                 
                 # Extract the assistant's message
@@ -2255,26 +3082,12 @@ CRITICAL: Respond ONLY with the JSON object, no additional text."""
                     
                     # Parse the JSON response
                     try:
-                        # Clean the response
-                        cleaned_content = ai_content.strip()
-                        if cleaned_content.startswith("```json"):
-                            cleaned_content = cleaned_content[7:]
-                        if cleaned_content.startswith("```"):
-                            cleaned_content = cleaned_content[3:]
-                        if cleaned_content.endswith("```"):
-                            cleaned_content = cleaned_content[:-3]
-                        cleaned_content = cleaned_content.strip()
-                        
-                        condition_data = json.loads(cleaned_content)
+                        condition_data = parse_analysis(ai_content, "detailed", gene, mutation, classification)
                         
                         # Cache the detailed analysis
                         try:
                             cache_json = json.dumps(condition_data)
-                            cur.execute('''
-                                UPDATE gencom.base_information
-                                SET cached_analysis_detailed = %s
-                                WHERE user_id = %s
-                            ''', (cache_json, user_id))
+                            cur.execute(UPDATE_DETAILED_CACHE_SQL, (cache_json, DETAILED_PROMPT_FINGERPRINT, user_id))
                             conn.commit()
                             app.logger.info("💾 Detailed analysis cached to database")
                         except Exception as cache_error:
@@ -2283,13 +3096,13 @@ CRITICAL: Respond ONLY with the JSON object, no additional text."""
                         app.logger.info(f"✅ condition_analysis:detailed:success")
                         return jsonify(condition_data), 200
                         
-                    except json.JSONDecodeError as je:
+                    except llm_json.LLMResponseError as je:
                         app.logger.error(f"❌ Failed to parse LLM response as JSON: {je}")
-                        app.logger.error(f"Raw response (first 500 chars): {ai_content[:500]}")
+                        app.logger.error(f"Raw response (first 500 chars): {je.raw}")
                         return jsonify({
                             "error": "invalid_llm_response", 
-                            "message": "The AI returned an invalid format",
-                            "raw": ai_content[:500]
+                            "message": str(je),
+                            "raw": je.raw
                         }), 500
                 else:
                     app.logger.error("❌ No choices in LLM response")
@@ -2332,16 +3145,7 @@ def get_condition_analysis(user_id):
         conn = db_pool.getconn()
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             # Fetch user's saved genetic information
-            cur.execute('''
-                SELECT 
-                    bi.gene,
-                    bi.mutation,
-                    ct.classification_type
-                FROM gencom.base_information bi
-                JOIN gencom.classification_type ct 
-                    ON bi.classification_type_id = ct.classification_type_id
-                WHERE bi.user_id = %s
-            ''', (user_id,))
+            cur.execute(GENETIC_INFO_SQL, (user_id,))
             
             result = cur.fetchone()
             
@@ -2361,12 +3165,7 @@ def get_condition_analysis(user_id):
             app.logger.info(f"📊 Retrieved: gene={gene}, mutation={mutation}, classification={classification}")
             
             # Check if we have cached analysis for this gene/mutation combo
-            cur.execute('''
-                SELECT cached_analysis, analysis_cached_at
-                FROM gencom.base_information
-                WHERE user_id = %s 
-                  AND cached_analysis IS NOT NULL
-            ''', (user_id,))
+            cur.execute(FULL_CACHE_SQL, (user_id, FULL_PROMPT_FINGERPRINT))
             
             cached_result = cur.fetchone()
             
@@ -2382,59 +3181,18 @@ def get_condition_analysis(user_id):
                     app.logger.info(f"📦 Found cached analysis (age: {cache_age.days} days)")
                 
                 if cache_valid:
-                    try:
-                        cached_data = json.loads(cached_result["cached_analysis"])
-                        app.logger.info("✅ Returning cached analysis (fast path)")
-                        return jsonify(cached_data), 200
-                    except json.JSONDecodeError:
-                        app.logger.warning("⚠️ Invalid cached JSON, regenerating...")
+                    etag = cached_result["cache_etag"]
+                    if etag_matches(etag):
+                        app.logger.info("✅ Cached analysis not modified (304)")
+                        return not_modified_response(etag, ANALYSIS_CACHE_CONTROL)
+                    app.logger.info("✅ Returning cached analysis (fast path)")
+                    return with_etag(raw_json_response(cached_result["cached_analysis"]), etag, ANALYSIS_CACHE_CONTROL)
             
             # No valid cache - generate new analysis
             app.logger.info("🤖 Calling custom LLM for condition analysis...")
             
-            # Construct the AI prompt for genetic counseling
-            prompt = f"""You are a professional genetic counselor providing educational information about genetic test results. 
-
-Given the following genetic information:
-- Gene: {gene}
-- Variant/Mutation: {mutation}
-- Classification: {classification}
-
-Please provide a comprehensive analysis in the following JSON format:
-
-{{
-  "condition": "Primary condition name associated with this gene variant",
-  "riskLevel": "High/Moderate/Low",
-  "description": "A clear, patient-friendly 2-3 sentence description of what this variant means",
-  "implications": [
-    "First health implication",
-    "Second health implication",
-    "Third health implication",
-    "Fourth health implication"
-  ],
-  "recommendations": [
-    "First recommended action",
-    "Second recommended action",
-    "Third recommended action",
-    "Fourth recommended action"
-  ],
-  "resources": [
-    "First educational resource name",
-    "Second educational resource name",
-    "Third educational resource name",
-    "Fourth educational resource name"
-  ]
-}}
-
-Important guidelines:
-- Use clear, non-technical language suitable for patients
-- Base risk level on the classification: Pathogenic/Likely Pathogenic = High, VUS = Moderate, Benign/Likely Benign = Low
-- Focus on actionable information
-- Include both risks and positive steps they can take
-- Be compassionate and supportive in tone
-- Provide specific, evidence-based information
-
-CRITICAL: Respond ONLY with the JSON object, no additional text."""
+            prompt = build_full_analysis_prompt(gene, mutation, classification)
+            context_document = fetch_context_document(cur, user_id, "full", gene, mutation)
 
             app.logger.info("🤖 Calling custom LLM for condition analysis...")
             
@@ -2442,9 +3200,12 @@ CRITICAL: Respond ONLY with the JSON object, no additional text."""
                 # Call custom LLM
                 llm_response = call_custom_llm(
                     user_message=prompt,
-                    max_tokens=2048,
                     stream=False,
-                    response_format="json"
+                    response_format="json",
+                    response_schema="full",
+                    call_site="legacy",
+                    system_instruction=COUNSELOR_SYSTEM_INSTRUCTION,
+                    context_document=context_document
                 )
                 
                 # Extract the assistant's message
@@ -2454,17 +3215,7 @@ CRITICAL: Respond ONLY with the JSON object, no additional text."""
                     
                     # Parse the JSON response
                     try:
-                        # Clean the response (remove markdown code blocks if present)
-                        cleaned_content = ai_content.strip()
-                        if cleaned_content.startswith("```json"):
-                            cleaned_content = cleaned_content[7:]
-                        if cleaned_content.startswith("```"):
-                            cleaned_content = cleaned_content[3:]
-                        if cleaned_content.endswith("```"):
-                            cleaned_content = cleaned_content[:-3]
-                        cleaned_content = cleaned_content.strip()
-                        
-                        condition_data = json.loads(cleaned_content)
+                        condition_data = parse_analysis(ai_content, "full", gene, mutation, classification)
                         
                         # Add the gene, mutation, and classification to the response
                         condition_data["gene"] = gene
@@ -2474,12 +3225,7 @@ CRITICAL: Respond ONLY with the JSON object, no additional text."""
                         # Cache the analysis in the database for future requests
                         try:
                             cache_json = json.dumps(condition_data)
-                            cur.execute('''
-                                UPDATE gencom.base_information
-                                SET cached_analysis = %s,
-                                    analysis_cached_at = (now() at time zone 'utc')
-                                WHERE user_id = %s
-                            ''', (cache_json, user_id))
+                            cur.execute(UPDATE_FULL_CACHE_SQL, (cache_json, FULL_PROMPT_FINGERPRINT, user_id))
                             conn.commit()
                             app.logger.info("💾 Analysis cached to database for faster future access")
                         except Exception as cache_error:
@@ -2489,13 +3235,13 @@ CRITICAL: Respond ONLY with the JSON object, no additional text."""
                         app.logger.info(f"✅ condition_analysis:success condition={condition_data.get('condition')}")
                         return jsonify(condition_data), 200
                         
-                    except json.JSONDecodeError as je:
+                    except llm_json.LLMResponseError as je:
                         app.logger.error(f"❌ Failed to parse LLM response as JSON: {je}")
-                        app.logger.error(f"Raw response (first 500 chars): {ai_content[:500]}")
+                        app.logger.error(f"Raw response (first 500 chars): {je.raw}")
                         return jsonify({
                             "error": "invalid_llm_response", 
-                            "message": "The AI returned an invalid format",
-                            "raw": ai_content[:500]
+                            "message": str(je),
+                            "raw": je.raw
                         }), 500
                 else:
                     app.logger.error("❌ No choices in LLM response")
@@ -2583,6 +3329,7 @@ def get_source_documentation(user_payload):
             db_pool.putconn(conn)
 
 if __name__ == "__main__":
+    gemini_prewarmer.start()
     app.run(port=8081, debug=True)
 
 
@@ -0,0 +1,559 @@
+"""
+ASGI entry point - async execution mode for the I/O-bound hot endpoints.
+
+The endpoints that spend their time waiting on Postgres, Gemini or Tavus are
+served by native async handlers below (psycopg3 async pool, Gemini client.aio,
+httpx). Every other route falls through to the unchanged Flask app in app.py,
+which runs on a small thread pool. One worker can therefore hold hundreds of
+in-flight LLM waits without a thread per request.
+
+Run:
+    uvicorn asgi:application --host 0.0.0.0 --port 8081
+    GUNICORN_WORKER_CLASS=uvicorn gunicorn -c gunicorn.conf.py asgi:application
+
+The async handlers reuse the SQL, prompts, JWT handling and JSON provider from
+app.py so both serving modes return identical responses.
+"""
+import asyncio
+import json
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl
+
+import httpx
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from uvicorn.middleware.wsgi import WSGIMiddleware
+
+import app as backend
+import http_compression
+
+logger = backend.app.logger
+
+# Threads serving the Flask (WSGI) routes; matches the gthread sizing so the
+# psycopg2 pool from gunicorn.conf.py covers them
+WSGI_THREADS = int(os.getenv("GUNICORN_THREADS", "8"))
+# Async pool: connections are held only while a query runs, never across an LLM wait
+ASYNC_DB_POOL_MAXCONN = int(os.getenv("ASYNC_DB_POOL_MAXCONN", "20"))
+
+async_db_pool = None
+http_client = None
+_prewarm_task = None
+
+flask_app = WSGIMiddleware(backend.app, workers=WSGI_THREADS)
+
+
+# ============================================================================
+# REQUEST / RESPONSE HELPERS
+# ============================================================================
+class AsyncRequest:
+    """Minimal request view over an ASGI http scope"""
+
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self._receive = receive
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        self.args = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+
+    async def body(self) -> bytes:
+        chunks = []
+        while True:
+            message = await self._receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+
+def _cors_headers(request: AsyncRequest):
+    """Mirror the flask-cors configuration in app.py (credentials allowed, origin echoed, ETag exposed)"""
+    origin = request.headers.get("origin")
+    if not origin:
+        return []
+    allowed = [o.strip() for o in backend.CORS_ORIGINS.split(",")]
+    if "*" not in allowed and origin not in allowed:
+        return []
+    return [
+        (b"access-control-allow-origin", origin.encode("latin-1")),
+        (b"access-control-allow-credentials", b"true"),
+        (b"access-control-expose-headers", b"ETag"),
+        (b"vary", b"Origin"),
+    ]
+
+
+def _json_body(payload) -> bytes:
+    """Flask's JSON provider keeps datetime/UUID formatting identical to jsonify"""
+    provider = backend.app.json
+    if hasattr(provider, "dumpb"):
+        return provider.dumpb(payload) + b"\n"
+    return (provider.dumps(payload, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class JSONResponse:
+    def __init__(self, payload, status: int = 200, headers: dict = None):
+        self.body = _json_body(payload)
+        self.status = status
+        self.headers = headers or {}
+
+    async def send(self, send, request: AsyncRequest):
+        body = self.body
+        headers = dict(self.headers)
+        if self.status != 304 and backend.COMPRESSION_MIN_BYTES > 0:
+            # Same negotiation as the Flask after_request hook (http_compression.init_app)
+            body, encoding = http_compression.compress_body(
+                body, "application/json", request.headers.get("accept-encoding"),
+                backend.COMPRESSION_MIN_BYTES, backend.COMPRESSION_GZIP_LEVEL,
+                backend.COMPRESSION_BROTLI_QUALITY, backend.COMPRESSION_BROTLI_ENABLED,
+            )
+            if encoding:
+                headers["Content-Encoding"] = encoding
+                if "ETag" in headers:
+                    headers["ETag"] = http_compression.weaken_etag(headers["ETag"])
+        if backend.COMPRESSION_MIN_BYTES > 0:
+            headers["Vary"] = "Accept-Encoding"
+        raw_headers = []
+        if self.status != 304:
+            raw_headers += [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ]
+        raw_headers += [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+        raw_headers += _cors_headers(request)
+        await send({"type": "http.response.start", "status": self.status, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+class RawJSONResponse(JSONResponse):
+    """JSON text that is already serialized (e.g. a JSONB column read as ::text), sent as-is"""
+
+    def __init__(self, body: str, status: int = 200, headers: dict = None):
+        self.body = body.encode("utf-8")
+        self.status = status
+        self.headers = headers or {}
+
+
+class NotModifiedResponse(JSONResponse):
+    """304 with the current ETag; mirrors app.not_modified_response"""
+
+    def __init__(self, etag: str, cache_control: str):
+        self.body = b""
+        self.status = 304
+        self.headers = _etag_headers(etag, cache_control)
+
+
+def _etag_headers(etag: str, cache_control: str):
+    return {"ETag": f'"{etag}"', "Cache-Control": cache_control}
+
+
+def _etag_matches(request: AsyncRequest, etag: str) -> bool:
+    """Weak If-None-Match comparison, as app.etag_matches (werkzeug) does"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/").strip('"') == etag for tag in tags)
+
+
+def _authenticate(request: AsyncRequest, optional: bool):
+    """Returns (payload, error_response)"""
+    payload, error = backend.resolve_jwt_payload(request.headers.get("authorization"), optional, request.path)
+    if error:
+        return None, JSONResponse({"error": "unauthorized", "message": error}, 401)
+    return payload, None
+
+
+async def _request_user_id(user_payload: dict):
+    """JWT sub, or (tokens without one) the email lookup from app.resolve_request_user_id off the event loop"""
+    if user_payload.get('sub'):
+        return str(user_payload['sub'])
+    return await asyncio.to_thread(backend.resolve_request_user_id, user_payload)
+
+
+# ============================================================================
+# ASYNC HANDLERS
+# ============================================================================
+async def get_recent_transcript(request: AsyncRequest):
+    """Async twin of app.get_recent_transcript (polled every 3 seconds during calls)"""
+    user_payload, error = _authenticate(request, optional=True)
+    if error:
+        return error
+    user_email = user_payload.get('email') if user_payload else None
+
+    if not user_email:
+        logger.warning("⚠️  transcript: No email in JWT")
+        return JSONResponse({"error": "No email in JWT"}, 400)
+
+    if async_db_pool is None:
+        logger.error("❌ transcript: Database not configured")
+        return JSONResponse({"error": "Database not configured"}, 500)
+
+    user_id = await _request_user_id(user_payload)
+    if not user_id:
+        logger.info(f"ℹ️  transcript: No user found for {user_email}")
+        return JSONResponse({"turns": [], "count": 0}, 200)
+
+    try:
+        async with async_db_pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(backend.TRANSCRIPT_VERSION_SQL, (user_id,))
+                etag = backend.transcript_etag(user_id, await cur.fetchone())
+                if _etag_matches(request, etag):
+                    logger.info(f"✅ transcript: Not modified for {user_email}")
+                    return NotModifiedResponse(etag, backend.TRANSCRIPT_CACHE_CONTROL)
+
+                logger.info(f"📋 transcript: Fetching recent conversations for {user_email} (async)")
+                await cur.execute(backend.TRANSCRIPT_SQL, (user_id,))
+                turns = await cur.fetchall()
+
+        logger.info(f"✅ transcript: Fetched {len(turns)} turns for {user_email}")
+        return JSONResponse({"turns": turns, "count": len(turns)}, 200,
+                            _etag_headers(etag, backend.TRANSCRIPT_CACHE_CONTROL))
+    except Exception as e:
+        logger.error(f"❌ transcript: Error fetching: {e}")
+        return JSONResponse({"error": str(e)}, 500)
+
+
+async def get_recent_tavus_conversation(request: AsyncRequest):
+    """Async twin of app.get_recent_tavus_conversation"""
+    user_payload, error = _authenticate(request, optional=False)
+    if error:
+        return error
+    user_email = user_payload.get('email')
+
+    if not user_email:
+        logger.warning("⚠️  recent-conversation: No email in JWT")
+        return JSONResponse({"error": "No email in JWT"}, 400)
+
+    if async_db_pool is None:
+        logger.error("❌ recent-conversation: Database not configured")
+        return JSONResponse({"error": "Database not configured"}, 500)
+
+    user_id = await _request_user_id(user_payload)
+    if not user_id:
+        logger.info(f"ℹ️  recent-conversation: No user found for {user_email}")
+        return JSONResponse({"found": False}, 200)
+
+    try:
+        async with async_db_pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(backend.RECENT_CONVERSATION_SQL, (user_id,))
+                result = await cur.fetchone()
+
+        if result:
+            conversation_id = result['tavus_conversation_id']
+            created_at = result['created_at']
+            logger.info(f"✅ recent-conversation: Found {conversation_id} for {user_email} (created: {created_at})")
+            return JSONResponse({
+                "conversation_id": conversation_id,
+                "created_at": created_at.isoformat() if created_at else None,
+                "found": True
+            }, 200)
+
+        logger.info(f"ℹ️  recent-conversation: No previous conversation found for {user_email}")
+        return JSONResponse({"found": False}, 200)
+    except Exception as e:
+        logger.error(f"❌ recent-conversation: Error fetching: {e}")
+        return JSONResponse({"error": str(e)}, 500)
+
+
+async def _fetch_genetic_info(user_id: str, cache_sql: str, prompt_fingerprint: str):
+    """Returns (genetic_info_row, cached_row) using one short-lived pooled connection"""
+    async with async_db_pool.connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(backend.GENETIC_INFO_SQL, (user_id,))
+            result = await cur.fetchone()
+            if not result:
+                return None, None
+            await cur.execute(cache_sql, (user_id, prompt_fingerprint))
+            return result, await cur.fetchone()
+
+
+async def _fetch_context_document(user_id: str, section: str, gene: str, mutation: str):
+    """Grounding block for one analysis section (only fetched when generating)"""
+    async with async_db_pool.connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(backend.SOURCE_DOCUMENT_SQL, (user_id,))
+            row = await cur.fetchone()
+    if not row:
+        return None
+    return backend.build_context_document(row["source_document"], row["source_index"],
+                                          [backend.source_retrieval.section_query(section, gene, mutation)])
+
+
+async def _store_cache(sql: str, params: tuple, label: str):
+    try:
+        async with async_db_pool.connection() as conn:
+            await conn.execute(sql, params)
+        logger.info(f"💾 {label} analysis cached to database")
+    except Exception as cache_error:
+        logger.warning(f"⚠️ Failed to cache {label.lower()} analysis (non-fatal): {cache_error}")
+
+
+async def _generate_analysis(prompt: str, label: str, variant: tuple, context_document: str = None):
+    """Returns (parsed_json, error_response); label is also the llm_json schema, variant (gene, mutation, classification)"""
+    try:
+        llm_response = await backend.call_custom_llm_async(
+            user_message=prompt,
+            stream=False,
+            response_format="json",
+            response_schema=label,
+            call_site=label,
+            system_instruction=backend.COUNSELOR_SYSTEM_INSTRUCTION,
+            context_document=context_document
+        )
+    except ValueError as ve:
+        logger.error(f"❌ Custom LLM configuration error: {ve}")
+        return None, JSONResponse({"error": "llm_not_configured", "message": str(ve)}, 500)
+    except Exception as llm_error:
+        logger.exception(f"❌ Error calling custom LLM: {llm_error}")
+        return None, JSONResponse({"error": "llm_call_failed", "message": str(llm_error)}, 500)
+
+    if not ("choices" in llm_response and len(llm_response["choices"]) > 0):
+        logger.error("❌ No choices in LLM response")
+        return None, JSONResponse({"error": "empty_llm_response", "message": "The AI did not return a response"}, 500)
+
+    ai_content = llm_response["choices"][0].get("message", {}).get("content", "")
+    logger.info(f"✅ Custom LLM {label} response received: {len(ai_content)} chars")
+    try:
+        return await backend.parse_analysis_async(ai_content, label, *variant), None
+    except backend.llm_json.LLMResponseError as je:
+        logger.error(f"❌ Failed to parse LLM response as JSON: {je}")
+        logger.error(f"Raw response (first 500 chars): {je.raw}")
+        return None, JSONResponse({
+            "error": "invalid_llm_response",
+            "message": str(je),
+            "raw": je.raw
+        }, 500)
+
+
+def _invalid_user_id(user_id: str):
+    try:
+        uuid.UUID(str(user_id))
+        return None
+    except ValueError:
+        logger.error(f"Invalid UUID format for user_id: {user_id}")
+        return JSONResponse({"error": "invalid_user_id"}, 400)
+
+
+async def get_condition_analysis_basic(request: AsyncRequest, user_id: str):
+    """
+    Async twin of app.get_condition_analysis_basic.
+    The pooled connection is released before the Gemini call and re-acquired
+    only to write the cache, so slow generations do not hold connections.
+    """
+    if async_db_pool is None:
+        return JSONResponse({"error": "database_not_configured"}, 500)
+
+    logger.info(f"⚡ condition_analysis:basic:request user_id={user_id} (async)")
+
+    try:
+        invalid = _invalid_user_id(user_id)
+        if invalid:
+            return invalid
+
+        result, cached_result = await _fetch_genetic_info(user_id, backend.BASIC_CACHE_SQL, backend.BASIC_PROMPT_FINGERPRINT)
+        if not result:
+            logger.warning(f"⚠️  No base information found for user_id={user_id}")
+            return JSONResponse({"error": "no_genetic_data_found", "message": "Please complete the introductory screen first"}, 404)
+
+        gene = result["gene"]
+        mutation = result["mutation"]
+        classification = result["classification_type"]
+
+        if not gene or not mutation:
+            logger.warning(f"⚠️  Incomplete genetic data for user_id={user_id}")
+            return JSONResponse({"error": "incomplete_genetic_data", "message": "Gene and Mutation are required"}, 400)
+
+        logger.info(f"📊 Retrieved: gene={gene}, mutation={mutation}, classification={classification}")
+
+        # Use cache if it exists and is less than 7 days old
+        if cached_result and cached_result.get("cached_analysis_basic"):
+            cached_at = cached_result.get("analysis_cached_at")
+            cache_valid = False
+            if cached_at:
+                cache_age = datetime.now(timezone.utc) - cached_at
+                cache_valid = cache_age < timedelta(days=7)
+                logger.info(f"📦 Found cached basic analysis (age: {cache_age.days} days)")
+
+            if cache_valid:
+                etag = cached_result["cache_etag"]
+                if _etag_matches(request, etag):
+                    logger.info("✅ Cached basic analysis not modified (304)")
+                    return NotModifiedResponse(etag, backend.ANALYSIS_CACHE_CONTROL)
+                logger.info("✅ Returning cached basic analysis (fast path)")
+                return RawJSONResponse(cached_result["cached_analysis_basic"], 200,
+                                       _etag_headers(etag, backend.ANALYSIS_CACHE_CONTROL))
+
+        logger.info("🤖 Calling custom LLM for BASIC condition analysis...")
+        prompt = backend.build_basic_analysis_prompt(gene, mutation, classification)
+        context_document = await _fetch_context_document(user_id, "basic", gene, mutation)
+        condition_data, error = await _generate_analysis(prompt, "basic", (gene, mutation, classification), context_document)
+        if error:
+            return error
+
+        condition_data["gene"] = gene
+        condition_data["variant"] = mutation
+        condition_data["classification"] = classification
+
+        await _store_cache(backend.UPDATE_BASIC_CACHE_SQL, (json.dumps(condition_data), backend.BASIC_PROMPT_FINGERPRINT, user_id), "Basic")
+
+        logger.info(f"✅ condition_analysis:basic:success condition={condition_data.get('condition')}")
+        return JSONResponse(condition_data, 200)
+
+    except Exception as e:
+        logger.exception(f"❌ condition_analysis:basic:error {type(e).__name__}: {e}")
+        return JSONResponse({"error": "analysis_failed", "message": str(e)}, 500)
+
+
+async def get_condition_analysis_detailed(request: AsyncRequest, user_id: str):
+    """Async twin of app.get_condition_analysis_detailed"""
+    if async_db_pool is None:
+        return JSONResponse({"error": "database_not_configured"}, 500)
+
+    logger.info(f"📋 condition_analysis:detailed:request user_id={user_id} (async)")
+
+    try:
+        invalid = _invalid_user_id(user_id)
+        if invalid:
+            return invalid
+
+        result, cached_result = await _fetch_genetic_info(user_id, backend.DETAILED_CACHE_SQL, backend.DETAILED_PROMPT_FINGERPRINT)
+        if not result:
+            logger.warning(f"⚠️  No base information found for user_id={user_id}")
+            return JSONResponse({"error": "no_genetic_data_found", "message": "Please complete the introductory screen first"}, 404)
+
+        gene = result["gene"]
+        mutation = result["mutation"]
+        classification = result["classification_type"]
+
+        logger.info(f"📊 Retrieved: gene={gene}, mutation={mutation}, classification={classification}")
+
+        if cached_result and cached_result.get("cached_analysis_detailed"):
+            etag = cached_result["cache_etag"]
+            if _etag_matches(request, etag):
+                logger.info("✅ Cached detailed analysis not modified (304)")
+                return NotModifiedResponse(etag, backend.ANALYSIS_CACHE_CONTROL)
+            logger.info("✅ Returning cached detailed analysis (fast path)")
+            return RawJSONResponse(cached_result["cached_analysis_detailed"], 200,
+                                   _etag_headers(etag, backend.ANALYSIS_CACHE_CONTROL))
+
+        logger.info("🤖 Calling custom LLM for DETAILED condition analysis...")
+        prompt = backend.build_detailed_analysis_prompt(gene, mutation, classification)
+        context_document = await _fetch_context_document(user_id, "detailed", gene, mutation)
+        condition_data, error = await _generate_analysis(prompt, "detailed", (gene, mutation, classification), context_document)
+        if error:
+            return error
+
+        await _store_cache(backend.UPDATE_DETAILED_CACHE_SQL, (json.dumps(condition_data), backend.DETAILED_PROMPT_FINGERPRINT, user_id), "Detailed")
+
+        logger.info("✅ condition_analysis:detailed:success")
+        return JSONResponse(condition_data, 200)
+
+    except Exception as e:
+        logger.exception(f"❌ condition_analysis:detailed:error {type(e).__name__}: {e}")
+        return JSONResponse({"error": "analysis_failed", "message": str(e)}, 500)
+
+
+async def tavus_end(request: AsyncRequest, conversation_id: str):
+    """Async twin of app.tavus_end"""
+    if not backend.TAVUS_API_KEY:
+        return JSONResponse({"error": "server_misconfigured"}, 500)
+    url = f"{backend.TAVUS_BASE}/conversations/{conversation_id}/end"
+    try:
+        logger.info("tavus:end:request %s", {"url": url})
+        r = await http_client.post(url, headers=backend.HEADERS, timeout=15)
+        logger.info("tavus:end:response status=%s", r.status_code)
+        try:
+            logger.info("tavus:end:response:json %s", r.json())
+            return JSONResponse({"ok": r.is_success, "tavus": r.json()}, r.status_code)
+        except ValueError:
+            logger.warning("tavus:end:response:non_json body_len=%s", len(r.text or ""))
+            return JSONResponse({"ok": r.is_success, "status": r.status_code}, r.status_code)
+    except httpx.HTTPError as e:
+        logger.exception("tavus:end:error %s", str(e))
+        return JSONResponse({"error": "tavus_end_failed", "message": str(e)}, 500)
+
+
+# ============================================================================
+# ROUTING AND LIFESPAN
+# ============================================================================
+ASYNC_ROUTES = [
+    ("GET", re.compile(r"^/conversations/recent-transcript$"), get_recent_transcript),
+    ("GET", re.compile(r"^/tavus/conversation-id/recent$"), get_recent_tavus_conversation),
+    ("GET", re.compile(r"^/condition-analysis/(?P<user_id>[^/]+)/basic$"), get_condition_analysis_basic),
+    ("GET", re.compile(r"^/condition-analysis/(?P<user_id>[^/]+)/detailed$"), get_condition_analysis_detailed),
+    ("POST", re.compile(r"^/tavus/end/(?P<conversation_id>[^/]+)$"), tavus_end),
+]
+
+
+def _match_route(method: str, path: str):
+    for route_method, pattern, handler in ASYNC_ROUTES:
+        if route_method == method:
+            match = pattern.match(path)
+            if match:
+                return handler, match.groupdict()
+    return None, None
+
+
+async def _startup():
+    global async_db_pool, http_client, _prewarm_task
+    http_client = httpx.AsyncClient(timeout=30)
+    if backend.DB_CONNECTION_STRING:
+        try:
+            async_db_pool = AsyncConnectionPool(
+                backend.DB_CONNECTION_STRING, min_size=1, max_size=ASYNC_DB_POOL_MAXCONN, open=False
+            )
+            await async_db_pool.open()
+            logger.info(f"✅ asgi: async database pool opened (max={ASYNC_DB_POOL_MAXCONN})")
+        except Exception as e:
+            async_db_pool = None
+            logger.error(f"❌ asgi: failed to open async database pool: {e}")
+    # Sync clients and credentials warm in the prewarm thread; analyses here use client.aio, so open that too
+    backend.gemini_prewarmer.start()
+    if backend.gemini_prewarmer.enabled:
+        _prewarm_task = asyncio.create_task(backend.gemini_prewarmer.aprime())
+    logger.info(f"🚀 asgi: async routes={len(ASYNC_ROUTES)} wsgi_threads={WSGI_THREADS}")
+
+
+async def _shutdown():
+    if async_db_pool is not None:
+        await async_db_pool.close()
+    if http_client is not None:
+        await http_client.aclose()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                await _startup()
+            except Exception as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await _shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+
+    if scope["type"] == "http":
+        handler, params = _match_route(scope["method"], scope["path"])
+        if handler is not None:
+            request = AsyncRequest(scope, receive)
+            logger.info("request %s %s", request.method, request.path)
+            response = await handler(request, **params)
+            await response.send(send, request)
+            return
+
+    # Everything else (including CORS preflight) is handled by Flask
+    await flask_app(scope, receive, send)
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for every upstream app.py calls, for load tests
+
+One threaded HTTP server answers, on a single port:
+  Gemini      POST /v1beta/models/<model>:generateContent   (GEMINI_BASE_URL, GEMINI_API_MODE=public)
+              GET  /v1beta/models/<model> (model metadata, for the prewarm)
+              POST /v1beta/cachedContents (explicit context caches, honoured by generateContent)
+  Tavus       POST /v2/conversations, POST /v2/conversations/<id>/end   (TAVUS_BASE_URL=<root>/v2)
+  ClinVar     GET  /clinvar/?term=..., GET /clinvar/variation/<id>/     (CLINVAR_BASE_URL)
+  MedlinePlus GET  /genetics/gene/<gene>/                               (MEDLINEPLUS_BASE_URL)
+  Stats       GET  /__stats (calls per upstream), POST /__reset (also drops context caches)
+
+Each upstream sleeps for a log-normal latency (median + sigma, the shape real API latencies
+have) before answering. Gemini answers are shaped by the prompt: the basic and detailed
+analysis prompts get the JSON objects they ask for, anything else gets a counselor-style
+answer. ClinVar and MedlinePlus pages are the HTML files in benchmarks/fixtures/ with
+{{GENE}}, {{MUTATION}} and {{VARIATION_ID}} filled in - replace them with saved copies of
+real pages to exercise the scraper on production-sized documents.
+
+Usage:
+    python benchmarks/fake_upstreams.py --port 18090 --gemini-median-ms 1500
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+SENTENCES = [
+    "A pathogenic variant means the change is known to affect how the gene works.",
+    "Having this variant raises your risk, but it does not mean you will definitely develop cancer.",
+    "Many people with this result choose earlier or more frequent screening.",
+    "Your relatives may also want to consider testing, since the variant can be inherited.",
+    "A genetic counselor can help you weigh the options that fit your personal and family history.",
+    "Risk-reducing options range from enhanced surveillance to preventive surgery.",
+    "Lifestyle factors still matter, and regular check-ups help catch changes early.",
+    "Each child of a carrier has a 50 percent chance of inheriting the variant.",
+    "Results like this can feel overwhelming, and it is normal to have many questions.",
+    "Your doctor can refer you to a high-risk clinic that specializes in hereditary cancer.",
+]
+
+
+class LatencyModel:
+    """Log-normal latency: median_ms is the 50th percentile, sigma widens the tail"""
+
+    def __init__(self, median_ms: float, sigma: float = 0.5):
+        self.median_ms = median_ms
+        self.sigma = sigma
+
+    def sample_sec(self, rng: random.Random) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return rng.lognormvariate(math.log(self.median_ms), self.sigma) / 1000.0
+
+
+def _fixture(name: str) -> str:
+    return (FIXTURES_DIR / name).read_text(encoding="utf-8")
+
+
+def _fill(template: str, gene: str, mutation: str = "", variation_id: str = "") -> str:
+    return (template.replace("{{GENE}}", gene)
+            .replace("{{MUTATION}}", mutation)
+            .replace("{{VARIATION_ID}}", variation_id))
+
+
+def gemini_answer(prompt: str, json_mode: bool, rng: random.Random, schema_fields: list = None) -> str:
+    """Response text for a prompt, in the shape app.py's prompts (or the response schema) ask for"""
+    gene = (re.search(r"Gene:\s*(\S+)", prompt) or [None, "the gene"])[1]
+    answer = {}
+    if '"riskLevel"' in prompt or schema_fields:
+        answer.update({
+            "condition": f"Hereditary cancer predisposition ({gene})",
+            "riskLevel": rng.choice(["High", "Moderate"]),
+            "description": " ".join(rng.sample(SENTENCES, 3)),
+        })
+    if '"implications"' in prompt or schema_fields:
+        answer.update({
+            "implications": rng.sample(SENTENCES, 4),
+            "recommendations": rng.sample(SENTENCES, 4),
+            "resources": ["National Cancer Institute", "FORCE", "MedlinePlus Genetics", "NSGC counselor directory"],
+        })
+    if schema_fields:
+        answer = {field: answer[field] for field in schema_fields if field in answer}
+    if answer:
+        return json.dumps(answer)
+    text = " ".join(rng.sample(SENTENCES, rng.randint(3, 6)))
+    return json.dumps({"answer": text}) if json_mode else text
+
+
+class FakeUpstreams(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, gemini_latency: LatencyModel, tavus_latency: LatencyModel,
+                 web_latency: LatencyModel, invalid_json_rate: float = 0.0, seed: int = 7,
+                 model_latency: dict = None):
+        super().__init__(address, _Handler)
+        self.gemini_latency = gemini_latency
+        self.model_latency = model_latency or {}  # model name -> LatencyModel overriding gemini_latency
+        self.tavus_latency = tavus_latency
+        self.web_latency = web_latency
+        self.invalid_json_rate = invalid_json_rate
+        self.rng = random.Random(seed)
+        self.counts = Counter()
+        self.variations = {}  # variation id handed out by a search -> (gene, mutation)
+        self.context_caches = {}  # cachedContents/<id> -> cached prompt text
+        self.lock = threading.Lock()
+        self.templates = {
+            "clinvar_search": _fixture("clinvar_search.html"),
+            "clinvar_variation": _fixture("clinvar_variation.html"),
+            "medlineplus": _fixture("medlineplus_gene.html"),
+        }
+
+    def record(self, name: str, latency: LatencyModel) -> random.Random:
+        """Count the call and sleep for its latency; returns a per-call RNG"""
+        with self.lock:
+            self.counts[name] += 1
+            rng = random.Random(self.rng.getrandbits(64))
+        time.sleep(latency.sample_sec(rng))
+        return rng
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body, content_type: str = "application/json"):
+        data = body if isinstance(body, bytes) else (
+            body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8"))
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json_body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def do_GET(self):
+        server = self.server
+        url = urllib.parse.urlsplit(self.path)
+        path = url.path
+
+        if path == "/__stats":
+            with server.lock:
+                return self._send(200, dict(server.counts))
+
+        if path.rstrip("/") == "/clinvar":
+            server.record("clinvar_search", server.web_latency)
+            term = urllib.parse.parse_qs(url.query).get("term", [""])[0]
+            gene, _, mutation = term.partition(" ")
+            variation_id = str(10000 + zlib.crc32(term.encode("utf-8")) % 90000)
+            with server.lock:
+                server.variations[variation_id] = (gene, mutation)
+            return self._send(200, _fill(server.templates["clinvar_search"], gene, mutation, variation_id), "text/html")
+
+        match = re.fullmatch(r"/clinvar/(?:variation/(\d+)|RCV0*(\d+))/?", path)
+        if match:
+            server.record("clinvar_variation", server.web_latency)
+            variation_id = match.group(1) or match.group(2)
+            with server.lock:
+                gene, mutation = server.variations.get(variation_id, ("GENE", "c.variant"))
+            return self._send(200, _fill(server.templates["clinvar_variation"], gene, mutation, variation_id), "text/html")
+
+        match = re.fullmatch(r"/genetics/gene/([^/]+)/?", path)
+        if match:
+            server.record("medlineplus", server.web_latency)
+            return self._send(200, _fill(server.templates["medlineplus"], match.group(1).upper()), "text/html")
+
+        match = re.fullmatch(r"/v1beta/models/([^/:]+)", path)
+        if match:  # model metadata, used by the Gemini prewarm to open the connection
+            with server.lock:
+                server.counts["gemini_model_get"] += 1
+            return self._send(200, {"name": f"models/{match.group(1)}", "displayName": match.group(1),
+                                    "inputTokenLimit": 1048576, "outputTokenLimit": 65536})
+
+        self._send(404, {"error": f"no fake for GET {path}"})
+
+    def do_POST(self):
+        server = self.server
+        path = urllib.parse.urlsplit(self.path).path
+        body = self._json_body()
+
+        if path == "/__reset":
+            with server.lock:
+                server.counts.clear()
+                server.context_caches.clear()
+            return self._send(200, {"reset": True})
+
+        if path.endswith("/cachedContents"):
+            server.record("gemini_cache_create", server.web_latency)
+            name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+            cached_text = "\n".join(
+                part.get("text", "")
+                for content in [body.get("systemInstruction") or {}] + body.get("contents", [])
+                for part in content.get("parts", [])
+            )
+            with server.lock:
+                server.context_caches[name] = cached_text
+            return self._send(200, {
+                "name": name,
+                "model": body.get("model"),
+                "displayName": body.get("displayName"),
+                "expireTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 3600)),
+                "usageMetadata": {"totalTokenCount": max(1, len(cached_text) // 4)},
+            })
+
+        if path.endswith(":generateContent"):
+            model = path.rsplit("/", 1)[-1].split(":", 1)[0]
+            with server.lock:
+                server.counts[f"gemini:{model}"] += 1
+            rng = server.record("gemini", server.model_latency.get(model, server.gemini_latency))
+            config = body.get("generationConfig") or body.get("generation_config") or {}
+            json_mode = (config.get("responseMimeType") or config.get("response_mime_type")) == "application/json"
+            prompt = "\n".join(
+                part.get("text", "")
+                for content in body.get("contents", [])
+                for part in content.get("parts", [])
+            )
+            cached_text = ""
+            if body.get("cachedContent"):
+                cached_text = server.context_caches.get(body["cachedContent"])
+                if cached_text is None:
+                    return self._send(404, {"error": {"code": 404, "status": "NOT_FOUND",
+                                                      "message": "CachedContent not found (or permission denied)"}})
+            schema = config.get("responseSchema") or config.get("response_schema") or {}
+            text = gemini_answer(prompt, json_mode, rng, list(schema.get("properties") or []))
+            if json_mode and rng.random() < server.invalid_json_rate:
+                text = text[: max(1, len(text) - 12)]  # truncated mid-object, as when max_output_tokens hits
+            cached_tokens = len(cached_text) // 4
+            prompt_tokens, output_tokens = max(1, len(prompt) // 4) + cached_tokens, max(1, len(text) // 4)
+            return self._send(200, {
+                "candidates": [{
+                    "content": {"role": "model", "parts": [{"text": text}]},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }],
+                "usageMetadata": {
+                    "promptTokenCount": prompt_tokens,
+                    "candidatesTokenCount": output_tokens,
+                    "totalTokenCount": prompt_tokens + output_tokens,
+                    "cachedContentTokenCount": cached_tokens,
+                },
+                "modelVersion": path.rsplit("/", 1)[-1].split(":")[0],
+            })
+
+        if path == "/v2/conversations":
+            server.record("tavus_create", server.tavus_latency)
+            conversation_id = "c" + uuid.uuid4().hex[:15]
+            return self._send(200, {
+                "conversation_id": conversation_id,
+                "conversation_name": body.get("conversation_name"),
+                "conversation_url": f"https://tavus.daily.co/{conversation_id}",
+                "status": "active",
+                "callback_url": body.get("callback_url"),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S.000000Z", time.gmtime()),
+            })
+
+        if re.fullmatch(r"/v2/conversations/[^/]+/end", path):
+            server.record("tavus_end", server.tavus_latency)
+            return self._send(200, {})
+
+        self._send(404, {"error": f"no fake for POST {path}"})
+
+
+def build(port: int = 0, gemini_median_ms: float = 1500, gemini_sigma: float = 0.5,
+          tavus_median_ms: float = 800, web_median_ms: float = 300, invalid_json_rate: float = 0.0,
+          seed: int = 7, model_median_ms: dict = None) -> FakeUpstreams:
+    """Bound (not yet serving) fake server; port 0 = any free port. model_median_ms: per-model Gemini latency"""
+    return FakeUpstreams(
+        ("127.0.0.1", port),
+        gemini_latency=LatencyModel(gemini_median_ms, gemini_sigma),
+        tavus_latency=LatencyModel(tavus_median_ms, 0.3),
+        web_latency=LatencyModel(web_median_ms, 0.4),
+        invalid_json_rate=invalid_json_rate,
+        seed=seed,
+        model_latency={model: LatencyModel(ms, gemini_sigma) for model, ms in (model_median_ms or {}).items()},
+    )
+
+
+def start(**kwargs) -> FakeUpstreams:
+    """build() and serve on a daemon thread"""
+    server = build(**kwargs)
+    threading.Thread(target=server.serve_forever, name="fake-upstreams", daemon=True).start()
+    return server
+
+
+def upstream_env(base_url: str) -> dict:
+    """Environment that points app.py and genetic_web_scraper.py at a fake server"""
+    return {
+        "GEMINI_API_MODE": "public",
+        "GOOGLE_API_KEY": "fake-key",
+        "GEMINI_BASE_URL": base_url,
+        "TAVUS_BASE_URL": f"{base_url}/v2",
+        "TAVUS_API_KEY": "fake-key",
+        "TAVUS_REPLICA_ID": "r-fake",
+        "TAVUS_PERSONA_ID": "p-fake",
+        "CLINVAR_BASE_URL": base_url,
+        "MEDLINEPLUS_BASE_URL": base_url,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini / Tavus / ClinVar / MedlinePlus server")
+    parser.add_argument("--port", type=int, default=18090)
+    parser.add_argument("--gemini-median-ms", type=float, default=1500)
+    parser.add_argument("--gemini-sigma", type=float, default=0.5, help="log-normal sigma (0.5: p95 ~2.3x median)")
+    parser.add_argument("--tavus-median-ms", type=float, default=800)
+    parser.add_argument("--web-median-ms", type=float, default=300)
+    parser.add_argument("--invalid-json-rate", type=float, default=0.0, help="fraction of JSON-mode answers truncated")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--gemini-model-ms", action="append", default=[], metavar="MODEL=MS",
+                        help="latency median for one model (repeatable), e.g. to make the routed fast model time out")
+    args = parser.parse_args()
+
+    model_median_ms = {model: float(ms) for model, ms in (item.split("=", 1) for item in args.gemini_model_ms)}
+    server = build(args.port, args.gemini_median_ms, args.gemini_sigma, args.tavus_median_ms,
+                   args.web_median_ms, args.invalid_json_rate, args.seed, model_median_ms)
+    print(f"🎭 Fake upstreams on {server.base_url} (gemini median {args.gemini_median_ms:.0f} ms)")
+    for name, value in upstream_env(server.base_url).items():
+        print(f"   {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
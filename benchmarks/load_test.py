@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test: the real app.py behind gunicorn, with every upstream faked locally
+
+  1. seeds a scratch Postgres (synthetic_data.py) and applies the schema migrations
+  2. starts benchmarks/fake_upstreams.py (Gemini, Tavus, ClinVar, MedlinePlus with
+     log-normal latencies) as a separate process
+  3. boots gunicorn with gunicorn.conf.py and app:app pointed at the fakes
+  4. runs --vus virtual users, each repeating the patient flow until --duration expires:
+       login -> save base information -> condition screen (basic, detailed, source document)
+       -> start a Tavus call -> poll the transcript (If-None-Match, as the screens do)
+  5. reports latency percentiles and throughput per endpoint, and upstream call counts
+
+Usage:
+    BENCH_DB_CONNECTION_STRING=postgresql://... python benchmarks/load_test.py
+    python benchmarks/load_test.py --dsn postgresql://... --vus 50 --duration 60 --gemini-median-ms 2000
+    GUNICORN_WORKER_CLASS=gevent WEB_CONCURRENCY=4 python benchmarks/load_test.py --no-seed
+
+Server sizing (GUNICORN_WORKER_CLASS, WEB_CONCURRENCY, GUNICORN_THREADS, ...) is passed through
+from the environment. The scratch database's conversation tables are TRUNCATEd when seeding.
+Never point this at a real database.
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import requests
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+import fake_upstreams  # noqa: E402
+import synthetic_data  # noqa: E402
+from run_migration import execute_migration  # noqa: E402
+
+MIGRATION_FILES = [
+    REPO_ROOT / "database_migration_add_query_indexes.sql",
+    REPO_ROOT / "database_migration_add_latest_conversation.sql",
+    REPO_ROOT / "database_migration_partition_conversation_turns.sql",
+    REPO_ROOT / "database_migration_jsonb_cached_analysis.sql",
+    REPO_ROOT / "database_migration_llm_usage.sql",
+    REPO_ROOT / "database_migration_source_index.sql",
+    REPO_ROOT / "database_migration_prompt_versions.sql",
+]
+
+BENCH_PASSWORD = "bench"
+BENCH_JWT_SECRET = "load-test-secret"
+VARIANTS = [("BRCA1", "c.68_69del"), ("BRCA2", "c.5946del"), ("TP53", "c.743G>A"),
+            ("MLH1", "c.350C>T"), ("CFTR", "c.1521_1523del")]
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _wait_until_up(url, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=5)
+            return True
+        except requests.exceptions.RequestException:
+            time.sleep(0.3)
+    return False
+
+
+def prepare_database(dsn, users, calls, turns, seed):
+    conn = synthetic_data.connect(dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for migration_file in MIGRATION_FILES:
+            execute_migration(cur, migration_file.read_text())
+    conn.autocommit = False
+    if seed:
+        synthetic_data.seed(conn, users, calls, turns)
+    conn.close()
+
+
+class Recorder:
+    """Thread-safe latency samples per endpoint label"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+
+    def call(self, label, session, method, url, ok=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=120, **kwargs)
+        except requests.exceptions.RequestException:
+            with self.lock:
+                self.errors[label] += 1
+                self.statuses[label]["exception"] += 1
+            return None
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.statuses[label][response.status_code] += 1
+            if response.status_code in ok:
+                self.latencies[label].append(elapsed)
+            else:
+                self.errors[label] += 1
+        return response
+
+
+def patient_flow(base_url, email, rng, recorder, polls, poll_interval):
+    """One pass through the app as the frontend drives it; returns True when it got to the transcript"""
+    session = requests.Session()
+    r = recorder.call("POST /auth/login", session, "POST", f"{base_url}/auth/login",
+                      json={"email": email, "password": BENCH_PASSWORD})
+    if r is None or r.status_code != 200:
+        return False
+    login = r.json()
+    user_id = login["user"]["id"]
+    session.headers["Authorization"] = f"Bearer {login['token']}"
+
+    gene, mutation = rng.choice(VARIANTS)
+    recorder.call("POST /base-information", session, "POST", f"{base_url}/base-information", json={
+        "userId": user_id, "personaTestTypeId": 1, "classificationTypeId": rng.randint(1, 5),
+        "uploaded": False, "gene": gene, "mutation": mutation,
+    })
+
+    recorder.call("GET /condition-analysis/basic", session, "GET", f"{base_url}/condition-analysis/{user_id}/basic")
+    recorder.call("GET /condition-analysis/detailed", session, "GET", f"{base_url}/condition-analysis/{user_id}/detailed")
+    recorder.call("GET /source-documentation", session, "GET", f"{base_url}/source-documentation", ok=(200, 404))
+    recorder.call("GET /tavus/start", session, "GET", f"{base_url}/tavus/start")
+
+    etag = None
+    for _ in range(polls):
+        headers = {"If-None-Match": etag} if etag else {}
+        r = recorder.call("GET /conversations/recent-transcript", session, "GET",
+                          f"{base_url}/conversations/recent-transcript", ok=(200, 304), headers=headers)
+        if r is not None and r.headers.get("ETag"):
+            etag = r.headers["ETag"]
+        time.sleep(poll_interval)
+    return True
+
+
+def run_load(base_url, vus, duration, polls, poll_interval, seed_users):
+    recorder = Recorder()
+    flows = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def virtual_user(n):
+        rng = random.Random(n)
+        email = synthetic_data.bench_email(n % seed_users + 1)
+        while time.time() < stop_at:
+            if patient_flow(base_url, email, rng, recorder, polls, poll_interval):
+                with lock:
+                    flows[0] += 1
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=virtual_user, args=(n,), daemon=True) for n in range(vus)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return recorder, flows[0], time.perf_counter() - started
+
+
+def report(recorder, flows, wall, upstream_counts):
+    header = (f"{'endpoint':<36}{'ok':>7}{'errors':>8}{'req/s':>8}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    print()
+    print(header)
+    print("-" * len(header))
+    for label in sorted(set(recorder.latencies) | set(recorder.errors)):
+        samples = recorder.latencies[label]
+        print(f"{label:<36}{len(samples):>7}{recorder.errors[label]:>8}{len(samples) / wall:>8.1f}"
+              f"{_percentile(samples, 50) * 1000:>9.0f}{_percentile(samples, 95) * 1000:>9.0f}"
+              f"{_percentile(samples, 99) * 1000:>9.0f}{max(samples, default=0) * 1000:>9.0f}")
+    total = sum(len(v) for v in recorder.latencies.values())
+    print("-" * len(header))
+    print(f"{'all':<36}{total:>7}{sum(recorder.errors.values()):>8}{total / wall:>8.1f}")
+    print(f"\nCompleted flows: {flows} in {wall:.1f}s ({flows / wall * 60:.1f}/min)")
+
+    non_ok = {label: dict(codes) for label, codes in recorder.statuses.items()
+              if any(code not in (200, 304) for code in codes)}
+    if non_ok:
+        print("Status codes where not all 200/304:")
+        for label, codes in sorted(non_ok.items()):
+            print(f"  {label}: {codes}")
+    if upstream_counts:
+        print("Upstream calls: " + ", ".join(f"{k}={v}" for k, v in sorted(upstream_counts.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against fake upstreams")
+    parser.add_argument("--dsn", help="scratch database (default: BENCH_DB_CONNECTION_STRING)")
+    parser.add_argument("--users", type=int, default=200, help="seeded users (virtual users cycle through them)")
+    parser.add_argument("--calls", type=int, default=5, help="seeded calls per user")
+    parser.add_argument("--turns", type=int, default=40, help="seeded turns per call")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the existing synthetic rows")
+    parser.add_argument("--vus", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of load")
+    parser.add_argument("--polls", type=int, default=5, help="transcript polls per flow")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds between transcript polls")
+    parser.add_argument("--gemini-median-ms", type=float, default=1500)
+    parser.add_argument("--gemini-sigma", type=float, default=0.5)
+    parser.add_argument("--tavus-median-ms", type=float, default=800)
+    parser.add_argument("--web-median-ms", type=float, default=300)
+    parser.add_argument("--port", type=int, default=18082, help="app port")
+    parser.add_argument("--fake-port", type=int, default=18090, help="fake upstream port")
+    args = parser.parse_args()
+
+    dsn = synthetic_data.scratch_dsn(args.dsn)
+    prepare_database(dsn, args.users, args.calls, args.turns, seed=not args.no_seed)
+
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    fake = subprocess.Popen([
+        sys.executable, str(REPO_ROOT / "benchmarks" / "fake_upstreams.py"),
+        "--port", str(args.fake_port),
+        "--gemini-median-ms", str(args.gemini_median_ms), "--gemini-sigma", str(args.gemini_sigma),
+        "--tavus-median-ms", str(args.tavus_median_ms), "--web-median-ms", str(args.web_median_ms),
+    ], stdout=subprocess.DEVNULL)
+
+    env = dict(os.environ)
+    env.update(fake_upstreams.upstream_env(fake_url))
+    env.update({
+        "DB_CONNECTION_STRING": dsn,
+        "JWT_SECRET": BENCH_JWT_SECRET,
+        "PORT": str(args.port),
+        "TAVUS_CUSTOM_LLM_ENABLE": "false",
+    })
+    server = subprocess.Popen([
+        sys.executable, "-m", "gunicorn",
+        "-c", str(REPO_ROOT / "gunicorn.conf.py"),
+        "--log-level", "warning",
+        "app:app",
+    ], env=env, cwd=REPO_ROOT, stdout=subprocess.DEVNULL)  # the scraper prints progress to stdout
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        if not _wait_until_up(f"{fake_url}/__stats") or not _wait_until_up(f"{base_url}/healthz"):
+            raise SystemExit("❌ app or fake upstreams did not start")
+        requests.post(f"{fake_url}/__reset", timeout=5)
+
+        print(f"Load: {args.vus} virtual users x {args.duration:.0f}s, {args.polls} transcript polls per flow; "
+              f"Gemini median {args.gemini_median_ms:.0f} ms (sigma {args.gemini_sigma}), "
+              f"Tavus {args.tavus_median_ms:.0f} ms, web {args.web_median_ms:.0f} ms")
+        print(f"Server: GUNICORN_WORKER_CLASS={os.getenv('GUNICORN_WORKER_CLASS', 'gthread')} "
+              f"WEB_CONCURRENCY={os.getenv('WEB_CONCURRENCY', '2')} GUNICORN_THREADS={os.getenv('GUNICORN_THREADS', '8')}")
+
+        recorder, flows, wall = run_load(base_url, args.vus, args.duration, args.polls,
+                                         args.poll_interval, args.users)
+        upstream_counts = requests.get(f"{fake_url}/__stats", timeout=5).json()
+        report(recorder, flows, wall, upstream_counts)
+    finally:
+        for process in (server, fake):
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
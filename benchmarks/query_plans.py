@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN ANALYZE before/after for the user-scoped conversation queries
+
+Seeds a scratch database with synthetic_data.py, then for one user measures:
+  before - the original email-filtered queries, without the supporting indexes
+  after  - app.py's user-id-first queries, with the query-index, latest-conversation and
+           conversation_turns partitioning migrations applied
+
+Usage:
+    BENCH_DB_CONNECTION_STRING=postgresql://... python benchmarks/query_plans.py
+    python benchmarks/query_plans.py --dsn postgresql://... --users 5000 --show-plans
+
+The scratch database's conversation tables are TRUNCATEd and the migration's indexes
+are dropped and recreated. Never point this at a real database.
+"""
+import argparse
+import statistics
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+import synthetic_data  # noqa: E402
+from run_migration import execute_migration  # noqa: E402
+import app  # noqa: E402
+
+MIGRATION_FILES = [
+    REPO_ROOT / "database_migration_add_query_indexes.sql",
+    REPO_ROOT / "database_migration_add_latest_conversation.sql",
+    REPO_ROOT / "database_migration_partition_conversation_turns.sql",
+]
+MIGRATION_INDEXES = [
+    "idx_conversations_users_user_created",
+    "idx_conversations_tavus_conversation_id",
+    "idx_conversation_turns_conversation_created",
+    "idx_users_user_email",
+    "idx_conversations_users_tavus_conversation_id",
+]
+
+# Queries as they were before the rewrite (filter by email, join every user's turns first)
+LEGACY_TRANSCRIPT_SQL = """
+    SELECT C.id as conversation_id, CT.ordinal, CT.created_at, U.user_email, C.user_id,
+           CT.role, CT.content, CT.feedback, CT.feedback_status
+    FROM public.conversations C
+    INNER JOIN public.conversation_turns CT ON C.id = CT.conversation_id
+    INNER JOIN public.conversations_users CU ON C.tavus_conversation_id = CU.tavus_conversation_id
+    INNER JOIN public.users U ON CU.user_id = U.id
+    WHERE U.user_email = %s
+    ORDER BY CT.created_at DESC
+    LIMIT 1000
+"""
+
+LEGACY_RECENT_CONVERSATION_SQL = """
+    SELECT C.tavus_conversation_id, CU.created_at
+    FROM public.conversations C
+    INNER JOIN public.conversation_turns CT ON C.id = CT.conversation_id
+    INNER JOIN public.conversations_users CU ON C.tavus_conversation_id = CU.tavus_conversation_id
+    INNER JOIN public.users U ON CU.user_id = U.id
+    WHERE U.user_email = %s
+    ORDER BY CU.created_at DESC
+    LIMIT 1
+"""
+
+LEGACY_OWNERSHIP_SQL = """
+    SELECT 1
+    FROM public.conversations C
+    INNER JOIN public.conversations_users CU ON C.tavus_conversation_id = CU.tavus_conversation_id
+    INNER JOIN public.users U ON CU.user_id = U.id
+    WHERE C.id = %s AND U.user_email = %s
+"""
+
+
+def explain(cur, sql, params, runs):
+    """Median execution time (ms), shared buffers touched and the text plan of the last run"""
+    times, buffers = [], 0
+    for _ in range(runs):
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+        plan = cur.fetchone()[0][0]
+        times.append(plan["Execution Time"])
+        root = plan["Plan"]
+        buffers = root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0)
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) " + sql, params)
+    text_plan = "\n".join(row[0] for row in cur.fetchall())
+    return statistics.median(times), buffers, text_plan
+
+
+def apply_migrations(conn):
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for migration_file in MIGRATION_FILES:
+            execute_migration(cur, migration_file.read_text())
+    conn.autocommit = False
+
+
+def drop_migration_indexes(conn):
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for name in MIGRATION_INDEXES:
+            cur.execute(f"DROP INDEX IF EXISTS public.{name}")
+    conn.autocommit = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE the conversation queries before/after indexing")
+    parser.add_argument("--dsn", help="scratch database (default: BENCH_DB_CONNECTION_STRING)")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--calls", type=int, default=10, help="calls per user")
+    parser.add_argument("--turns", type=int, default=40, help="turns per call")
+    parser.add_argument("--runs", type=int, default=5, help="EXPLAIN ANALYZE runs per query (median reported)")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the existing synthetic rows")
+    parser.add_argument("--show-plans", action="store_true")
+    args = parser.parse_args()
+
+    conn = synthetic_data.connect(args.dsn)
+    if not args.no_seed:
+        synthetic_data.seed(conn, args.users, args.calls, args.turns)
+
+    email = synthetic_data.bench_email(1)
+    with conn.cursor() as cur:
+        cur.execute("SELECT id::text FROM public.users WHERE user_email = %s", (email,))
+        user_id = cur.fetchone()[0]
+        cur.execute("""
+            SELECT C.id::text FROM public.conversations C
+            JOIN public.conversations_users CU ON CU.tavus_conversation_id = C.tavus_conversation_id
+            WHERE CU.user_id = %s LIMIT 1
+        """, (user_id,))
+        conversation_id = cur.fetchone()[0]
+    conn.commit()
+
+    cases = [
+        ("transcript", LEGACY_TRANSCRIPT_SQL, (email,), app.TRANSCRIPT_SQL, (user_id,)),
+        ("recent-conversation", LEGACY_RECENT_CONVERSATION_SQL, (email,), app.RECENT_CONVERSATION_SQL, (user_id,)),
+        ("feedback-ownership", LEGACY_OWNERSHIP_SQL, (conversation_id, email),
+         app.CONVERSATION_OWNERSHIP_SQL, (conversation_id, user_id)),
+    ]
+
+    drop_migration_indexes(conn)
+    before = {}
+    with conn.cursor() as cur:
+        for name, legacy_sql, legacy_params, _, _ in cases:
+            before[name] = explain(cur, legacy_sql, legacy_params, args.runs)
+    conn.commit()
+
+    apply_migrations(conn)
+    after = {}
+    with conn.cursor() as cur:
+        for name, _, _, sql, params in cases:
+            after[name] = explain(cur, sql, params, args.runs)
+    conn.commit()
+
+    header = f"{'query':<22}{'before ms':>12}{'after ms':>12}{'speedup':>10}{'buffers before':>16}{'buffers after':>15}"
+    print()
+    print(header)
+    print("-" * len(header))
+    for name, *_ in cases:
+        b_ms, b_buf, _ = before[name]
+        a_ms, a_buf, _ = after[name]
+        speedup = b_ms / a_ms if a_ms else float("inf")
+        print(f"{name:<22}{b_ms:>12.2f}{a_ms:>12.2f}{speedup:>9.0f}x{b_buf:>16,}{a_buf:>15,}")
+
+    if args.show_plans:
+        for name, *_ in cases:
+            print(f"\n=== {name}: before ===\n{before[name][2]}")
+            print(f"\n=== {name}: after ===\n{after[name][2]}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
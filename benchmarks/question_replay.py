@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Replay the patient questions in Test/ through the LLM path and measure it
+
+Crosses Test/Questions.csv (patient questions) with Test/GeneticCombinations.csv (gene,
+variant, classification) and sends, per variant:
+  basic     - build_basic_analysis_prompt (JSON mode + response schema, as the condition screen does)
+  detailed  - build_detailed_analysis_prompt (JSON mode + response schema)
+  question  - build_genetic_context(...) + one patient question, once per question
+all through app.call_custom_llm at --concurrency parallel calls. With --grounded each variant's
+ClinVar/MedlinePlus document is scraped once and every call also gets the chunks
+source_retrieval ranks highest for its section or question (as the app grounds analyses).
+
+Per call it records latency, prompt / output / cached tokens (Gemini usage_metadata) and, for
+JSON-mode calls, whether llm_json.parse found every schema field (no repair call needed). The summary shows
+percentiles, mean tokens, the prompt-cache hit rate (calls that reused cached prompt tokens,
+and the share of prompt tokens served from cache) and the JSON parse-failure rate per kind.
+--out writes every call as CSV so two runs (before/after a prompt or caching change) can be
+compared call by call.
+
+Usage:
+    python benchmarks/question_replay.py --stub                      # fake Gemini, no credentials
+    python benchmarks/question_replay.py --stub --invalid-json-rate 0.05 --gemini-median-ms 800
+    python benchmarks/question_replay.py --stub --grounded                # + retrieved source chunks
+    python benchmarks/question_replay.py --concurrency 4 --questions 20 --out run.csv   # configured model
+    LLM_RESPONSE_SCHEMA_ENABLED=false python benchmarks/question_replay.py ...        # free-form JSON baseline
+
+Without --stub the Gemini settings come from the environment, exactly as app.py reads them
+(GEMINI_API_MODE, GEMINI_MODEL, VERTEX_PROJECT_ID, ...), and every call is billed.
+"""
+import argparse
+import csv
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+QUESTIONS_CSV = REPO_ROOT / "Test" / "Questions.csv"
+COMBINATIONS_CSV = REPO_ROOT / "Test" / "GeneticCombinations.csv"
+
+# How the counselor is asked a question in the replay. The production counselor prompt lives
+# in the Tavus/Vapi persona; this reproduces what the app contributes (the genetic context).
+QUESTION_PROMPT = """{genetic_context}
+
+Patient question: {question}
+
+Answer as the patient's genetic counselor in 2-4 clear, compassionate sentences."""
+
+RESULT_FIELDS = ["kind", "gene", "variant", "question_number", "ok", "error", "latency_ms", "context_chars",
+                 "prompt_tokens", "completion_tokens", "cached_tokens", "json_mode", "json_ok", "route"]
+
+
+def load_questions(path=QUESTIONS_CSV):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [(int(row["QuestionNumber"]), row["QuestionText"].strip())
+                for row in csv.DictReader(f) if row.get("QuestionText", "").strip()]
+
+
+def load_combinations(path=COMBINATIONS_CSV):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [(row["Gene"].strip(), row["Variant"].strip(), row["Classification"].strip())
+                for row in csv.DictReader(f) if row.get("Gene", "").strip()]
+
+
+def load_documents(backend, combinations):
+    """{(gene, variant): (source_document, source_index)} scraped the way the background job does"""
+    from genetic_web_scraper import search_all_sources
+    documents = {}
+    for gene, variant, _ in combinations:
+        document = search_all_sources(gene, variant).get("combined_text") or ""
+        documents[(gene, variant)] = (document, backend.source_retrieval.build_index(document) if document else None)
+        print(f"  {gene} {variant}: {len(document)} chars", file=sys.stderr)
+    return documents
+
+
+def build_jobs(backend, questions, combinations, documents=None):
+    """(kind, gene, variant, question_number, prompt, json_mode, context_document) for every call in the replay"""
+    jobs = []
+    documents = documents or {}
+    for gene, variant, classification in combinations:
+        document, index = documents.get((gene, variant), (None, None))
+
+        def grounding(query):
+            return backend.build_context_document(document, index, [query])
+
+        query = backend.source_retrieval.section_query
+        jobs.append(("basic", gene, variant, "", backend.build_basic_analysis_prompt(gene, variant, classification), True,
+                     grounding(query("basic", gene, variant))))
+        jobs.append(("detailed", gene, variant, "", backend.build_detailed_analysis_prompt(gene, variant, classification), True,
+                     grounding(query("detailed", gene, variant))))
+        context = backend.build_genetic_context(gene, variant, classification)
+        for number, question in questions:
+            prompt = QUESTION_PROMPT.format(genetic_context=context, question=question)
+            jobs.append(("question", gene, variant, number, prompt, False, grounding(f"{gene} {question}")))
+    return jobs
+
+
+def run_job(backend, job, max_tokens):
+    kind, gene, variant, number, prompt, json_mode, context_document = job
+    result = {"kind": kind, "gene": gene, "variant": variant, "question_number": number,
+              "ok": False, "error": "", "latency_ms": 0.0, "context_chars": len(context_document or ""),
+              "prompt_tokens": 0, "completion_tokens": 0,
+              "cached_tokens": 0, "json_mode": json_mode, "json_ok": "", "route": ""}
+    started = time.perf_counter()
+    try:
+        response = backend.call_custom_llm(
+            user_message=prompt,
+            max_tokens=max_tokens.get(kind),
+            response_schema=kind if json_mode else None,
+            stream=False,
+            response_format="json" if json_mode else None,
+            call_site="replay",
+            system_instruction=backend.COUNSELOR_SYSTEM_INSTRUCTION if json_mode else None,
+            context_document=context_document,
+        )
+    except Exception as e:
+        result["latency_ms"] = (time.perf_counter() - started) * 1000
+        result["error"] = f"{type(e).__name__}: {e}"[:200]
+        return result
+    result["latency_ms"] = (time.perf_counter() - started) * 1000
+    result["ok"] = True
+    usage = response.get("usage") or {}
+    result["prompt_tokens"] = usage.get("prompt_tokens", 0)
+    result["completion_tokens"] = usage.get("completion_tokens", 0)
+    result["cached_tokens"] = usage.get("cached_tokens", 0)
+    result["route"] = response.get("route", "")
+    if json_mode:
+        content = response["choices"][0]["message"]["content"]
+        try:
+            _, missing = backend.llm_json.parse(content, kind)
+            result["json_ok"] = not missing  # usable without the repair call the app would make
+        except backend.llm_json.LLMResponseError:
+            result["json_ok"] = False
+    return result
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(results, wall):
+    by_kind = defaultdict(list)
+    for r in results:
+        by_kind[r["kind"]].append(r)
+    by_kind["all"] = results
+
+    header = (f"{'kind':<10}{'calls':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+              f"{'ctx chars':>10}{'in tok':>8}{'out tok':>9}{'cache hit':>11}{'cached %':>10}{'json fail':>11}")
+    print()
+    print(header)
+    print("-" * len(header))
+    for kind in ["basic", "detailed", "question", "all"]:
+        rows = by_kind.get(kind)
+        if not rows:
+            continue
+        ok = [r for r in rows if r["ok"]]
+        latencies = [r["latency_ms"] for r in ok]
+        prompt_tokens = sum(r["prompt_tokens"] for r in ok)
+        cached_tokens = sum(r["cached_tokens"] for r in ok)
+        hits = sum(1 for r in ok if r["cached_tokens"] > 0)
+        parsed = [r for r in ok if r["json_mode"]]
+        failures = sum(1 for r in parsed if r["json_ok"] is False)
+        json_fail = f"{failures / len(parsed):.1%}" if parsed else "-"
+        print(f"{kind:<10}{len(rows):>7}{len(rows) - len(ok):>8}"
+              f"{_percentile(latencies, 50):>9.0f}{_percentile(latencies, 95):>9.0f}{_percentile(latencies, 99):>9.0f}"
+              f"{sum(r['context_chars'] for r in rows) / len(rows):>10.0f}{prompt_tokens / max(1, len(ok)):>8.0f}{sum(r['completion_tokens'] for r in ok) / max(1, len(ok)):>9.0f}"
+              f"{hits / max(1, len(ok)):>11.1%}{cached_tokens / max(1, prompt_tokens):>10.1%}{json_fail:>11}")
+    print(f"\n{len(results)} calls in {wall:.1f}s ({len(results) / wall:.2f} calls/s)")
+    routes = Counter(r["route"] for r in results if r["route"])
+    if routes:
+        print("Served by: " + ", ".join(f"{route} {count}" for route, count in routes.most_common()))
+    errors = [r["error"] for r in results if r["error"]]
+    if errors:
+        print(f"First error: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay Test/Questions.csv x Test/GeneticCombinations.csv through the LLM path")
+    parser.add_argument("--stub", action="store_true", help="answer from benchmarks/fake_upstreams.py instead of Gemini")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--questions", type=int, help="only the first N questions")
+    parser.add_argument("--variants", type=int, help="only the first N gene/variant combinations")
+    parser.add_argument("--no-questions", action="store_true", help="only the basic/detailed analysis calls")
+    parser.add_argument("--out", help="write one CSV row per call")
+    parser.add_argument("--grounded", action="store_true",
+                        help="scrape each variant's source document and add the retrieved chunks to every call")
+    parser.add_argument("--question-max-tokens", type=int, default=1024)
+    parser.add_argument("--gemini-median-ms", type=float, default=1500, help="--stub latency median")
+    parser.add_argument("--gemini-sigma", type=float, default=0.5, help="--stub latency sigma")
+    parser.add_argument("--invalid-json-rate", type=float, default=0.0, help="--stub: fraction of truncated JSON answers")
+    args = parser.parse_args()
+
+    if args.stub:
+        import fake_upstreams
+        fake = fake_upstreams.start(gemini_median_ms=args.gemini_median_ms, gemini_sigma=args.gemini_sigma,
+                                    invalid_json_rate=args.invalid_json_rate)
+        os.environ.update(fake_upstreams.upstream_env(fake.base_url))
+
+    import app as backend
+    backend.app.logger.setLevel(logging.WARNING)
+
+    questions = [] if args.no_questions else load_questions()[:args.questions]
+    combinations = load_combinations()[:args.variants]
+    documents = load_documents(backend, combinations) if args.grounded else None
+    jobs = build_jobs(backend, questions, combinations, documents)
+    max_tokens = {"question": args.question_max_tokens}  # analyses use llm_json.max_output_tokens
+
+    target = "stub" if args.stub else f"{backend.llm_router.describe()} ({backend.GEMINI_API_MODE})"
+    print(f"Replaying {len(questions)} questions x {len(combinations)} variants "
+          f"(+2 analyses each) = {len(jobs)} calls against {target}, concurrency {args.concurrency}")
+
+    results, lock = [], threading.Lock()
+    done = [0]
+
+    def run(job):
+        result = run_job(backend, job, max_tokens)
+        with lock:
+            results.append(result)
+            done[0] += 1
+            if done[0] % 50 == 0:
+                print(f"  {done[0]}/{len(jobs)}", file=sys.stderr)
+        return result
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run, jobs))
+    wall = time.perf_counter() - started
+
+    summarize(results, wall)
+    if args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"Per-call results: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+CPU time and bytes-on-wire for the largest JSON responses
+
+Builds the two biggest payloads the API returns and measures:
+  serialize - Flask's default JSON provider vs fast_json.OrjsonProvider (what jsonify runs)
+  compress  - identity, gzip and brotli at several levels (http_compression.compress)
+
+Payloads:
+  transcript - GET /conversations/recent-transcript at its 1000-turn cap
+  source-doc - GET /source-documentation with ~100 KB of markdown (ClinVar + MedlinePlus)
+Text is sampled from the repo's own markdown docs, so it compresses like real English prose
+rather than random bytes.
+
+Usage:
+    python benchmarks/response_encoding.py
+    python benchmarks/response_encoding.py --turns 1000 --doc-kb 100 --repeat 50
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import http_compression  # noqa: E402
+from fast_json import OrjsonProvider, orjson  # noqa: E402
+
+COMPRESSION_SETTINGS = [
+    ("gzip", 1), ("gzip", 4), ("gzip", 6), ("gzip", 9),
+    ("br", 1), ("br", 4), ("br", 11),
+]
+
+
+def corpus_sentences():
+    text = " ".join(p.read_text(encoding="utf-8", errors="ignore") for p in sorted(REPO_ROOT.glob("*.md")))
+    sentences = [s.strip() for s in text.replace("\n", " ").split(". ") if 20 < len(s.strip()) < 400]
+    return sentences or ["Synthetic sentence about a genetic variant and what it means for the patient"]
+
+
+def build_transcript(turns: int, rng: random.Random, sentences):
+    conversations = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(max(1, turns // 40))]
+    started = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(turns):
+        role = "user" if i % 2 == 0 else "assistant"
+        # Patients ask short questions; counselor answers run a few hundred characters
+        text = ". ".join(rng.choice(sentences) for _ in range(1 if role == "user" else rng.randint(3, 6)))
+        rows.append({
+            "conversation_id": conversations[i // 40 % len(conversations)],
+            "ordinal": i % 40 + 1,
+            "created_at": started - timedelta(seconds=15 * i),
+            "user_email": "patient@example.com",
+            "user_id": uuid.UUID(int=1),
+            "role": role,
+            "content": {"text": text},
+            "feedback": "",
+            "feedback_status": 0,
+        })
+    return {"turns": rows, "count": len(rows)}
+
+
+def build_source_document(doc_kb: int, rng: random.Random, sentences):
+    parts, size, section = [], 0, 0
+    while size < doc_kb * 1024:
+        if size // 4096 > section:
+            section = size // 4096
+            parts.append(f"\n\n## Section {section}\n\n")
+        sentence = rng.choice(sentences) + ". "
+        parts.append(sentence)
+        size += len(sentence)
+    return {
+        "gene": "BRCA1",
+        "mutation": "c.68_69delAG",
+        "classification": "Pathogenic",
+        "source_document": "".join(parts),
+        "source_url": "https://www.ncbi.nlm.nih.gov/clinvar/",
+        "source_retrieved_at": datetime(2026, 10, 1, tzinfo=timezone.utc).isoformat(),
+    }
+
+
+def time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def bench_payload(name, payload, repeat):
+    app = Flask(__name__)
+    default_provider = DefaultJSONProvider(app)
+    print(f"\n## {name}")
+
+    with app.app_context():
+        default_ms, default_body = time_ms(
+            lambda: (default_provider.dumps(payload, separators=(",", ":")) + "\n").encode("utf-8"), repeat)
+        print(f"{'serializer':<22}{'median ms':>12}{'bytes':>12}")
+        print(f"{'default (stdlib json)':<22}{default_ms:>12.2f}{len(default_body):>12,}")
+        body = default_body
+        if orjson is not None:
+            fast_provider = OrjsonProvider(app)
+            fast_ms, body = time_ms(lambda: fast_provider.dumpb(payload) + b"\n", repeat)
+            print(f"{'orjson':<22}{fast_ms:>12.2f}{len(body):>12,}   ({default_ms / fast_ms:.1f}x faster)")
+        else:
+            print("orjson not installed - skipped")
+
+    print(f"\n{'encoding':<22}{'median ms':>12}{'bytes':>12}{'ratio':>8}")
+    print(f"{'identity':<22}{0:>12.2f}{len(body):>12,}{1:>8.1f}")
+    for encoding, level in COMPRESSION_SETTINGS:
+        if encoding == "br" and http_compression.brotli is None:
+            print(f"{'br (not installed)':<22}")
+            continue
+        kwargs = {"gzip_level": level} if encoding == "gzip" else {"brotli_quality": level}
+        ms, compressed = time_ms(lambda: http_compression.compress(body, encoding, **kwargs), repeat)
+        label = f"{encoding} {'level' if encoding == 'gzip' else 'quality'} {level}"
+        print(f"{label:<22}{ms:>12.2f}{len(compressed):>12,}{len(body) / len(compressed):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON serialization and compression benchmark")
+    parser.add_argument("--turns", type=int, default=1000, help="transcript turns (endpoint cap is 1000)")
+    parser.add_argument("--doc-kb", type=int, default=100, help="source document size in KB")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sentences = corpus_sentences()
+    bench_payload(f"transcript ({args.turns} turns)", build_transcript(args.turns, rng, sentences), args.repeat)
+    bench_payload(f"source-doc ({args.doc_kb} KB markdown)", build_source_document(args.doc_kb, rng, sentences), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
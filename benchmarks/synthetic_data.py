@@ -0,0 +1,123 @@
+"""
+Synthetic dataset for database benchmarks
+
+Creates the tables from synthetic_schema.sql in a scratch database and fills them
+with users, calls (conversations_users + conversations) and spoken turns spread
+over the last `days` days - the shape the transcript and conversation queries see
+in production, at whatever size you ask for.
+
+The scratch DSN comes from --dsn or BENCH_DB_CONNECTION_STRING; DB_CONNECTION_STRING
+is deliberately ignored because seeding TRUNCATEs the conversation tables.
+"""
+import os
+import time
+from pathlib import Path
+
+import psycopg2
+
+SCHEMA_FILE = Path(__file__).resolve().parent / "synthetic_schema.sql"
+BENCH_EMAIL_DOMAIN = "bench.example.com"
+
+
+def bench_email(n: int) -> str:
+    return f"user{n}@{BENCH_EMAIL_DOMAIN}"
+
+
+def scratch_dsn(dsn: str = None) -> str:
+    dsn = dsn or os.getenv("BENCH_DB_CONNECTION_STRING")
+    if not dsn:
+        raise SystemExit("❌ Set BENCH_DB_CONNECTION_STRING (or pass --dsn) to a scratch database")
+    return dsn
+
+
+def create_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA_FILE.read_text())
+    conn.commit()
+
+
+def seed(conn, users: int = 2000, calls_per_user: int = 10, turns_per_call: int = 40, days: int = 180):
+    """
+    Replace all synthetic rows with a fresh dataset. Returns the number of turns inserted.
+    users get emails user1@bench.example.com .. userN@bench.example.com and password "bench".
+    """
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        # Bulk load without the per-row pointer triggers (rebuilt in one pass below); needs a superuser
+        cur.execute("SET LOCAL session_replication_role = replica")
+        cur.execute("TRUNCATE public.conversation_turns, public.conversations, public.conversations_users")
+        # Partitioned conversation_turns (database_migration_partition_conversation_turns.sql): cover the seeded range
+        cur.execute("SELECT to_regprocedure('public.ensure_conversation_turn_partitions(timestamptz, integer)') IS NOT NULL")
+        if cur.fetchone()[0]:
+            cur.execute("SELECT public.ensure_conversation_turn_partitions(now() - make_interval(days => %s), 3)", (days + 1,))
+        cur.execute("DELETE FROM gencom.base_information WHERE user_id IN "
+                    "(SELECT id FROM public.users WHERE user_email LIKE %s)", (f"%@{BENCH_EMAIL_DOMAIN}",))
+        cur.execute("DELETE FROM public.users WHERE user_email LIKE %s", (f"%@{BENCH_EMAIL_DOMAIN}",))
+
+        cur.execute("""
+            INSERT INTO public.users (id, user_email, user_password, display_name, company_id)
+            SELECT gen_random_uuid(), 'user' || g || '@' || %s, 'bench', 'Bench User ' || g, 1
+            FROM generate_series(1, %s) g
+        """, (BENCH_EMAIL_DOMAIN, users))
+
+        cur.execute("""
+            INSERT INTO gencom.base_information
+                (user_id, persona_test_type_id, classification_type_id, uploaded, gene, mutation, insert_date)
+            SELECT id, 1, 1 + (abs(hashtext(id::text)) %% 5), B'1',
+                   (ARRAY['BRCA1','BRCA2','TP53','MLH1','CFTR'])[1 + abs(hashtext(user_email)) %% 5],
+                   'c.' || (100 + abs(hashtext(user_email)) %% 5000) || 'del', now()
+            FROM public.users WHERE user_email LIKE %s
+        """, (f"%@{BENCH_EMAIL_DOMAIN}",))
+
+        # One conversations_users + conversations row per call; Tavus (1) and Vapi (3) alternate
+        cur.execute("""
+            WITH calls AS (
+                SELECT u.id AS user_id,
+                       'bench-' || replace(u.id::text, '-', '') || '-' || k AS tavus_conversation_id,
+                       CASE WHEN k %% 2 = 0 THEN 3 ELSE 1 END AS conversation_type_id,
+                       now() - (random() * %s) * interval '1 day' AS created_at
+                FROM public.users u
+                CROSS JOIN generate_series(1, %s) k
+                WHERE u.user_email LIKE %s
+            ), cu AS (
+                INSERT INTO public.conversations_users (user_id, tavus_conversation_id, conversation_type_id, created_at)
+                SELECT user_id, tavus_conversation_id, conversation_type_id, created_at AT TIME ZONE 'UTC'
+                FROM calls
+            )
+            INSERT INTO public.conversations (id, user_id, created_at, tavus_conversation_id, conversation_type_id)
+            SELECT gen_random_uuid(), user_id, created_at, tavus_conversation_id, conversation_type_id
+            FROM calls
+        """, (days, calls_per_user, f"%@{BENCH_EMAIL_DOMAIN}"))
+
+        cur.execute("""
+            INSERT INTO public.conversation_turns
+                (conversation_id, ordinal, role, content, user_id, created_at, feedback_status)
+            SELECT c.id, t,
+                   CASE WHEN t %% 2 = 1 THEN 'user' ELSE 'assistant' END,
+                   jsonb_build_object('text', 'Synthetic turn ' || t || ' about ' || left(c.tavus_conversation_id, 12)),
+                   c.user_id,
+                   c.created_at + t * interval '15 seconds',
+                   0
+            FROM public.conversations c
+            CROSS JOIN generate_series(1, %s) t
+        """, (turns_per_call,))
+        inserted = cur.rowcount
+
+        cur.execute("SELECT to_regprocedure('public.refresh_user_latest_conversation()') IS NOT NULL")
+        if cur.fetchone()[0]:
+            cur.execute("SELECT public.refresh_user_latest_conversation()")
+
+        cur.execute("ANALYZE public.users")
+        cur.execute("ANALYZE public.conversations_users")
+        cur.execute("ANALYZE public.conversations")
+        cur.execute("ANALYZE public.conversation_turns")
+    conn.commit()
+    print(f"🌱 Seeded {users} users x {calls_per_user} calls x {turns_per_call} turns "
+          f"({inserted:,} turns) in {time.perf_counter() - started:.1f}s")
+    return inserted
+
+
+def connect(dsn: str = None):
+    conn = psycopg2.connect(scratch_dsn(dsn))
+    create_schema(conn)
+    return conn
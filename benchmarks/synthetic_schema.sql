@@ -0,0 +1,87 @@
+-- Minimal stand-in for the production schema, covering the tables and columns app.py touches.
+-- Used by the benchmark scripts in this directory to build a scratch database.
+-- NOT a migration: never run against a real database.
+
+CREATE SCHEMA IF NOT EXISTS gencom;
+
+CREATE TABLE IF NOT EXISTS public.users (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_email text UNIQUE NOT NULL,
+    user_password text,
+    display_name text,
+    company_id int
+);
+
+CREATE TABLE IF NOT EXISTS public.conversation_type (
+    conversation_type_id int PRIMARY KEY,
+    name text
+);
+
+CREATE TABLE IF NOT EXISTS public.conversations (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id uuid,
+    persona_id uuid,
+    created_at timestamptz DEFAULT now(),
+    tavus_conversation_id text,
+    update_dt timestamptz,
+    tavus_user_id text,
+    insertedby text,
+    conversation_type_id int
+);
+
+CREATE TABLE IF NOT EXISTS public.conversation_turns (
+    conversation_id uuid NOT NULL,
+    ordinal int NOT NULL,
+    role text,
+    content jsonb,
+    user_id uuid,
+    persona_id uuid,
+    created_at timestamptz DEFAULT now(),
+    topic_id int,
+    feedback text,
+    feedback_status int DEFAULT 0,
+    PRIMARY KEY (conversation_id, ordinal)
+);
+
+CREATE TABLE IF NOT EXISTS public.conversations_users (
+    id serial PRIMARY KEY,
+    user_id uuid,
+    tavus_conversation_id text,
+    conversation_type_id int,
+    created_at timestamp
+);
+
+CREATE TABLE IF NOT EXISTS gencom.persona_test_type (
+    persona_test_type_id int PRIMARY KEY,
+    persona_test_type text
+);
+
+CREATE TABLE IF NOT EXISTS gencom.classification_type (
+    classification_type_id int PRIMARY KEY,
+    classification_type text
+);
+
+CREATE TABLE IF NOT EXISTS gencom.base_information (
+    user_id uuid PRIMARY KEY,
+    persona_test_type_id int,
+    classification_type_id int,
+    uploaded bit(1),
+    gene text,
+    mutation text,
+    insert_date timestamp,
+    modified_date timestamp,
+    cached_analysis text,
+    cached_analysis_basic text,
+    cached_analysis_detailed text,
+    analysis_cached_at timestamptz,
+    source_document text,
+    source_url text,
+    source_retrieved_at timestamptz
+);
+
+INSERT INTO public.conversation_type VALUES (1, 'TAVUS'), (3, 'VAPI') ON CONFLICT DO NOTHING;
+INSERT INTO gencom.persona_test_type VALUES (1, 'Myself'), (2, 'My child') ON CONFLICT DO NOTHING;
+INSERT INTO gencom.classification_type VALUES
+    (1, 'Pathogenic'), (2, 'Likely Pathogenic'), (3, 'Variant of Unknown Significance'),
+    (4, 'Likely Benign'), (5, 'Benign')
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Worker-model load comparison for gunicorn.conf.py
+
+Boots gunicorn once per worker model (sync, gthread, gevent) with the real
+gunicorn.conf.py and drives a WSGI app whose handler waits on simulated
+upstream I/O - the shape of every app.py endpoint that calls Gemini, Tavus or
+Postgres. Reports throughput and latency percentiles for each mode.
+
+Usage:
+    python benchmarks/worker_modes.py
+    python benchmarks/worker_modes.py --modes gthread gevent --clients 64 --latency 2.0
+
+Environment for the server (WEB_CONCURRENCY, GUNICORN_THREADS,
+GUNICORN_WORKER_CONNECTIONS) is passed through, so the comparison reflects
+whatever sizing you plan to deploy.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SIMULATED_LATENCY_SEC = float(os.getenv("BENCH_UPSTREAM_LATENCY", "1.0"))
+
+
+def slow_app(environ, start_response):
+    """WSGI app standing in for an I/O-bound endpoint (e.g. a Gemini call)"""
+    time.sleep(SIMULATED_LATENCY_SEC)  # cooperative under gevent's monkey patching
+    body = b'{"status": "ok"}'
+    start_response("200 OK", [("Content-Type", "application/json"), ("Content-Length", str(len(body)))])
+    return [body]
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _wait_until_up(url, timeout=20.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=SIMULATED_LATENCY_SEC + 5)
+            return True
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    return False
+
+
+def run_mode(mode, port, clients, duration, latency):
+    env = dict(os.environ)
+    env.update({
+        "GUNICORN_WORKER_CLASS": mode,
+        "PORT": str(port),
+        "BENCH_UPSTREAM_LATENCY": str(latency),
+    })
+    cmd = [
+        sys.executable, "-m", "gunicorn",
+        "-c", str(REPO_ROOT / "gunicorn.conf.py"),
+        "--pythonpath", str(REPO_ROOT / "benchmarks"),
+        "--log-level", "warning",
+        "worker_modes:slow_app",
+    ]
+    server = subprocess.Popen(cmd, env=env, cwd=REPO_ROOT)
+    url = f"http://127.0.0.1:{port}/"
+    try:
+        if not _wait_until_up(url):
+            return {"mode": mode, "error": "server did not start"}
+
+        latencies = []
+        errors = 0
+        lock = threading.Lock()
+        stop_at = time.time() + duration
+
+        def client():
+            nonlocal errors
+            session = requests.Session()
+            while time.time() < stop_at:
+                start = time.perf_counter()
+                try:
+                    session.get(url, timeout=130).raise_for_status()
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        latencies.append(elapsed)
+                except requests.exceptions.RequestException:
+                    with lock:
+                        errors += 1
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        wall = time.perf_counter() - started
+
+        return {
+            "mode": mode,
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": len(latencies) / wall if wall else 0.0,
+            "p50_ms": _percentile(latencies, 50) * 1000,
+            "p95_ms": _percentile(latencies, 95) * 1000,
+            "p99_ms": _percentile(latencies, 99) * 1000,
+            "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+        }
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare gunicorn worker models under I/O-bound load")
+    parser.add_argument("--modes", nargs="+", default=["sync", "gthread", "gevent"])
+    parser.add_argument("--clients", type=int, default=32, help="concurrent client connections")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of load per mode")
+    parser.add_argument("--latency", type=float, default=SIMULATED_LATENCY_SEC, help="simulated upstream latency (s)")
+    parser.add_argument("--port", type=int, default=18081)
+    args = parser.parse_args()
+
+    print(f"Load: {args.clients} clients x {args.duration:.0f}s, upstream latency {args.latency:.2f}s")
+    print(f"Server: WEB_CONCURRENCY={os.getenv('WEB_CONCURRENCY', '2')} "
+          f"GUNICORN_THREADS={os.getenv('GUNICORN_THREADS', '8')} "
+          f"GUNICORN_WORKER_CONNECTIONS={os.getenv('GUNICORN_WORKER_CONNECTIONS', '100')}\n")
+
+    results = [run_mode(m, args.port, args.clients, args.duration, args.latency) for m in args.modes]
+
+    header = f"{'mode':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if "error" in r:
+            print(f"{r['mode']:<10}  {r['error']}")
+            continue
+        print(f"{r['mode']:<10}{r['requests']:>10}{r['errors']:>8}{r['throughput_rps']:>10.1f}"
+              f"{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}{r['p99_ms']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
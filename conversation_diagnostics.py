@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Conversation pipeline diagnostics for one user (support / on-call)
+
+Shows the conversations_users -> conversations -> conversation_turns chain for a user's
+recent Tavus and/or Vapi calls and says where it breaks (call tracked but no conversations
+row, conversation with no turns, ...). Everything comes back from ONE statement: the user,
+calls, conversation records, per-conversation turn counts and recent turns are CTEs
+aggregated into a single JSON row, so a check against production is one round trip.
+
+Used by GET /conversations/debug-vapi in app.py and as a CLI:
+
+    python conversation_diagnostics.py --email someone@example.com
+    python conversation_diagnostics.py --email someone@example.com --type tavus --since 2026-10-01
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import psycopg2
+from dotenv import load_dotenv
+
+from transcript_export import parse_export_date
+
+# conversation_type_id values (public.conversation_type)
+CONVERSATION_TYPES = {
+    "tavus": (1,),
+    "vapi": (3,),
+    "all": (1, 3),
+}
+
+DEFAULT_CALL_LIMIT = 10
+DEFAULT_TURN_LIMIT = 50
+
+# calls: the user's most recent calls of the requested types in the window
+# records: conversations rows matching those calls (the join that breaks when ids diverge)
+# turn_stats / recent_turns: all turns of those conversations. The window already applies to
+# calls; turns are not filtered by since, because a call's first turns are stored before its
+# conversations row and can fall just outside the window
+DIAGNOSTICS_SQL = """
+    WITH target_user AS (
+        SELECT U.id, U.user_email
+        FROM public.users U
+        WHERE U.user_email = %(email)s
+    ),
+    calls AS (
+        SELECT CU.id, CU.user_id, CU.tavus_conversation_id, CU.conversation_type_id, CU.created_at
+        FROM public.conversations_users CU
+        INNER JOIN target_user U ON CU.user_id = U.id
+        WHERE CU.conversation_type_id = ANY(%(type_ids)s)
+          AND CU.created_at >= %(since)s
+          AND CU.created_at < %(until)s
+        ORDER BY CU.created_at DESC
+        LIMIT %(call_limit)s
+    ),
+    records AS (
+        SELECT C.id, C.user_id, C.tavus_conversation_id, C.conversation_type_id, C.created_at
+        FROM public.conversations C
+        WHERE C.tavus_conversation_id IN (SELECT tavus_conversation_id FROM calls)
+    ),
+    turn_stats AS (
+        SELECT
+            CT.conversation_id,
+            count(*) AS turn_count,
+            min(CT.created_at) AS first_turn_at,
+            max(CT.created_at) AS last_turn_at
+        FROM public.conversation_turns CT
+        WHERE CT.conversation_id IN (SELECT id FROM records)
+        GROUP BY CT.conversation_id
+    ),
+    recent_turns AS (
+        SELECT
+            CT.conversation_id,
+            CT.ordinal,
+            CT.role,
+            LEFT(CT.content::text, 100) AS content_preview,
+            CT.created_at
+        FROM public.conversation_turns CT
+        WHERE CT.conversation_id IN (SELECT id FROM records)
+        ORDER BY CT.created_at DESC
+        LIMIT %(turn_limit)s
+    ),
+    call_status AS (
+        SELECT
+            CL.tavus_conversation_id,
+            CL.conversation_type_id,
+            CL.created_at,
+            R.id AS conversation_id,
+            COALESCE(TS.turn_count, 0) AS turn_count,
+            TS.last_turn_at,
+            CASE
+                WHEN R.id IS NULL THEN 'no conversations record'
+                WHEN TS.turn_count IS NULL THEN 'no turns'
+                ELSE 'ok'
+            END AS status
+        FROM calls CL
+        LEFT JOIN records R ON R.tavus_conversation_id = CL.tavus_conversation_id
+        LEFT JOIN turn_stats TS ON TS.conversation_id = R.id
+    )
+    SELECT
+        EXISTS (SELECT 1 FROM target_user) AS user_found,
+        (SELECT COALESCE(json_agg(CL ORDER BY CL.created_at DESC), '[]') FROM calls CL) AS conversations_users,
+        (SELECT COALESCE(json_agg(R ORDER BY R.created_at DESC), '[]') FROM records R) AS conversations,
+        (SELECT COALESCE(json_agg(RT ORDER BY RT.created_at DESC), '[]') FROM recent_turns RT) AS turns,
+        (SELECT COALESCE(sum(turn_count), 0)::bigint FROM turn_stats) AS total_turns,
+        (SELECT COALESCE(json_agg(CS ORDER BY CS.created_at DESC), '[]') FROM call_status CS) AS calls
+"""
+
+
+def build_params(email: str, conversation_type: str = "vapi", since=None, until=None,
+                 call_limit: int = DEFAULT_CALL_LIMIT, turn_limit: int = DEFAULT_TURN_LIMIT) -> dict:
+    """Bind parameters for DIAGNOSTICS_SQL; raises ValueError for an unknown type or bad dates"""
+    if conversation_type not in CONVERSATION_TYPES:
+        raise ValueError(f"type must be one of {sorted(CONVERSATION_TYPES)}")
+    return {
+        "email": email,
+        "type_ids": list(CONVERSATION_TYPES[conversation_type]),
+        "since": parse_export_date(since, datetime.min.replace(tzinfo=timezone.utc)),
+        "until": parse_export_date(until, datetime.now(timezone.utc)),
+        "call_limit": call_limit,
+        "turn_limit": turn_limit,
+    }
+
+
+def diagnose(row: dict) -> dict:
+    """Summary of a DIAGNOSTICS_SQL row: what exists and the first broken link"""
+    calls = row["calls"]
+    has_calls = len(calls) > 0
+    has_records = len(row["conversations"]) > 0
+    has_turns = row["total_turns"] > 0
+    if not row["user_found"]:
+        issue = "No user with this email"
+    elif not has_calls:
+        issue = "No tracked calls of this type in the time window"
+    elif not has_records:
+        issue = "No conversations table records with matching tavus_conversation_id"
+    elif not has_turns:
+        issue = "No conversation_turns for the conversations"
+    else:
+        issue = "Data looks good"
+    return {
+        "has_tracked_calls": has_calls,
+        "has_conversation_records": has_records,
+        "has_turns": has_turns,
+        "calls_missing_record": sum(1 for c in calls if c["status"] == "no conversations record"),
+        "calls_without_turns": sum(1 for c in calls if c["status"] == "no turns"),
+        "issue": issue,
+    }
+
+
+def run_diagnostics(cur, params: dict) -> dict:
+    """Execute DIAGNOSTICS_SQL on a RealDictCursor and shape the report"""
+    cur.execute(DIAGNOSTICS_SQL, params)
+    row = cur.fetchone()
+    return {
+        "conversations_users_count": len(row["conversations_users"]),
+        "conversations_users": row["conversations_users"],
+        "conversations_count": len(row["conversations"]),
+        "conversations": row["conversations"],
+        "turns_count": row["total_turns"],
+        "turns": row["turns"],
+        "calls": row["calls"],
+        "diagnosis": diagnose(row),
+    }
+
+
+def main():
+    from psycopg2.extras import RealDictCursor
+
+    parser = argparse.ArgumentParser(description="Diagnose a user's conversation pipeline")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--type", choices=sorted(CONVERSATION_TYPES), default="all")
+    parser.add_argument("--since", help="ISO date/datetime, inclusive (default: all history)")
+    parser.add_argument("--until", help="ISO date/datetime, exclusive (default: now)")
+    parser.add_argument("--calls", type=int, default=DEFAULT_CALL_LIMIT, help="most recent calls to inspect")
+    parser.add_argument("--turns", type=int, default=DEFAULT_TURN_LIMIT, help="recent turns to include")
+    args = parser.parse_args()
+
+    load_dotenv()
+    db_connection_string = os.getenv('DB_CONNECTION_STRING')
+    if not db_connection_string:
+        print("❌ Error: DB_CONNECTION_STRING not found in .env file", file=sys.stderr)
+        sys.exit(1)
+    # Strip SQLAlchemy-style prefix if present
+    if "+psycopg2://" in db_connection_string:
+        db_connection_string = db_connection_string.replace("postgresql+psycopg2://", "postgresql://")
+
+    try:
+        params = build_params(args.email, args.type, args.since, args.until, args.calls, args.turns)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    conn = psycopg2.connect(db_connection_string)
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            report = run_diagnostics(cur, params)
+    finally:
+        conn.rollback()
+        conn.close()
+
+    report = {"user_email": args.email, "type": args.type, **report}
+    print(json.dumps(report, indent=2, default=str))
+    print(f"🔍 {report['diagnosis']['issue']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+-- Per-user "latest conversation" pointer for GET /tavus/conversation-id/recent
+-- The endpoint used to join conversations_users, conversations, conversation_turns and users
+-- to pick one row; it now reads public.user_latest_conversation by primary key.
+--
+-- Semantics match the old query: the newest conversations_users row (by created_at) whose
+-- conversation has at least one stored turn. Maintained by triggers because turns are written
+-- by the custom LLM service, not by this app.
+--
+-- Run with: python run_migration.py database_migration_add_latest_conversation.sql
+-- Safe to re-run.
+
+-- Copy the column types from conversations_users so user_id / created_at match exactly
+CREATE TABLE IF NOT EXISTS public.user_latest_conversation AS
+SELECT user_id, tavus_conversation_id, created_at
+FROM public.conversations_users
+WITH NO DATA;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'public.user_latest_conversation'::regclass
+        AND contype = 'p'
+    ) THEN
+        ALTER TABLE public.user_latest_conversation
+            ALTER COLUMN user_id SET NOT NULL,
+            ALTER COLUMN tavus_conversation_id SET NOT NULL,
+            ADD PRIMARY KEY (user_id);
+        RAISE NOTICE 'Added primary key on user_latest_conversation.user_id';
+    ELSE
+        RAISE NOTICE 'user_latest_conversation primary key already exists';
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public'
+        AND table_name = 'user_latest_conversation'
+        AND column_name = 'updated_at'
+    ) THEN
+        ALTER TABLE public.user_latest_conversation
+            ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+        RAISE NOTICE 'Added updated_at column';
+    ELSE
+        RAISE NOTICE 'updated_at column already exists';
+    END IF;
+END $$;
+
+-- Call id -> linked users, looked up by the triggers below on every turn insert.
+-- Built CONCURRENTLY (no write lock); an interrupted build leaves an INVALID index, dropped here first.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE NOT i.indisvalid
+        AND c.relname = 'idx_conversations_users_tavus_conversation_id'
+    ) THEN
+        DROP INDEX public.idx_conversations_users_tavus_conversation_id;
+        RAISE NOTICE 'Dropped invalid index idx_conversations_users_tavus_conversation_id';
+    END IF;
+END $$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversations_users_tavus_conversation_id
+ON public.conversations_users (tavus_conversation_id)
+INCLUDE (user_id, created_at);
+
+-- Move the pointer forward for every user linked to a call, if the call is newer and has turns.
+-- Only ever advances, so concurrent turn inserts for older calls are no-ops.
+CREATE OR REPLACE FUNCTION public.advance_user_latest_conversation(p_tavus_conversation_id TEXT)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO public.user_latest_conversation AS l (user_id, tavus_conversation_id, created_at, updated_at)
+    SELECT DISTINCT ON (CU.user_id) CU.user_id, CU.tavus_conversation_id, CU.created_at, now()
+    FROM public.conversations_users CU
+    WHERE CU.tavus_conversation_id = p_tavus_conversation_id
+      AND CU.user_id IS NOT NULL
+      AND EXISTS (
+          SELECT 1
+          FROM public.conversations C
+          INNER JOIN public.conversation_turns CT ON CT.conversation_id = C.id
+          WHERE C.tavus_conversation_id = CU.tavus_conversation_id
+      )
+    ORDER BY CU.user_id, CU.created_at DESC
+    ON CONFLICT (user_id) DO UPDATE
+        SET tavus_conversation_id = EXCLUDED.tavus_conversation_id,
+            created_at = EXCLUDED.created_at,
+            updated_at = now()
+        WHERE l.created_at IS NULL
+           OR l.created_at < EXCLUDED.created_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Full recompute (initial backfill, or after deleting conversations)
+CREATE OR REPLACE FUNCTION public.refresh_user_latest_conversation()
+RETURNS INTEGER AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    DELETE FROM public.user_latest_conversation;
+    INSERT INTO public.user_latest_conversation (user_id, tavus_conversation_id, created_at, updated_at)
+    SELECT DISTINCT ON (CU.user_id) CU.user_id, CU.tavus_conversation_id, CU.created_at, now()
+    FROM public.conversations_users CU
+    WHERE CU.user_id IS NOT NULL
+      AND CU.tavus_conversation_id IS NOT NULL
+      AND EXISTS (
+          SELECT 1
+          FROM public.conversations C
+          INNER JOIN public.conversation_turns CT ON CT.conversation_id = C.id
+          WHERE C.tavus_conversation_id = CU.tavus_conversation_id
+      )
+    ORDER BY CU.user_id, CU.created_at DESC;
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger functions never raise: a pointer failure must not lose a spoken turn or a call record
+CREATE OR REPLACE FUNCTION public.trg_latest_conversation_on_turn()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_tavus_conversation_id TEXT;
+BEGIN
+    SELECT C.tavus_conversation_id INTO v_tavus_conversation_id
+    FROM public.conversations C
+    WHERE C.id = NEW.conversation_id;
+
+    IF v_tavus_conversation_id IS NOT NULL THEN
+        PERFORM public.advance_user_latest_conversation(v_tavus_conversation_id);
+    END IF;
+    RETURN NULL;
+EXCEPTION WHEN OTHERS THEN
+    RAISE WARNING 'user_latest_conversation update failed: %', SQLERRM;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.trg_latest_conversation_on_call()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.tavus_conversation_id IS NOT NULL THEN
+        PERFORM public.advance_user_latest_conversation(NEW.tavus_conversation_id);
+    END IF;
+    RETURN NULL;
+EXCEPTION WHEN OTHERS THEN
+    RAISE WARNING 'user_latest_conversation update failed: %', SQLERRM;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New turn: its call may now qualify (first turn) - covers Tavus and Vapi alike
+DROP TRIGGER IF EXISTS trg_user_latest_conversation_turn ON public.conversation_turns;
+CREATE TRIGGER trg_user_latest_conversation_turn
+AFTER INSERT ON public.conversation_turns
+FOR EACH ROW EXECUTE FUNCTION public.trg_latest_conversation_on_turn();
+
+-- New call link: turns may already exist (e.g. Vapi track-call after the first turns)
+DROP TRIGGER IF EXISTS trg_user_latest_conversation_call ON public.conversations_users;
+CREATE TRIGGER trg_user_latest_conversation_call
+AFTER INSERT ON public.conversations_users
+FOR EACH ROW EXECUTE FUNCTION public.trg_latest_conversation_on_call();
+
+SELECT 'Latest conversation pointer ready (' || public.refresh_user_latest_conversation() || ' users backfilled)' AS status;
@@ -0,0 +1,62 @@
+-- Supporting indexes for the transcript, recent-conversation and feedback-ownership queries
+-- All three start from the caller's user id and walk:
+--   conversations_users (user_id) -> conversations (tavus_conversation_id) -> conversation_turns (conversation_id)
+-- Without these indexes every lookup is a sequential scan of each table.
+--
+-- Run with: python run_migration.py database_migration_add_query_indexes.sql
+-- Indexes are built CONCURRENTLY (no write locks on live tables), so each statement
+-- runs on its own in autocommit mode. Safe to re-run.
+
+-- A failed CONCURRENTLY build leaves an INVALID index behind that IF NOT EXISTS would skip;
+-- drop any such leftovers so this run rebuilds them.
+DO $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT c.oid::regclass AS index_name
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE NOT i.indisvalid
+          AND c.relname IN (
+              'idx_conversations_users_user_created',
+              'idx_conversations_tavus_conversation_id',
+              'idx_conversation_turns_conversation_created',
+              'idx_users_user_email'
+          )
+    LOOP
+        EXECUTE format('DROP INDEX %s', r.index_name);
+        RAISE NOTICE 'Dropped invalid index %', r.index_name;
+    END LOOP;
+END $$;
+
+-- User's calls, newest first. Covers the recent-conversation lookup (index-only scan,
+-- stops at the first row) and is the entry point of the transcript query.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversations_users_user_created
+ON public.conversations_users (user_id, created_at DESC)
+INCLUDE (tavus_conversation_id);
+
+-- Tavus/Vapi conversation id -> internal conversation row (join key for every path above).
+-- Covers the feedback ownership check (index-only on C.id + tavus_conversation_id).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversations_tavus_conversation_id
+ON public.conversations (tavus_conversation_id)
+INCLUDE (id, user_id);
+
+-- Turns of one conversation, newest first (transcript ORDER BY CT.created_at DESC).
+-- The (conversation_id, ordinal) key used by feedback updates is already unique.
+-- Once conversation_turns is partitioned, database_migration_partition_conversation_turns.sql owns this index.
+-- only-if: SELECT relkind <> 'p' FROM pg_class WHERE oid = 'public.conversation_turns'::regclass
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversation_turns_conversation_created
+ON public.conversation_turns (conversation_id, created_at DESC);
+
+-- Email -> id for login and resolve_system_user_id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_user_email
+ON public.users (user_email)
+INCLUDE (id);
+
+ANALYZE public.conversations_users;
+ANALYZE public.conversations;
+ANALYZE public.conversation_turns;
+ANALYZE public.users;
+
+SELECT 'Query index migration complete!' AS status;
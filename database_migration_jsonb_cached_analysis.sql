@@ -0,0 +1,59 @@
+-- Store the cached LLM analyses as JSONB instead of TEXT
+-- cached_analysis, cached_analysis_basic and cached_analysis_detailed were TEXT columns that every
+-- reader json.loads'd and every writer json.dumps'd. As JSONB:
+--   * the Tavus/Vapi greeting reads only ->>'condition' and ->>'description' (GREETING_CONTEXT_SQL)
+--   * the cache endpoints read ::text and return it as the response body without re-encoding
+--   * malformed JSON can no longer be stored
+--
+-- Run with: python run_migration.py database_migration_jsonb_cached_analysis.sql
+-- Run it BEFORE deploying the app change: the new writers cast with ::jsonb, which also works on
+-- the old TEXT columns, but the greeting query's ->> operator needs JSONB.
+-- Safe to re-run: columns that are already JSONB are skipped.
+--
+-- ALTER COLUMN ... TYPE rewrites gencom.base_information under an ACCESS EXCLUSIVE lock
+-- (one row per user, so this is quick). Cached values that are not valid JSON become NULL
+-- and are regenerated on the next request, exactly as the old "Invalid cached JSON" path did.
+
+-- Lenient text -> jsonb cast used only by this migration
+CREATE OR REPLACE FUNCTION gencom.try_parse_jsonb(value TEXT)
+RETURNS JSONB AS $$
+BEGIN
+    RETURN value::jsonb;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+DO $$
+DECLARE
+    col TEXT;
+BEGIN
+    FOREACH col IN ARRAY ARRAY['cached_analysis', 'cached_analysis_basic', 'cached_analysis_detailed'] LOOP
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'gencom'
+            AND table_name = 'base_information'
+            AND column_name = col
+            AND data_type <> 'jsonb'
+        ) THEN
+            EXECUTE format(
+                'ALTER TABLE gencom.base_information ALTER COLUMN %I TYPE JSONB USING gencom.try_parse_jsonb(%I)',
+                col, col);
+            RAISE NOTICE 'Converted % to JSONB', col;
+        ELSE
+            RAISE NOTICE '% is already JSONB (or missing)', col;
+        END IF;
+    END LOOP;
+END $$;
+
+DROP FUNCTION IF EXISTS gencom.try_parse_jsonb(TEXT);
+
+COMMENT ON COLUMN gencom.base_information.cached_analysis IS 'JSONB cache of LLM-generated condition analysis (expires after 7 days)';
+COMMENT ON COLUMN gencom.base_information.cached_analysis_basic IS 'JSONB cache of the basic analysis: condition, riskLevel, description, gene, variant, classification';
+COMMENT ON COLUMN gencom.base_information.cached_analysis_detailed IS 'JSONB cache of the detailed analysis: implications, recommendations, resources';
+
+SELECT 'cached_analysis columns: ' || string_agg(column_name || '=' || data_type, ', ' ORDER BY column_name) AS status
+FROM information_schema.columns
+WHERE table_schema = 'gencom'
+AND table_name = 'base_information'
+AND column_name LIKE 'cached_analysis%';
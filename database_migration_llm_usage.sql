@@ -0,0 +1,30 @@
+-- Daily Gemini token usage and estimated cost per call site
+-- Every Gemini call (call_custom_llm / call_custom_llm_async) is counted in memory by llm_usage.py
+-- and each worker adds its counters to this table every LLM_USAGE_FLUSH_SEC (default 60 s), one row
+-- per (UTC day, call site, model). call_site is one of llm_usage.CALL_SITES: basic | detailed |
+-- legacy | greeting | background | repair | replay | prewarm | other. estimated_cost_usd uses the
+-- LLM_PRICE_*_PER_MTOK prices at flush time.
+--
+-- Run with: python run_migration.py database_migration_llm_usage.sql
+-- Safe to re-run. Until it has run, the app logs one warning and keeps the counters in memory.
+
+CREATE TABLE IF NOT EXISTS gencom.llm_usage_daily (
+    usage_date DATE NOT NULL,
+    call_site TEXT NOT NULL,
+    model TEXT NOT NULL,
+    calls BIGINT NOT NULL DEFAULT 0,
+    errors BIGINT NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    cached_tokens BIGINT NOT NULL DEFAULT 0,
+    output_tokens BIGINT NOT NULL DEFAULT 0,
+    thoughts_tokens BIGINT NOT NULL DEFAULT 0,
+    total_latency_ms DOUBLE PRECISION NOT NULL DEFAULT 0,
+    estimated_cost_usd NUMERIC(14, 6) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (usage_date, call_site, model)
+);
+
+-- Cost per site over a date range, e.g. the last 30 days:
+--   SELECT call_site, sum(calls), sum(prompt_tokens), sum(cached_tokens), sum(output_tokens),
+--          sum(estimated_cost_usd), sum(total_latency_ms) / nullif(sum(calls), 0) AS avg_latency_ms
+--   FROM gencom.llm_usage_daily WHERE usage_date >= current_date - 30 GROUP BY call_site;
@@ -0,0 +1,158 @@
+-- Convert public.conversation_turns to monthly range partitions on created_at
+-- Every spoken turn of every Tavus/Vapi call lands in this table, and the transcript poll reads
+-- it every 3 seconds. Partitioning keeps the hot month small (index size, vacuum cost) and lets
+-- old months be exported and detached (partition_maintenance.py) instead of DELETEd.
+--
+-- Run with: python run_migration.py database_migration_partition_conversation_turns.sql
+-- Then schedule: python partition_maintenance.py ensure   (monthly; creates upcoming partitions)
+--
+-- The conversion copies every row while holding an ACCESS EXCLUSIVE lock on the table:
+-- turn inserts from the custom LLM service wait until it finishes. Run it in a quiet window.
+-- Safe to re-run: once the table is partitioned only the helper functions are refreshed.
+--
+-- Schema changes:
+--   * primary key becomes (conversation_id, ordinal, created_at) - a partitioned table's unique
+--     keys must include the partition column. Writers using ON CONFLICT (conversation_id, ordinal)
+--     must add created_at.
+--   * created_at becomes NOT NULL (existing NULLs take their conversation's created_at).
+--   * the old table is kept as public.conversation_turns_unpartitioned; drop it once verified.
+
+-- Create monthly partitions from p_from's month through p_months_ahead months after the current one.
+-- Rows already sitting in the DEFAULT partition for a new month are moved into it.
+CREATE OR REPLACE FUNCTION public.ensure_conversation_turn_partitions(
+    p_from TIMESTAMPTZ DEFAULT now(),
+    p_months_ahead INTEGER DEFAULT 3
+)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', COALESCE(p_from, now()))::date;
+    last_month DATE := (date_trunc('month', now()) + make_interval(months => p_months_ahead))::date;
+    month_end DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'public.conversation_turns'::regclass) <> 'p' THEN
+        RAISE NOTICE 'conversation_turns is not partitioned; nothing to do';
+        RETURN 0;
+    END IF;
+
+    WHILE month_start <= last_month LOOP
+        month_end := (month_start + interval '1 month')::date;
+        partition_name := 'conversation_turns_p' || to_char(month_start, 'YYYYMM');
+
+        IF to_regclass('public.' || partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public.%I (LIKE public.conversation_turns INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                partition_name);
+            IF to_regclass('public.conversation_turns_default') IS NOT NULL THEN
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM public.conversation_turns_default
+                                    WHERE created_at >= %L AND created_at < %L RETURNING *)
+                     INSERT INTO public.%I SELECT * FROM moved',
+                    month_start, month_end, partition_name);
+            END IF;
+            EXECUTE format(
+                'ALTER TABLE public.conversation_turns ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_end);
+            created := created + 1;
+            RAISE NOTICE 'Created partition %', partition_name;
+        END IF;
+
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    r RECORD;
+    legacy_rows BIGINT;
+    copied_rows BIGINT;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'public.conversation_turns'::regclass) = 'p' THEN
+        RAISE NOTICE 'conversation_turns is already partitioned';
+        RETURN;
+    END IF;
+
+    LOCK TABLE public.conversation_turns IN ACCESS EXCLUSIVE MODE;
+    ALTER TABLE public.conversation_turns RENAME TO conversation_turns_unpartitioned;
+
+    -- Free the index / constraint names for the new table
+    FOR r IN
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = 'public.conversation_turns_unpartitioned'::regclass
+    LOOP
+        EXECUTE format('ALTER INDEX public.%I RENAME TO %I', r.relname, left(r.relname, 48) || '_unpartitioned');
+    END LOOP;
+
+    UPDATE public.conversation_turns_unpartitioned CT
+    SET created_at = COALESCE(C.created_at, now())
+    FROM public.conversations C
+    WHERE CT.created_at IS NULL AND C.id = CT.conversation_id;
+    UPDATE public.conversation_turns_unpartitioned SET created_at = now() WHERE created_at IS NULL;
+
+    CREATE TABLE public.conversation_turns (
+        LIKE public.conversation_turns_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS
+    ) PARTITION BY RANGE (created_at);
+    ALTER TABLE public.conversation_turns
+        ADD CONSTRAINT conversation_turns_pkey PRIMARY KEY (conversation_id, ordinal, created_at);
+
+    -- Foreign keys (LIKE does not copy them)
+    FOR r IN
+        SELECT conname, pg_get_constraintdef(oid) AS definition
+        FROM pg_constraint
+        WHERE conrelid = 'public.conversation_turns_unpartitioned'::regclass
+        AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE public.conversation_turns ADD CONSTRAINT %I %s', r.conname, r.definition);
+    END LOOP;
+
+    -- Same privileges as before (the custom LLM service writes turns under its own role)
+    FOR r IN
+        SELECT grantee, privilege_type
+        FROM information_schema.role_table_grants
+        WHERE table_schema = 'public'
+        AND table_name = 'conversation_turns_unpartitioned'
+        AND grantee <> current_user
+    LOOP
+        IF r.grantee = 'PUBLIC' THEN
+            EXECUTE format('GRANT %s ON public.conversation_turns TO PUBLIC', r.privilege_type);
+        ELSE
+            EXECUTE format('GRANT %s ON public.conversation_turns TO %I', r.privilege_type, r.grantee);
+        END IF;
+    END LOOP;
+
+    PERFORM public.ensure_conversation_turn_partitions(
+        (SELECT min(created_at) FROM public.conversation_turns_unpartitioned), 3);
+    CREATE TABLE public.conversation_turns_default PARTITION OF public.conversation_turns DEFAULT;
+
+    INSERT INTO public.conversation_turns SELECT * FROM public.conversation_turns_unpartitioned;
+    GET DIAGNOSTICS copied_rows = ROW_COUNT;
+    SELECT count(*) INTO legacy_rows FROM public.conversation_turns_unpartitioned;
+    IF copied_rows <> legacy_rows THEN
+        RAISE EXCEPTION 'Row count mismatch: copied % of % rows', copied_rows, legacy_rows;
+    END IF;
+
+    -- Transcript index (see database_migration_add_query_indexes.sql), built after the bulk copy
+    CREATE INDEX idx_conversation_turns_conversation_created
+        ON public.conversation_turns (conversation_id, created_at DESC);
+
+    -- Move the latest-conversation trigger (database_migration_add_latest_conversation.sql)
+    IF to_regprocedure('public.trg_latest_conversation_on_turn()') IS NOT NULL THEN
+        DROP TRIGGER IF EXISTS trg_user_latest_conversation_turn ON public.conversation_turns_unpartitioned;
+        CREATE TRIGGER trg_user_latest_conversation_turn
+        AFTER INSERT ON public.conversation_turns
+        FOR EACH ROW EXECUTE FUNCTION public.trg_latest_conversation_on_turn();
+    END IF;
+
+    RAISE NOTICE 'Copied % rows into partitioned conversation_turns', copied_rows;
+END $$;
+
+ANALYZE public.conversation_turns;
+
+SELECT 'conversation_turns partitions: ' || count(*) AS status
+FROM pg_inherits
+WHERE inhparent = 'public.conversation_turns'::regclass;
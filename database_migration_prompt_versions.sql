@@ -0,0 +1,15 @@
+-- Record which prompt template produced each cached analysis
+-- prompt_templates.py gives every template a fingerprint (name, version and a hash of its text).
+-- Each cached analysis is stored with the fingerprint that produced it, and cache reads
+-- (BASIC_CACHE_SQL, DETAILED_CACHE_SQL, FULL_CACHE_SQL, GREETING_CONTEXT_SQL) only match the
+-- current one. Editing a template therefore regenerates exactly the analyses that template
+-- wrote, with no manual "SET cached_analysis_basic = NULL".
+--
+-- Run with: python run_migration.py database_migration_prompt_versions.sql
+-- Run it BEFORE deploying the app change: the cache queries select these columns.
+-- Safe to re-run. Existing cached analyses have no fingerprint, so each is regenerated once,
+-- on its next request, with the current prompts.
+
+ALTER TABLE gencom.base_information ADD COLUMN IF NOT EXISTS cached_analysis_prompt TEXT;
+ALTER TABLE gencom.base_information ADD COLUMN IF NOT EXISTS cached_analysis_basic_prompt TEXT;
+ALTER TABLE gencom.base_information ADD COLUMN IF NOT EXISTS cached_analysis_detailed_prompt TEXT;
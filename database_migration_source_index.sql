@@ -0,0 +1,12 @@
+-- BM25 retrieval index for the scraped source document
+-- source_retrieval.build_index(source_document) is stored next to the document by the background
+-- scrape. It holds chunk offsets (split at markdown headings), per-chunk term frequencies and
+-- document frequencies. Analyses then send only the chunks relevant to each section instead of
+-- the whole 50-100 KB document.
+--
+-- Run with: python run_migration.py database_migration_source_index.sql
+-- Run it BEFORE deploying the app change: the analysis endpoints select source_index.
+-- Safe to re-run. Existing documents are indexed on the fly until backfilled with:
+--   python source_retrieval.py --backfill
+
+ALTER TABLE gencom.base_information ADD COLUMN IF NOT EXISTS source_index JSONB;
@@ -0,0 +1,57 @@
+"""
+orjson-backed JSON provider for Flask
+
+Drop-in replacement for Flask's DefaultJSONProvider: jsonify(), app.json.dumps() and the
+async handlers in asgi.py all go through app.json. orjson serializes datetimes, dates,
+UUIDs and dataclasses natively (in Rust), which is several times faster than the stdlib
+encoder on transcript-sized payloads.
+
+Output differences from the default provider:
+  * datetimes are ISO 8601 ("2026-10-18T23:48:14.396534+00:00") instead of HTTP dates
+    ("Sun, 18 Oct 2026 23:48:14 GMT"); naive datetimes are treated as UTC, as before
+  * output is always compact (indent/separators arguments are ignored)
+Keys stay sorted, so responses are otherwise byte-identical.
+
+orjson is optional: when it is not installed, orjson is None and app.py keeps the default provider.
+"""
+import decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = 0
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+
+def _default(o):
+    """Types orjson does not handle itself, converted the way Flask's provider does"""
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider using orjson for dumps/loads and jsonify responses"""
+
+    def dumpb(self, obj) -> bytes:
+        """Serialize straight to UTF-8 bytes (no str round trip)"""
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self.dumpb(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj) + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,190 @@
+"""
+Gemini Context Cache - explicit context caching for the counselor preamble + source document.
+
+The analysis prompts share one counselor system instruction (COUNSELOR_SYSTEM_INSTRUCTION in
+app.py) and, once the background scrape has finished, are grounded in the user's
+source_document (tens of KB of ClinVar/MedlinePlus text). Both are identical for every call about
+the same document, so they are uploaded once with client.caches.create and later calls only send
+the short per-call request plus the cache name (GenerateContentConfig.cached_content). Cached
+tokens are billed at the cached-input rate and are not re-processed.
+
+Caches are keyed by sha256(model, system instruction, document), so users with the same scraped
+document share one cache per worker process and model (llm_routing sends the fast and strong
+tiers to different models; fallback targets never use the cache). Entries are dropped CONTEXT_CACHE_REFRESH_SEC
+before their server-side expiry and recreated on the next call.
+
+Fallback: when caching is disabled, the document is below the model's minimum cacheable size,
+or create fails, callers send the same content inline in a prefix-stable layout (system
+instruction, then document, then request). Gemini's implicit caching can then still reuse the
+common prefix. A failed create is remembered for FAILURE_BACKOFF_SEC so a broken cache API does
+not add a round trip to every call.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHE_ENABLED = os.getenv("GEMINI_CONTEXT_CACHE_ENABLED", "true").lower() == "true"
+CONTEXT_CACHE_TTL_SEC = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SEC", "3600"))
+CONTEXT_CACHE_REFRESH_SEC = 120  # stop using an entry this long before it expires server-side
+# Explicit caches must hold at least ~1024 tokens (model dependent); estimated at 4 chars/token
+CONTEXT_CACHE_MIN_CHARS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_CHARS", "4096"))
+FAILURE_BACKOFF_SEC = 300
+
+
+def cache_key(model: str, system_instruction: str, document: str) -> str:
+    digest = hashlib.sha256()
+    for part in (model, system_instruction or "", document):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def is_cache_error(error: Exception) -> bool:
+    """True when a generate_content failure means the cached content is gone (expired or deleted)"""
+    message = str(error)
+    return "cachedContent" in message or "cached content" in message.lower() or "CachedContent" in message
+
+
+class GeminiContextCache:
+    """
+    Per-process registry of Gemini cached contents.
+
+    get() / aget() return a cache name for (system instruction, document), creating the cache on
+    first use, or None when the caller should fall back to sending the content inline. A lock per
+    key makes concurrent first calls for the same document create a single cache; it is dropped
+    by the create that used it, so _key_locks only holds creates in flight. Expired entries are
+    pruned whenever a cache is created, so the registry only holds the documents of the last ttl_sec.
+    """
+
+    def __init__(self, get_client, model: str, enabled: bool = CONTEXT_CACHE_ENABLED,
+                 ttl_sec: int = CONTEXT_CACHE_TTL_SEC, min_chars: int = CONTEXT_CACHE_MIN_CHARS):
+        self._get_client = get_client
+        self.model = model
+        self.enabled = enabled
+        self.ttl_sec = ttl_sec
+        self.min_chars = min_chars
+        self._entries = {}   # key -> (cache name, monotonic deadline)
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._disabled_until = 0.0
+        self.stats = {"hits": 0, "creates": 0, "fallbacks": 0, "failures": 0}
+
+    def _usable(self, document: str) -> bool:
+        if not self.enabled or not document or len(document) < self.min_chars:
+            return False
+        return time.monotonic() >= self._disabled_until
+
+    def _lookup(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                self.stats["hits"] += 1
+                return entry[0]
+            self._entries.pop(key, None)
+            return None
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _drop_key_lock(self, key: str, lock: threading.Lock):
+        """
+        Forget the key's lock once its create is done (caller holds lock). Threads already waiting
+        on it then find the stored entry; later callers find the entry, or the failure backoff,
+        before needing a lock. Only this lock object is removed, never a newer one for the key.
+        """
+        with self._lock:
+            if self._key_locks.get(key) is lock:
+                del self._key_locks[key]
+
+    def _create_config(self, key: str, system_instruction: str, document: str):
+        return types.CreateCachedContentConfig(
+            display_name=f"gencom-context-{key[:16]}",
+            system_instruction=system_instruction or None,
+            contents=[types.Content(role="user", parts=[types.Part(text=document)])],
+            ttl=f"{self.ttl_sec}s",
+        )
+
+    def _prune(self):
+        """Drop expired entries (caller holds self._lock)"""
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry[1] <= now]:
+            del self._entries[key]
+
+    def _store(self, key: str, name: str):
+        with self._lock:
+            self._prune()
+            self._entries[key] = (name, time.monotonic() + self.ttl_sec - CONTEXT_CACHE_REFRESH_SEC)
+            self.stats["creates"] += 1
+        logger.info(f"🗄️  gemini:context_cache created {name} key={key[:12]} ttl={self.ttl_sec}s")
+
+    def _failed(self, key: str, error: Exception):
+        with self._lock:
+            self._prune()
+            self.stats["failures"] += 1
+            self._disabled_until = time.monotonic() + FAILURE_BACKOFF_SEC
+        logger.warning(f"⚠️  gemini:context_cache create failed key={key[:12]} "
+                       f"({type(error).__name__}: {error}) - sending inline for {FAILURE_BACKOFF_SEC}s")
+
+    def _fallback(self):
+        with self._lock:
+            self.stats["fallbacks"] += 1
+        return None
+
+    def get(self, system_instruction: str, document: str, model: str = None):
+        """Cache name for this preamble + document on model (default self.model), or None to send inline"""
+        if not self._usable(document):
+            return self._fallback()
+        model = model or self.model
+        key = cache_key(model, system_instruction, document)
+        name = self._lookup(key)
+        if name:
+            return name
+        key_lock = self._key_lock(key)
+        with key_lock:
+            try:
+                name = self._lookup(key)
+                if name:
+                    return name
+                try:
+                    cached = self._get_client().caches.create(
+                        model=model, config=self._create_config(key, system_instruction, document))
+                except Exception as e:
+                    self._failed(key, e)
+                    return self._fallback()
+                self._store(key, cached.name)
+                return cached.name
+            finally:
+                self._drop_key_lock(key, key_lock)
+
+    async def aget(self, system_instruction: str, document: str, model: str = None):
+        """Async get(); concurrent first calls in one event loop may each create a cache"""
+        if not self._usable(document):
+            return self._fallback()
+        model = model or self.model
+        key = cache_key(model, system_instruction, document)
+        name = self._lookup(key)
+        if name:
+            return name
+        try:
+            cached = await self._get_client().aio.caches.create(
+                model=model, config=self._create_config(key, system_instruction, document))
+        except Exception as e:
+            self._failed(key, e)
+            return self._fallback()
+        self._store(key, cached.name)
+        return cached.name
+
+    def invalidate(self, name: str):
+        """Forget a cache the API no longer knows (expired early or deleted)"""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry[0] == name:
+                    del self._entries[key]
+        logger.info(f"🗄️  gemini:context_cache dropped {name}")
@@ -0,0 +1,189 @@
+"""
+Gemini Prewarm - build the Gemini clients, fetch credentials and open connections before users do.
+
+_get_gemini_client() creates clients lazily, so without this the first analysis or greeting in
+each worker pays for everything at once: client construction (Vertex: loading ADC credentials),
+the OAuth token fetch, DNS + TLS to the regional endpoint, and the SDK's lazy imports. A
+prewarm run does the same work up front in a background thread and times each step:
+
+    clients      _get_gemini_client(location) for every region a routing target uses
+    credentials  Vertex only: fetch / refresh the access token (the API-key mode has none)
+    connect      GET models/<model> once per routing target (auth header + TLS handshake)
+    generate     optional (GEMINI_PREWARM_GENERATE): a tiny generation on the fast tier,
+                 call_site="prewarm", so model-side cold starts are paid too (billed)
+
+Runs start once per worker process (start() is pid-aware, like the llm_usage flusher) and
+repeat every GEMINI_PREWARM_INTERVAL_SEC. Repeats mainly keep the access token fresh: google-auth
+refreshes a token in the last few minutes of its life, so a run every 4 minutes means no user
+request waits on a token refresh. httpx closes idle connections after 5 seconds, so an opened
+connection only helps requests that arrive right after a run.
+
+snapshot() holds the first and last run and the latency of the first real Gemini call in the
+process, with whether a prewarm had finished before it. That pair is what shows the
+first-request improvement (GET /metrics/llm-usage "prewarm").
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.getenv("GEMINI_PREWARM_ENABLED", "true").lower() == "true"
+PREWARM_INTERVAL_SEC = float(os.getenv("GEMINI_PREWARM_INTERVAL_SEC", "240"))  # 0 = once at startup
+PREWARM_GENERATE = os.getenv("GEMINI_PREWARM_GENERATE", "false").lower() == "true"
+
+
+def _ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+class GeminiPrewarmer:
+    """
+    get_client(location) -> genai.Client, targets() -> routing targets (llm_routing.Target),
+    generate() -> one tiny generation through the normal call path (only with generate=True).
+    """
+
+    def __init__(self, get_client, targets, generate, enabled: bool = PREWARM_ENABLED,
+                 interval_sec: float = PREWARM_INTERVAL_SEC, generate_enabled: bool = PREWARM_GENERATE):
+        self._get_client = get_client
+        self._targets = targets
+        self._generate = generate
+        self.enabled = enabled
+        self.interval_sec = interval_sec
+        self.generate_enabled = generate_enabled
+        self._lock = threading.Lock()
+        self._thread_pid = None
+        self._state = {"runs": 0, "running": False, "first": None, "last": None, "first_call": None}
+
+    def _prime_targets(self):
+        """Unique (model, location) pairs, primary targets first"""
+        seen, targets = set(), []
+        for target in sorted(self._targets(), key=lambda t: t.fallback):
+            if (target.model, target.location) not in seen:
+                seen.add((target.model, target.location))
+                targets.append(target)
+        return targets
+
+    def prime(self) -> dict:
+        """One prewarm run; returns (and stores) its timings. Never raises."""
+        run = {"at": datetime.now(timezone.utc).isoformat(), "ok": True, "clients_ms": 0.0,
+               "credentials_ms": None, "connect_ms": {}, "generate_ms": None, "errors": []}
+        started = time.perf_counter()
+        with self._lock:
+            self._state["running"] = True
+        targets = self._prime_targets()
+
+        clients = {}
+        for location in dict.fromkeys(t.location for t in targets):
+            step = time.perf_counter()
+            try:
+                clients[location] = self._get_client(location)
+            except Exception as e:
+                run["errors"].append(f"client {location or 'default'}: {type(e).__name__}: {e}")
+                continue
+            run["clients_ms"] = round(run["clients_ms"] + _ms(step), 1)
+
+            # Vertex clients fetch an OAuth token on first use and refresh it near expiry
+            api_client = getattr(clients[location], "_api_client", None)
+            if getattr(api_client, "vertexai", False) and hasattr(api_client, "_access_token"):
+                step = time.perf_counter()
+                try:
+                    api_client._access_token()
+                    run["credentials_ms"] = round((run["credentials_ms"] or 0) + _ms(step), 1)
+                except Exception as e:
+                    run["errors"].append(f"credentials {location or 'default'}: {type(e).__name__}: {e}")
+
+        for target in targets:
+            client = clients.get(target.location)
+            if client is None:
+                continue
+            step = time.perf_counter()
+            try:
+                client.models.get(model=target.model)
+                run["connect_ms"][target.label] = _ms(step)
+            except Exception as e:
+                run["errors"].append(f"connect {target.label}: {type(e).__name__}: {e}")
+
+        if self.generate_enabled and not run["errors"]:
+            step = time.perf_counter()
+            try:
+                self._generate()
+                run["generate_ms"] = _ms(step)
+            except Exception as e:
+                run["errors"].append(f"generate: {type(e).__name__}: {e}")
+
+        run["ok"] = not run["errors"]
+        run["total_ms"] = _ms(started)
+        with self._lock:
+            self._state["runs"] += 1
+            self._state["running"] = False
+            self._state["first"] = self._state["first"] or run
+            self._state["last"] = run
+
+        connect = ", ".join(f"{label}={ms:.0f}ms" for label, ms in run["connect_ms"].items()) or "-"
+        message = (f"gemini:prewarm clients={run['clients_ms']:.0f}ms credentials={run['credentials_ms'] or 0:.0f}ms "
+                   f"connect=[{connect}] generate={run['generate_ms'] or 0:.0f}ms total={run['total_ms']:.0f}ms")
+        if run["ok"]:
+            logger.info(f"🔥 {message}")
+        else:
+            logger.warning(f"⚠️  {message} errors={run['errors']}")
+        return run
+
+    async def aprime(self):
+        """Open the async (client.aio) connections too; for asgi.py, whose calls use that surface"""
+        for target in self._prime_targets():
+            if target.fallback:
+                continue
+            step = time.perf_counter()
+            try:
+                await self._get_client(target.location).aio.models.get(model=target.model)
+                logger.info(f"🔥 gemini:prewarm:async connect {target.label}={_ms(step):.0f}ms")
+            except Exception as e:
+                logger.warning(f"⚠️  gemini:prewarm:async connect {target.label} failed: {type(e).__name__}: {e}")
+
+    def start(self) -> bool:
+        """Start the prewarm thread for this process (no-op if running or disabled); True if started"""
+        if not self.enabled or self._thread_pid == os.getpid():
+            return False
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return False
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._loop, name="gemini-prewarm", daemon=True).start()
+        return True
+
+    def _loop(self):
+        while True:
+            self.prime()
+            if self.interval_sec <= 0:
+                return
+            time.sleep(self.interval_sec)
+
+    def observe_call(self, call_site: str, latency_ms: float):
+        """Remember the first real Gemini call of the process (cheap check after that)"""
+        if self._state["first_call"] is not None or call_site == "prewarm":
+            return
+        with self._lock:
+            if self._state["first_call"] is None:
+                self._state["first_call"] = {
+                    "call_site": call_site,
+                    "latency_ms": round(latency_ms, 1),
+                    "after_prewarm": self._state["runs"] > 0,
+                }
+
+    def status(self) -> dict:
+        """Short form for /healthz"""
+        with self._lock:
+            last = self._state["last"]
+            if not self.enabled:
+                return {"status": "disabled"}
+            if last is None:
+                return {"status": "warming" if self._state["running"] else "not_started"}
+            return {"status": "warm" if last["ok"] else "failed", "last_ms": last["total_ms"], "at": last["at"]}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "interval_sec": self.interval_sec,
+                    "generate": self.generate_enabled, "pid": os.getpid(), **self._state}
@@ -18,6 +18,10 @@ from markdownify import markdownify as md
 USER_AGENT = os.getenv("WEB_USER_AGENT", "GeneticApp/1.0 (+contact@yourapp.com)")
 TIMEOUT = float(os.getenv("WEB_FETCH_TIMEOUT_MS", "20000")) / 1000.0
 
+# Site roots (overridable so benchmarks can serve saved pages locally)
+CLINVAR_BASE_URL = os.getenv("CLINVAR_BASE_URL", "https://www.ncbi.nlm.nih.gov").rstrip("/")
+MEDLINEPLUS_BASE_URL = os.getenv("MEDLINEPLUS_BASE_URL", "https://medlineplus.gov").rstrip("/")
+
 # Rate limiting tracker
 _last_hit_ts: Dict[str, float] = {}
 
@@ -71,7 +75,7 @@ def search_clinvar(gene: str, mutation: str) -> Dict:
     query = f"{gene} {mutation}"
     
     # Step 1: Search ClinVar
-    search_url = "https://www.ncbi.nlm.nih.gov/clinvar/"
+    search_url = f"{CLINVAR_BASE_URL}/clinvar/"
     params = {"term": query}
     headers = {
         "User-Agent": USER_AGENT,
@@ -96,7 +100,7 @@ def search_clinvar(gene: str, mutation: str) -> Dict:
     for a in soup.find_all("a", href=True):
         href = a["href"]
         if "/clinvar/variation" in href or "/clinvar/VCV" in href:
-            variant_url = urllib.parse.urljoin("https://www.ncbi.nlm.nih.gov", href)
+            variant_url = urllib.parse.urljoin(CLINVAR_BASE_URL, href)
             break
     
     # Fallback to RCV pages
@@ -104,7 +108,7 @@ def search_clinvar(gene: str, mutation: str) -> Dict:
         for a in soup.find_all("a", href=True):
             href = a["href"]
             if "/clinvar/RCV" in href:
-                variant_url = urllib.parse.urljoin("https://www.ncbi.nlm.nih.gov", href)
+                variant_url = urllib.parse.urljoin(CLINVAR_BASE_URL, href)
                 break
     
     if not variant_url:
@@ -219,7 +223,7 @@ def search_medlineplus(gene: str) -> Dict:
     gene = gene.strip().upper()
     
     # MedlinePlus uses lowercase gene names in URLs
-    url = f"https://medlineplus.gov/genetics/gene/{gene.lower()}/"
+    url = f"{MEDLINEPLUS_BASE_URL}/genetics/gene/{gene.lower()}/"
     headers = {
         "User-Agent": USER_AGENT,
         "Accept": "text/html,application/xhtml+xml",
@@ -0,0 +1,160 @@
+"""
+Gunicorn configuration for the Gene Guide AI backend.
+
+Picked up automatically by `gunicorn app:app` from the working directory and
+passed explicitly (`-c gunicorn.conf.py`) by the Procfile and Dockerfiles.
+
+Every handler in app.py is I/O-bound (Postgres, Gemini, Tavus, web scraping),
+so the default worker model is gthread: a handful of processes, each serving
+several requests concurrently while others wait on the network. Select the
+model with GUNICORN_WORKER_CLASS:
+
+    gthread (default)  WEB_CONCURRENCY processes x GUNICORN_THREADS threads
+    gevent             WEB_CONCURRENCY processes x GUNICORN_WORKER_CONNECTIONS greenlets
+                       (requires gevent + psycogreen; psycopg2 is patched to yield)
+    sync               one request per process (previous behaviour)
+    uvicorn            asyncio event loop per process; serve asgi:application
+                       (async hot endpoints, Flask routes on GUNICORN_THREADS threads)
+
+The database pool in app.py is sized per worker from these numbers via
+DB_POOL_MAXCONN, unless DB_POOL_MAXCONN is set explicitly.
+"""
+import os
+import sys
+
+# ============================================================================
+# WORKER MODEL
+# ============================================================================
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "gevent": "gevent",
+    "uvicorn": "uvicorn.workers.UvicornWorker",
+}
+
+_worker_mode = os.getenv("GUNICORN_WORKER_CLASS", "gthread").lower()
+if _worker_mode not in WORKER_CLASSES:
+    raise ValueError(
+        f"GUNICORN_WORKER_CLASS must be one of {sorted(WORKER_CLASSES)}, got {_worker_mode!r}"
+    )
+
+worker_class = WORKER_CLASSES[_worker_mode]
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8")) if _worker_mode in ("gthread", "uvicorn") else 1
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8081')}"
+
+# Gemini analysis calls can take 20s+; keep the historical 120s hard timeout
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers periodically to bound memory growth (BeautifulSoup/markdownify
+# on 50 KB pages, google-genai client buffers); jitter avoids synchronized restarts
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# preload_app imports app.py once in the master so workers share its memory
+# copy-on-write and start faster. It is off by default for gevent, whose monkey
+# patching must happen before requests/ssl are imported.
+preload_app = os.getenv(
+    "GUNICORN_PRELOAD", "false" if _worker_mode == "gevent" else "true"
+).lower() == "true"
+
+
+# ============================================================================
+# DATABASE POOL SIZING
+# ============================================================================
+def requests_per_worker(mode: str = _worker_mode) -> int:
+    """Number of requests a single worker process can have in flight on the psycopg2 pool"""
+    if mode in ("gthread", "uvicorn"):
+        # uvicorn: async routes use their own pool (ASYNC_DB_POOL_MAXCONN); Flask routes run on `threads`
+        return threads
+    if mode == "gevent":
+        return worker_connections
+    return 1
+
+
+def db_pool_maxconn(mode: str = _worker_mode) -> int:
+    """
+    Per-worker DB_POOL_MAXCONN: one connection per in-flight request plus
+    headroom for background threads (analysis generation, web scraping).
+    DB_MAX_CONNECTIONS (default 80, 0 = no cap) caps the total across all
+    workers so the instance stays inside the Postgres server's connection
+    budget (stock max_connections=100). A capped pool is smaller than the
+    number of in-flight requests; app.py's pool then makes requests wait
+    for a free connection (DB_POOL_TIMEOUT_SEC) instead of failing.
+    """
+    headroom = int(os.getenv("DB_POOL_HEADROOM", "2"))
+    size = requests_per_worker(mode) + headroom
+    total_budget = int(os.getenv("DB_MAX_CONNECTIONS") or "80")
+    if total_budget > 0:
+        size = min(size, max(1, total_budget // max(1, workers)))
+    return size
+
+
+os.environ.setdefault("DB_POOL_MAXCONN", str(db_pool_maxconn()))
+
+
+# ============================================================================
+# SERVER HOOKS
+# ============================================================================
+def _app_module():
+    """The loaded app.py module, if this server is running app:app"""
+    return sys.modules.get("app")
+
+
+def when_ready(server):
+    """
+    Runs in the master once the app is loaded (preload_app) and before workers
+    are forked. Close the master's pool so no socket is inherited by workers.
+    """
+    server.log.info(
+        "gunicorn:config worker_class=%s workers=%s threads=%s worker_connections=%s "
+        "preload_app=%s max_requests=%s db_pool_maxconn=%s",
+        worker_class, workers, threads, worker_connections,
+        preload_app, max_requests, os.environ.get("DB_POOL_MAXCONN"),
+    )
+    pool_size = int(os.environ["DB_POOL_MAXCONN"])
+    if pool_size < requests_per_worker():
+        server.log.warning(
+            "gunicorn:config db_pool_maxconn=%s is below the %s requests a worker can have in flight "
+            "(DB_MAX_CONNECTIONS=%s or DB_POOL_MAXCONN) - requests will wait up to DB_POOL_TIMEOUT_SEC for a connection",
+            pool_size, requests_per_worker(), os.getenv("DB_MAX_CONNECTIONS") or "80",
+        )
+    module = _app_module()
+    if module is not None and hasattr(module, "close_db_pool"):
+        module.close_db_pool()
+
+
+def post_fork(server, worker):
+    """
+    Runs in each worker right after fork, before the app is imported (unless
+    preloaded). Under gevent, register psycogreen's wait callback here: psycopg2
+    only makes connections cooperative if the callback exists when they open.
+    """
+    if _worker_mode != "gevent":
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        worker.log.warning(
+            "gunicorn:gevent psycogreen not installed - psycopg2 calls will block the event loop"
+        )
+    else:
+        patch_psycopg()
+        worker.log.info("gunicorn:gevent psycopg2 patched for cooperative I/O")
+
+
+def post_worker_init(worker):
+    """
+    Runs in each worker once the app is loaded. Give the worker its own
+    connection pool (a no-op if app.py already created one in this process)
+    and start its Gemini prewarm, so the master never opens connections before fork.
+    """
+    module = _app_module()
+    if module is not None and hasattr(module, "init_db_pool"):
+        module.init_db_pool()
+    if module is not None and hasattr(module, "gemini_prewarmer"):
+        module.gemini_prewarmer.start()
@@ -0,0 +1,112 @@
+"""
+Negotiated gzip / brotli compression for JSON and text responses
+
+Transcripts (up to 1000 turns) and source documents (up to ~100 KB of markdown) are
+large, repetitive text and shrink 5-10x. Compression is applied to complete bodies only:
+streamed responses (e.g. the COPY export) and bodies below the size threshold are left alone.
+
+Used by app.py (after_request hook via init_app) and asgi.py (compress_body) with the same
+settings. brotli is optional; without it only gzip is offered.
+"""
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """{coding: q} from an Accept-Encoding header"""
+    codings = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(accept_encoding: str, brotli_enabled: bool = True):
+    """'br', 'gzip' or None: brotli when available and accepted, else gzip"""
+    codings = parse_accept_encoding(accept_encoding)
+    wildcard = codings.get("*", 0.0)
+    candidates = (["br"] if brotli is not None and brotli_enabled else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def is_compressible(mimetype: str) -> bool:
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_MIMETYPES)
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 4, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality, mode=brotli.MODE_TEXT)
+    # mtime=0 keeps the output deterministic for identical bodies
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def compress_body(body: bytes, mimetype: str, accept_encoding: str, min_bytes: int,
+                  gzip_level: int = 4, brotli_quality: int = 4, brotli_enabled: bool = True):
+    """(body, encoding) - encoding is None when the body is sent as-is"""
+    if len(body) < min_bytes or not is_compressible(mimetype):
+        return body, None
+    encoding = choose_encoding(accept_encoding, brotli_enabled)
+    if encoding is None:
+        return body, None
+    return compress(body, encoding, gzip_level, brotli_quality), encoding
+
+
+def weaken_etag(etag_header: str) -> str:
+    """
+    Compressed bytes differ from the identity body the strong ETag was computed for, so the
+    tag becomes weak (as nginx does). If-None-Match uses weak comparison, so 304s still work.
+    """
+    return etag_header if etag_header.startswith("W/") else f"W/{etag_header}"
+
+
+def init_app(app, min_bytes: int, gzip_level: int = 4, brotli_quality: int = 4, brotli_enabled: bool = True):
+    """Compress eligible Flask responses in an after_request hook"""
+
+    @app.after_request
+    def compress_response(response):
+        response.vary.add("Accept-Encoding")
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        body, encoding = compress_body(
+            response.get_data(), response.mimetype, request.headers.get("Accept-Encoding"),
+            min_bytes, gzip_level, brotli_quality, brotli_enabled,
+        )
+        if encoding is None:
+            return response
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        if "ETag" in response.headers:
+            response.headers["ETag"] = weaken_etag(response.headers["ETag"])
+        return response
+
+    return compress_response
@@ -0,0 +1,251 @@
+"""
+LLM JSON - one tolerant, schema-checked parser for the analysis answers Gemini returns.
+
+Every analysis call site used to run strip_json_fences + json.loads and answer 500 on any
+decode error, throwing away a generation that was usually almost right. parse() instead:
+
+1. finds the JSON object wherever it is (code fences, prose before it, text after it) and
+   decodes it in place with JSONDecoder.raw_decode, without slicing the response into copies;
+2. salvages truncated output (max_output_tokens hit mid-object) by cutting back to the last
+   complete element and closing the open brackets;
+3. validates the result against the expected schema (basic / detailed / full): keeps only the
+   schema's fields, normalises riskLevel, coerces a bare string into a one-item list, and
+   reports which required fields are missing or unusable.
+
+When fields are missing the caller (app.parse_analysis / parse_analysis_async) makes one cheap
+repair call for just those fields (repair_prompt) and merges the answer with merge_repair,
+instead of regenerating the whole analysis.
+
+The same field table drives generation: response_schema() is passed to Gemini as
+GenerateContentConfig.response_schema so the model emits exactly these fields (riskLevel as an
+enum, lists capped at LIST_ITEMS), and max_output_tokens() sizes the output cap from the fields'
+token budgets, never below the caps the call sites used before (MIN_OUTPUT_TOKENS).
+"""
+import functools
+import json
+import os
+import threading
+
+from google.genai import types
+
+import prompt_templates
+
+RESPONSE_SCHEMA_ENABLED = os.getenv("LLM_RESPONSE_SCHEMA_ENABLED", "true").lower() == "true"
+# Thinking tokens count against max_output_tokens on Gemini 3 models, so every cap keeps this margin
+THINKING_HEADROOM_TOKENS = int(os.getenv("LLM_THINKING_HEADROOM_TOKENS", "768"))
+# The config sets no thinking budget (the SDK has none to set), so thinking is unbounded and the
+# caps never drop below what the call sites used before; "fields" covers repair calls
+MIN_OUTPUT_TOKENS = {"basic": 1024, "detailed": 2048, "full": 2048, "fields": 1024}
+RISK_LEVELS = ("High", "Moderate", "Low")
+LIST_ITEMS = 4
+
+# field -> (type, description, output token budget). The descriptions are what the analysis prompts ask for
+ANALYSIS_FIELDS = {
+    "condition": (str, "Primary condition name associated with this gene variant", 32),
+    "riskLevel": (str, "High/Moderate/Low", 8),
+    "description": (str, "A clear, patient-friendly 2-3 sentence description of what this variant means", 160),
+    "implications": (list, "Health implications, 4 short items", 200),
+    "recommendations": (list, "Recommended actions, 4 short items", 200),
+    "resources": (list, "Educational resource names, 4 items", 80),
+}
+
+SCHEMAS = {
+    "basic": ("condition", "riskLevel", "description"),
+    "detailed": ("implications", "recommendations", "resources"),
+}
+SCHEMAS["full"] = SCHEMAS["basic"] + SCHEMAS["detailed"]
+
+_decoder = json.JSONDecoder()
+_stats_lock = threading.Lock()
+stats = {"parsed": 0, "unfenced": 0, "salvaged": 0, "incomplete": 0, "repaired": 0, "unrepaired": 0, "failed": 0}
+
+
+class LLMResponseError(ValueError):
+    """The answer could not be turned into the expected schema; `raw` holds its first 500 chars"""
+
+    def __init__(self, message: str, raw: str = ""):
+        super().__init__(message)
+        self.raw = (raw or "")[:500]
+
+
+def _count(outcome: str):
+    with _stats_lock:
+        stats[outcome] += 1
+
+
+def _close_truncated(text: str, start: int):
+    """
+    The object starting at text[start] cut back to its last complete element and closed,
+    or None. Handles output that stopped mid-string, mid-key or mid-list.
+    """
+    stack = []
+    in_string = escaped = False
+    cut = None  # (index of the last top-level-safe comma, closers needed there)
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            stack.append("}")
+        elif ch == "[":
+            stack.append("]")
+        elif ch in "}]":
+            if not stack or stack.pop() != ch:
+                return None
+            if not stack:
+                return None  # complete but still undecodable: not a truncation
+        elif ch == ",":
+            cut = (i, "".join(reversed(stack)))
+    if cut is None:
+        return None
+    try:
+        value = json.loads(text[start:cut[0]] + cut[1])
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def extract_object(text: str):
+    """
+    (object, how) for the first JSON object in an LLM answer, how being "clean", "unfenced"
+    (found after fences or prose, or followed by trailing text) or "salvaged" (truncated and
+    closed). Returns (None, "failed") when there is no usable object.
+    """
+    if not text:
+        return None, "failed"
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, end = _decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            salvaged = _close_truncated(text, start)
+            if salvaged is not None:
+                return salvaged, "salvaged"
+        else:
+            if isinstance(value, dict):
+                clean = not text[:start].strip() and not text[end:].strip()
+                return value, "clean" if clean else "unfenced"
+        start = text.find("{", start + 1)
+    return None, "failed"
+
+
+def _normalise(field: str, value):
+    """The value coerced to the field's type, or None when it is unusable"""
+    kind = ANALYSIS_FIELDS[field][0]
+    if kind is str:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str) or not value.strip():
+            return None
+        value = value.strip()
+        if field == "riskLevel":
+            lowered = value.lower()
+            return next((level for level in RISK_LEVELS if lowered.startswith(level.lower())), None)
+        return value
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        return None
+    items = [str(item).strip() for item in value
+             if isinstance(item, (str, int, float)) and not isinstance(item, bool) and str(item).strip()]
+    return items or None
+
+
+def validate(data: dict, schema: str):
+    """(fields of the schema that are usable, names of the missing or unusable ones)"""
+    clean, missing = {}, []
+    for field in SCHEMAS[schema]:
+        value = _normalise(field, data.get(field)) if field in data else None
+        if value is None:
+            missing.append(field)
+        else:
+            clean[field] = value
+    return clean, missing
+
+
+def parse(text: str, schema: str):
+    """
+    (data, missing) for an analysis answer. data holds only the schema's fields; missing lists
+    the required fields a repair call should fill. Raises LLMResponseError when the answer
+    contains no JSON object at all.
+    """
+    value, how = extract_object(text)
+    if value is None:
+        _count("failed")
+        raise LLMResponseError("The AI returned an invalid format", text)
+    _count("parsed")
+    if how != "clean":
+        _count(how)
+    data, missing = validate(value, schema)
+    if missing:
+        _count("incomplete")
+    return data, missing
+
+
+def _fields(schema) -> tuple:
+    """Field names for a schema name ("basic", "detailed", "full") or an explicit list of fields"""
+    return SCHEMAS[schema] if isinstance(schema, str) else tuple(schema)
+
+
+@functools.lru_cache(maxsize=None)
+def _response_schema(fields: tuple) -> types.Schema:
+    properties = {}
+    for field in fields:
+        kind, description, _ = ANALYSIS_FIELDS[field]
+        if kind is list:
+            properties[field] = types.Schema(type="ARRAY", description=description, min_items=1, max_items=LIST_ITEMS,
+                                             items=types.Schema(type="STRING"))
+        elif field == "riskLevel":
+            properties[field] = types.Schema(type="STRING", description=description, enum=list(RISK_LEVELS))
+        else:
+            properties[field] = types.Schema(type="STRING", description=description)
+    return types.Schema(type="OBJECT", properties=properties, required=list(fields), property_ordering=list(fields))
+
+
+def response_schema(schema) -> types.Schema:
+    """Gemini response schema for a schema name or a list of fields (shared, do not mutate)"""
+    return _response_schema(_fields(schema))
+
+
+def max_output_tokens(schema) -> int:
+    """Output cap for a schema: its fields' token budgets plus THINKING_HEADROOM_TOKENS, at least MIN_OUTPUT_TOKENS"""
+    budget = sum(ANALYSIS_FIELDS[field][2] for field in _fields(schema)) + THINKING_HEADROOM_TOKENS
+    return max(budget, MIN_OUTPUT_TOKENS[schema if isinstance(schema, str) else "fields"])
+
+
+def repair_prompt(gene: str, mutation: str, classification: str, data: dict, missing: list) -> str:
+    """Prompt that asks only for the missing fields, with the ones already generated as context"""
+    lines = []
+    for field in missing:
+        kind, description, _ = ANALYSIS_FIELDS[field]
+        lines.append(f'  "{field}": ["{description}"]' if kind is list else f'  "{field}": "{description}"')
+    return prompt_templates.REPAIR_ANALYSIS.render(
+        gene=gene, mutation=mutation, classification=classification,
+        partial=json.dumps(data, ensure_ascii=False) if data else "{}",
+        fields="{\n" + ",\n".join(lines) + "\n}",
+    )
+
+
+def merge_repair(data: dict, missing: list, text: str) -> list:
+    """Fill data from a repair answer in place; returns the fields still missing"""
+    value, _ = extract_object(text)
+    if value is not None:
+        for field in missing:
+            normalised = _normalise(field, value.get(field)) if field in value else None
+            if normalised is not None:
+                data[field] = normalised
+    still_missing = [field for field in missing if field not in data]
+    _count("unrepaired" if still_missing else "repaired")
+    return still_missing
+
+
+def snapshot() -> dict:
+    with _stats_lock:
+        return dict(stats)
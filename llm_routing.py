@@ -0,0 +1,114 @@
+"""
+LLM Routing - which Gemini model (and Vertex region) serves each call, with a timeout fallback chain.
+
+Calls are routed by class instead of all going to GEMINI_MODEL:
+
+    fast    greeting (call-start critical path), basic analysis (endpoint and background), repair,
+            prewarm generation (gemini_prewarm.py)
+    strong  detailed analysis (endpoint and background), legacy full analysis, everything else
+
+Each tier is a chain of targets tried in order: the tier's own model in VERTEX_LOCATION, then
+GEMINI_FALLBACK_MODEL and/or GEMINI_FALLBACK_LOCATION when configured. An attempt with a next
+target carries a per-request timeout; a target that times out, is rate limited (429) or fails
+server-side (5xx) hands the call to the next one. The last target has no timeout of its own
+(the fallback one only applies when configured), so a chain without fallback behaves as before. Other errors (bad request, auth) are raised straight away, since
+another model would fail the same way.
+
+Explicit context caches (gemini_context_cache.py) are per model and region, so only the first
+target of a chain uses them; fallback targets send the document inline.
+
+Which target served each call is logged on the 📊 gemini:usage line, counted in stats
+(GET /metrics/llm-usage "routing") and reaches the llm_usage_daily rollup through its model.
+"""
+import asyncio
+import os
+import threading
+from collections import Counter
+from typing import NamedTuple
+
+import httpx
+from google.genai import errors
+
+FAST_SITES = frozenset({"greeting", "basic", "repair", "prewarm"})
+STRONG_SITES = frozenset({"detailed", "legacy"})
+
+
+class Target(NamedTuple):
+    tier: str
+    model: str
+    location: str | None  # Vertex region; None = the client default
+    timeout_sec: float | None  # None = no per-request timeout
+    fallback: bool
+
+    @property
+    def label(self) -> str:
+        where = f"@{self.location}" if self.location else ""
+        return f"{self.tier}{':fallback' if self.fallback else ''}:{self.model}{where}"
+
+
+def tier_for(call_site: str, response_schema=None) -> str:
+    """Call class for a call site; background and replay calls are classed by what they generate"""
+    if call_site in FAST_SITES:
+        return "fast"
+    if call_site in STRONG_SITES:
+        return "strong"
+    return "fast" if response_schema == "basic" else "strong"
+
+
+def should_fall_back(error: Exception) -> bool:
+    """True for failures another model or region may not have: timeouts, 429 and 5xx"""
+    if isinstance(error, (httpx.TimeoutException, asyncio.TimeoutError, TimeoutError)):
+        return True
+    if isinstance(error, errors.ServerError):
+        return True
+    return isinstance(error, errors.ClientError) and getattr(error, "code", None) == 429
+
+
+class Router:
+    """
+    Target chains per tier. Models, fallback and timeouts come from the environment:
+    GEMINI_MODEL_FAST / GEMINI_MODEL_STRONG (default: default_model), GEMINI_FALLBACK_MODEL,
+    GEMINI_FALLBACK_LOCATION (Vertex only), GEMINI_TIMEOUT_FAST_SEC / _STRONG_SEC / _FALLBACK_SEC.
+    The primary timeouts only apply when a fallback target follows; GEMINI_TIMEOUT_FALLBACK_SEC
+    (unset by default) bounds the fallback attempt itself.
+    """
+
+    def __init__(self, default_model: str, vertex: bool):
+        fallback_model = os.getenv("GEMINI_FALLBACK_MODEL") or None
+        fallback_location = (os.getenv("GEMINI_FALLBACK_LOCATION") or None) if vertex else None
+        fallback_timeout = float(os.getenv("GEMINI_TIMEOUT_FALLBACK_SEC") or 0) or None
+        has_fallback = bool(fallback_model or fallback_location)
+        self.chains = {}
+        for tier, model_env, timeout_env, timeout_default in (
+                ("fast", "GEMINI_MODEL_FAST", "GEMINI_TIMEOUT_FAST_SEC", "30"),
+                ("strong", "GEMINI_MODEL_STRONG", "GEMINI_TIMEOUT_STRONG_SEC", "90")):
+            model = os.getenv(model_env) or default_model
+            # Without a next target a timeout would only turn a slow answer into a failure
+            timeout = float(os.getenv(timeout_env, timeout_default)) if has_fallback else None
+            chain = [Target(tier, model, None, timeout, False)]
+            if has_fallback:
+                chain.append(Target(tier, fallback_model or model, fallback_location, fallback_timeout, True))
+            self.chains[tier] = tuple(chain)
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def chain(self, call_site: str, response_schema=None) -> tuple:
+        return self.chains[tier_for(call_site, response_schema)]
+
+    def record(self, target: Target, outcome: str):
+        """outcome: "served", "fell_back" (timeout / 429 / 5xx) or "failed" """
+        with self._lock:
+            self._stats[(target.label, outcome)] += 1
+
+    def snapshot(self) -> dict:
+        """{target label: {outcome: count}} for this process"""
+        with self._lock:
+            items = list(self._stats.items())
+        result = {}
+        for (label, outcome), count in sorted(items):
+            result.setdefault(label, {})[outcome] = count
+        return result
+
+    def describe(self) -> str:
+        return "; ".join(" -> ".join(f"{t.label} ({f'{t.timeout_sec:g}s' if t.timeout_sec else 'no timeout'})" for t in chain)
+                         for chain in self.chains.values())
@@ -0,0 +1,178 @@
+"""
+LLM Usage - token and cost accounting for Gemini calls.
+
+Every call_custom_llm / call_custom_llm_async call records its usage_metadata (prompt, cached,
+output and thinking tokens), model, latency and calling site here. Counters are kept per
+(UTC day, call site, model) in memory and flushed every LLM_USAGE_FLUSH_SEC into the
+gencom.llm_usage_daily rollup (database_migration_llm_usage.sql) by adding to the stored totals,
+so every gunicorn worker can flush its own deltas.
+
+Cost is estimated from per-million-token prices (LLM_PRICE_*_PER_MTOK); cached prompt tokens are
+billed at the cached rate and thinking tokens at the output rate.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+CALL_SITES = ("basic", "detailed", "legacy", "greeting", "background", "repair", "replay", "prewarm", "other")
+
+# USD per 1M tokens; override with your contract's rates
+PRICE_INPUT_PER_MTOK = float(os.getenv("LLM_PRICE_INPUT_PER_MTOK", "0.50"))
+PRICE_CACHED_INPUT_PER_MTOK = float(os.getenv("LLM_PRICE_CACHED_INPUT_PER_MTOK", "0.05"))
+PRICE_OUTPUT_PER_MTOK = float(os.getenv("LLM_PRICE_OUTPUT_PER_MTOK", "3.00"))
+FLUSH_INTERVAL_SEC = float(os.getenv("LLM_USAGE_FLUSH_SEC", "60"))  # 0 disables the database rollup
+
+COUNTERS = ("calls", "errors", "prompt_tokens", "cached_tokens", "output_tokens", "thoughts_tokens", "latency_ms")
+
+UPSERT_DAILY_SQL = """
+    INSERT INTO gencom.llm_usage_daily
+        (usage_date, call_site, model, calls, errors, prompt_tokens, cached_tokens,
+         output_tokens, thoughts_tokens, total_latency_ms, estimated_cost_usd, updated_at)
+    VALUES %s
+    ON CONFLICT (usage_date, call_site, model) DO UPDATE SET
+        calls = llm_usage_daily.calls + EXCLUDED.calls,
+        errors = llm_usage_daily.errors + EXCLUDED.errors,
+        prompt_tokens = llm_usage_daily.prompt_tokens + EXCLUDED.prompt_tokens,
+        cached_tokens = llm_usage_daily.cached_tokens + EXCLUDED.cached_tokens,
+        output_tokens = llm_usage_daily.output_tokens + EXCLUDED.output_tokens,
+        thoughts_tokens = llm_usage_daily.thoughts_tokens + EXCLUDED.thoughts_tokens,
+        total_latency_ms = llm_usage_daily.total_latency_ms + EXCLUDED.total_latency_ms,
+        estimated_cost_usd = llm_usage_daily.estimated_cost_usd + EXCLUDED.estimated_cost_usd,
+        updated_at = now()
+"""
+
+DAILY_USAGE_SQL = """
+    SELECT usage_date, call_site, model, calls, errors, prompt_tokens, cached_tokens,
+           output_tokens, thoughts_tokens, total_latency_ms, estimated_cost_usd
+    FROM gencom.llm_usage_daily
+    WHERE usage_date >= (now() AT TIME ZONE 'utc')::date - %s
+    ORDER BY usage_date DESC, estimated_cost_usd DESC
+"""
+
+
+def estimate_cost(prompt_tokens: int, cached_tokens: int, output_tokens: int, thoughts_tokens: int = 0) -> float:
+    """Estimated USD for a call (or a sum of calls) at the configured prices"""
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * PRICE_INPUT_PER_MTOK
+            + cached_tokens * PRICE_CACHED_INPUT_PER_MTOK
+            + (output_tokens + thoughts_tokens) * PRICE_OUTPUT_PER_MTOK) / 1_000_000
+
+
+class UsageTracker:
+    """
+    Thread-safe per-(day, site, model) counters for this process.
+
+    totals accumulate since process start (served by the metrics endpoint); pending holds what
+    has not been written to gencom.llm_usage_daily yet. The flush thread is started lazily in
+    each process (gunicorn workers fork after import, and threads do not survive fork).
+    """
+
+    def __init__(self, get_db_pool, flush_interval: float = FLUSH_INTERVAL_SEC):
+        self._get_db_pool = get_db_pool
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._pending = {}
+        self._flusher_pid = None
+        self._table_missing_logged = False
+
+    def record(self, call_site: str, model: str, usage: dict, latency_ms: float, ok: bool = True):
+        if call_site not in CALL_SITES:
+            call_site = "other"
+        key = (datetime.now(timezone.utc).date(), call_site, model)
+        usage = usage or {}
+        delta = (
+            1,
+            0 if ok else 1,
+            usage.get("prompt_tokens", 0),
+            usage.get("cached_tokens", 0),
+            usage.get("completion_tokens", 0),
+            usage.get("thoughts_tokens", 0),
+            latency_ms,
+        )
+        with self._lock:
+            for counters in (self._totals, self._pending):
+                current = counters.get(key)
+                counters[key] = delta if current is None else tuple(a + b for a, b in zip(current, delta))
+        self._ensure_flusher()
+
+    def snapshot(self) -> list:
+        """This process's totals since start, one dict per (day, site, model)"""
+        with self._lock:
+            items = list(self._totals.items())
+        rows = []
+        for (day, site, model), values in sorted(items, reverse=True):
+            row = dict(zip(COUNTERS, values))
+            row.update({
+                "usage_date": day.isoformat(),
+                "call_site": site,
+                "model": model,
+                "avg_latency_ms": round(row["latency_ms"] / row["calls"], 1) if row["calls"] else 0.0,
+                "estimated_cost_usd": round(estimate_cost(row["prompt_tokens"], row["cached_tokens"],
+                                                          row["output_tokens"], row["thoughts_tokens"]), 6),
+            })
+            rows.append(row)
+        return rows
+
+    def flush(self) -> int:
+        """Add pending counters to gencom.llm_usage_daily; returns rows written (0 when nothing to do)"""
+        db_pool = self._get_db_pool()
+        if db_pool is None:
+            return 0
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        rows = [
+            (day, site, model, calls, errors, prompt, cached, output, thoughts, latency,
+             estimate_cost(prompt, cached, output, thoughts), datetime.now(timezone.utc))
+            for (day, site, model), (calls, errors, prompt, cached, output, thoughts, latency) in pending.items()
+        ]
+        conn = None
+        try:
+            conn = db_pool.getconn()
+            with conn.cursor() as cur:
+                execute_values(cur, UPSERT_DAILY_SQL, rows)
+            conn.commit()
+            return len(rows)
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            # Put the deltas back so the next flush retries them
+            with self._lock:
+                for key, delta in pending.items():
+                    current = self._pending.get(key)
+                    self._pending[key] = delta if current is None else tuple(a + b for a, b in zip(current, delta))
+            if "llm_usage_daily" in str(e) and not self._table_missing_logged:
+                self._table_missing_logged = True
+                logger.warning("⚠️  llm-usage: gencom.llm_usage_daily missing - run database_migration_llm_usage.sql")
+            elif "llm_usage_daily" not in str(e):
+                logger.warning(f"⚠️  llm-usage: flush failed (will retry): {e}")
+            return 0
+        finally:
+            if conn:
+                db_pool.putconn(conn)
+
+    def _ensure_flusher(self):
+        if self.flush_interval <= 0 or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name="llm-usage-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"⚠️  llm-usage: flush loop error: {e}")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Maintenance for the monthly partitions of public.conversation_turns
+(see database_migration_partition_conversation_turns.sql)
+
+Usage:
+    python partition_maintenance.py ensure [--months-ahead 3]
+    python partition_maintenance.py status
+    python partition_maintenance.py archive --older-than-months 12 [--out-dir archive] [--drop]
+
+ensure   Creates partitions through N months ahead. Schedule it monthly (cron / Cloud Scheduler);
+         if it is missed, new turns land in conversation_turns_default and are moved into their
+         month's partition the next time it runs.
+status   Lists partitions with row counts and on-disk size.
+archive  For each monthly partition entirely older than the cutoff: exports it as gzipped CSV
+         (COPY ... TO STDOUT), verifies the exported row count, detaches it from the parent, then
+         moves it to the `archive` schema (default) or drops it (--drop). Copy the exports
+         to long-term storage (e.g. a GCS bucket) before deleting them locally.
+"""
+import argparse
+import gzip
+import os
+import re
+import sys
+from datetime import date
+from pathlib import Path
+
+import psycopg2
+from dotenv import load_dotenv
+
+PARENT_TABLE = "public.conversation_turns"
+PARTITION_PATTERN = re.compile(r"^conversation_turns_p(\d{4})(\d{2})$")
+ARCHIVE_SCHEMA = "archive"
+
+
+def get_connection():
+    load_dotenv()
+    db_connection_string = os.getenv('DB_CONNECTION_STRING')
+    if not db_connection_string:
+        print("❌ Error: DB_CONNECTION_STRING not found in .env file")
+        sys.exit(1)
+    # Strip SQLAlchemy-style prefix if present
+    if "+psycopg2://" in db_connection_string:
+        db_connection_string = db_connection_string.replace("postgresql+psycopg2://", "postgresql://")
+    conn = psycopg2.connect(db_connection_string)
+    conn.autocommit = True
+    return conn
+
+
+def list_partitions(cur):
+    """[(name, rows, size)] for every partition of conversation_turns, oldest first"""
+    cur.execute("""
+        SELECT c.relname, c.reltuples::bigint, pg_size_pretty(pg_total_relation_size(c.oid))
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """, (PARENT_TABLE,))
+    return cur.fetchall()
+
+
+def partition_month(name):
+    match = PARTITION_PATTERN.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def months_before(day, months):
+    month_index = day.year * 12 + (day.month - 1) - months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def ensure(cur, months_ahead):
+    cur.execute("SELECT public.ensure_conversation_turn_partitions(now(), %s)", (months_ahead,))
+    created = cur.fetchone()[0]
+    print(f"✅ ensure: {created} partition(s) created ({months_ahead} months ahead)")
+    cur.execute("SELECT count(*) FROM public.conversation_turns_default")
+    stragglers = cur.fetchone()[0]
+    if stragglers:
+        print(f"⚠️  ensure: {stragglers} row(s) in conversation_turns_default (no matching month partition)")
+
+
+def status(cur):
+    print(f"{'partition':<36}{'rows (est.)':>14}{'size':>12}")
+    for name, rows, size in list_partitions(cur):
+        print(f"{name:<36}{rows:>14,}{size:>12}")
+
+
+def archive(cur, older_than_months, out_dir, drop):
+    cutoff = months_before(date.today().replace(day=1), older_than_months)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    print(f"🗄️  archive: partitions before {cutoff.isoformat()} -> {out_dir}/")
+
+    candidates = [name for name, _, _ in list_partitions(cur)
+                  if partition_month(name) and partition_month(name) < cutoff]
+    if not candidates:
+        print("ℹ️  archive: nothing to archive")
+        return
+
+    if not drop:
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+
+    for name in candidates:
+        export_path = out_dir / f"{name}.csv.gz"
+        with gzip.open(export_path, "wt", encoding="utf-8", newline="") as f:
+            cur.copy_expert(f"COPY (SELECT * FROM public.{name}) TO STDOUT WITH (FORMAT csv, HEADER true)", f)
+        exported = cur.rowcount
+        cur.execute(f"SELECT count(*) FROM public.{name}")
+        expected = cur.fetchone()[0]
+        if exported != expected:
+            print(f"❌ archive: {name} exported {exported} of {expected} rows - left attached")
+            continue
+
+        cur.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION public.{name}")
+        if drop:
+            cur.execute(f"DROP TABLE public.{name}")
+            print(f"✅ archive: {name} ({expected:,} rows) exported to {export_path} and dropped")
+        else:
+            cur.execute(f"ALTER TABLE public.{name} SET SCHEMA {ARCHIVE_SCHEMA}")
+            print(f"✅ archive: {name} ({expected:,} rows) exported to {export_path}, moved to {ARCHIVE_SCHEMA}.{name}")
+
+    # Archived calls no longer count as having turns (database_migration_add_latest_conversation.sql)
+    cur.execute("SELECT to_regprocedure('public.refresh_user_latest_conversation()') IS NOT NULL")
+    if cur.fetchone()[0]:
+        cur.execute("SELECT public.refresh_user_latest_conversation()")
+        print(f"✅ archive: latest-conversation pointer rebuilt ({cur.fetchone()[0]} users)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain conversation_turns monthly partitions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_ensure = sub.add_parser("ensure", help="create upcoming monthly partitions")
+    p_ensure.add_argument("--months-ahead", type=int, default=3)
+    sub.add_parser("status", help="list partitions")
+    p_archive = sub.add_parser("archive", help="export and detach old partitions")
+    p_archive.add_argument("--older-than-months", type=int, default=12)
+    p_archive.add_argument("--out-dir", default="archive")
+    p_archive.add_argument("--drop", action="store_true", help="drop detached partitions instead of moving them")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", (PARENT_TABLE,))
+            if cur.fetchone()[0] != 'p':
+                print("❌ conversation_turns is not partitioned - run "
+                      "database_migration_partition_conversation_turns.sql first")
+                sys.exit(1)
+            if args.command == "ensure":
+                ensure(cur, args.months_ahead)
+            elif args.command == "status":
+                status(cur)
+            elif args.command == "archive":
+                if args.older_than_months < 1:
+                    print("❌ --older-than-months must be at least 1")
+                    sys.exit(1)
+                archive(cur, args.older_than_months, args.out_dir, args.drop)
+    except Exception as e:
+        print(f"❌ Partition maintenance failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Prompt Templates - every LLM prompt and patient-facing text the app renders, versioned.
+
+Each PromptTemplate is parsed once at import (literal segments + field names) and rendered with
+keyword arguments; a missing field raises KeyError instead of silently producing a broken prompt.
+
+fingerprint ("basic_analysis@v1:3f2a9c...") combines the template name, its explicit version and a
+hash of its text plus the system instruction it is sent with. Analysis caches store the
+fingerprint of the template that produced them (cached_analysis*_prompt columns,
+database_migration_prompt_versions.sql) and only match rows with the current one, so editing a
+template invalidates exactly the analyses it produced. Bump `version` on any edit that changes
+meaning; the text hash also catches edits where the version was forgotten.
+
+Call sites that ask for the same thing share one template (the basic analysis is generated by the
+condition screen, the background job and the call-start greeting), so they also share one cache row.
+"""
+import hashlib
+import string
+
+
+class PromptTemplate:
+    def __init__(self, name: str, version: int, text: str, system_instruction: "PromptTemplate" = None):
+        self.name = name
+        self.version = version
+        self.text = text
+        self.system_instruction = system_instruction
+        self._segments = []
+        fields = []
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if spec or conversion:
+                raise ValueError(f"{name}: format specs are not supported in prompt templates ({field})")
+            if literal:
+                self._segments.append((True, literal))
+            if field is not None:
+                if not field.isidentifier():
+                    raise ValueError(f"{name}: field {{{field}}} must be a plain name")
+                self._segments.append((False, field))
+                fields.append(field)
+        self.fields = tuple(dict.fromkeys(fields))
+
+        digest = hashlib.sha256(f"{name}\x00{version}\x00{text}".encode("utf-8"))
+        if system_instruction:
+            digest.update(system_instruction.fingerprint.encode("utf-8"))
+        self.fingerprint = f"{name}@v{version}:{digest.hexdigest()[:12]}"
+
+    def render(self, **values) -> str:
+        missing = [f for f in self.fields if f not in values]
+        if missing:
+            raise KeyError(f"{self.name} needs {', '.join(missing)}")
+        return "".join(part if literal else str(values[part]) for literal, part in self._segments)
+
+    def __repr__(self):
+        return f"<PromptTemplate {self.fingerprint}>"
+
+
+# Shared preamble for every analysis call. It is sent as the system instruction, never inside the
+# per-call prompt, so the prefix (system instruction, then source document) is identical across
+# calls and can be served from the Gemini context cache (gemini_context_cache.py)
+COUNSELOR_SYSTEM = PromptTemplate("counselor_system", 1, """You are a professional genetic counselor providing educational information about genetic test results.
+
+Important guidelines:
+- Use clear, non-technical language suitable for patients
+- Focus on actionable information
+- Include both risks and positive steps they can take
+- Be compassionate and supportive in tone
+- Provide specific, evidence-based information
+- When reference material from ClinVar or MedlinePlus is provided, base facts on it and do not contradict it
+- Base risk level on the classification: Pathogenic/Likely Pathogenic = High, VUS = Moderate, Benign/Likely Benign = Low""")
+
+CONTEXT_DOCUMENT = PromptTemplate("context_document", 1, """Reference material (scraped from ClinVar and MedlinePlus for this patient's variant):
+
+{document}""")
+
+_VARIANT_BLOCK = """Given the following genetic information:
+- Gene: {gene}
+- Variant/Mutation: {mutation}
+- Classification: {classification}
+"""
+
+_LISTS_SCHEMA = """  "implications": [
+    "First health implication",
+    "Second health implication",
+    "Third health implication",
+    "Fourth health implication"
+  ],
+  "recommendations": [
+    "First recommended action",
+    "Second recommended action",
+    "Third recommended action",
+    "Fourth recommended action"
+  ],
+  "resources": [
+    "First educational resource name",
+    "Second educational resource name",
+    "Third educational resource name",
+    "Fourth educational resource name"
+  ]"""
+
+_JSON_ONLY = "CRITICAL: Respond ONLY with the JSON object, no additional text."
+
+# PART 1: fast response - only condition, risk, description
+BASIC_ANALYSIS = PromptTemplate("basic_analysis", 1, _VARIANT_BLOCK + """
+Please provide a BRIEF initial analysis in the following JSON format:
+
+{{
+  "condition": "Primary condition name associated with this gene variant",
+  "riskLevel": "High/Moderate/Low",
+  "description": "A clear, patient-friendly 2-3 sentence description of what this variant means"
+}}
+
+""" + _JSON_ONLY, system_instruction=COUNSELOR_SYSTEM)
+
+# PART 2: implications, recommendations, resources
+DETAILED_ANALYSIS = PromptTemplate("detailed_analysis", 1, _VARIANT_BLOCK + """
+Please provide DETAILED guidance in the following JSON format:
+
+{{
+""" + _LISTS_SCHEMA + """
+}}
+
+""" + _JSON_ONLY, system_instruction=COUNSELOR_SYSTEM)
+
+# Single-call analysis for the legacy /condition-analysis/<user_id> endpoint
+FULL_ANALYSIS = PromptTemplate("full_analysis", 1, _VARIANT_BLOCK + """
+Please provide a comprehensive analysis in the following JSON format:
+
+{{
+  "condition": "Primary condition name associated with this gene variant",
+  "riskLevel": "High/Moderate/Low",
+  "description": "A clear, patient-friendly 2-3 sentence description of what this variant means",
+""" + _LISTS_SCHEMA + """
+}}
+
+""" + _JSON_ONLY, system_instruction=COUNSELOR_SYSTEM)
+
+# Follow-up when an analysis answer parsed but lacked fields (llm_json.repair_prompt); asks only for those
+REPAIR_ANALYSIS = PromptTemplate("repair_analysis", 1, """Genetic information:
+- Gene: {gene}
+- Variant/Mutation: {mutation}
+- Classification: {classification}
+
+This part of the analysis is already written:
+{partial}
+
+Provide ONLY the missing fields, consistent with it, in the following JSON format:
+
+{fields}
+
+""" + _JSON_ONLY, system_instruction=COUNSELOR_SYSTEM)
+
+# Patient context handed to the Tavus/Vapi counselor at call start
+GENETIC_CONTEXT = PromptTemplate("genetic_context", 1, """Patient Genetic Information:
+- Gene: {gene}
+- Variant/Mutation: {mutation}
+- Classification: {classification}
+- Condition: {condition}
+- Description: {description}
+
+Please use this information to provide personalized genetic counseling to the patient.""")
+
+CONTINUATION_NOTE = PromptTemplate("continuation_note", 1, """
+
+IMPORTANT: This is a continuation of a previous conversation (ID: {conversation_id}). Please reference and build upon the previous discussion context when appropriate.""")
+
+# Opening line the Tavus/Vapi counselor speaks
+GREETING = PromptTemplate("greeting", 1, "Hi, I understand you're here to discuss the results of your genetic testing. I can see you have results for the {gene} gene — specifically the {mutation} variant. {description} I know these kinds of results can bring up a lot of questions or uncertainties, and I'm here to help you understand them fully. Please feel free to ask anything or share any concerns you have.")
+
+# Vapi opening line when there is no analysis (or no user) to personalise it with
+GENERIC_GREETING = PromptTemplate("generic_greeting", 1, "Hi, I'm here to help you understand your genetic testing results. Please feel free to ask any questions or share any concerns you have.")
+
+TEMPLATES = (COUNSELOR_SYSTEM, CONTEXT_DOCUMENT, BASIC_ANALYSIS, DETAILED_ANALYSIS, FULL_ANALYSIS, REPAIR_ANALYSIS,
+             GENETIC_CONTEXT, CONTINUATION_NOTE, GREETING, GENERIC_GREETING)
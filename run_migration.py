@@ -1,55 +1,164 @@
 #!/usr/bin/env python3
 """
-Run database migration to add cache columns to gencom.base_information table
+Run a database migration script
+
+Usage:
+    python run_migration.py                                         # cache columns (database_migration_add_cache.sql)
+    python run_migration.py database_migration_add_query_indexes.sql
+
+Statements are executed one at a time in autocommit mode, so scripts may use
+CREATE INDEX CONCURRENTLY (which cannot run inside a transaction block).
+A statement preceded by a `-- only-if: <query>` comment line runs only when the
+query returns true (CONCURRENTLY cannot be made conditional inside a DO block).
 """
 import os
+import sys
 import psycopg2
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-
-DB_CONNECTION_STRING = os.getenv('DB_CONNECTION_STRING')
-
-if not DB_CONNECTION_STRING:
-    print("❌ Error: DB_CONNECTION_STRING not found in .env file")
-    exit(1)
-
-print("🔄 Running migration...")
-
-try:
-    # Read SQL file
-    with open('database_migration_add_cache.sql', 'r') as f:
-        sql_script = f.read()
-    
-    # Connect to database
-    conn = psycopg2.connect(DB_CONNECTION_STRING)
-    conn.autocommit = True
-    cur = conn.cursor()
-    
-    # Execute migration
-    cur.execute(sql_script)
-    
-    # Fetch any results
-    if cur.description:
-        result = cur.fetchone()
-        if result:
-            print(f"✅ {result[0]}")
-    
-    # Check for notices (RAISE NOTICE output)
-    for notice in conn.notices:
-        print(f"   {notice.strip()}")
-    
-    cur.close()
-    conn.close()
-    
-    print("\n✅ Migration completed successfully!")
-    print("\nNew columns added:")
-    print("   - cached_analysis_basic (TEXT)")
-    print("   - cached_analysis_detailed (TEXT)")
-    print("   - analysis_cached_at (TIMESTAMP WITH TIME ZONE)")
-    
-except Exception as e:
-    print(f"❌ Migration failed: {e}")
-    exit(1)
+DEFAULT_MIGRATION = 'database_migration_add_cache.sql'
+
+
+def split_sql_statements(sql_script):
+    """
+    Split a SQL script on top-level semicolons.
+    Semicolons inside quotes, comments and dollar-quoted bodies (DO $$ ... $$) are kept.
+    """
+    statements = []
+    current = []
+    i = 0
+    n = len(sql_script)
+    while i < n:
+        ch = sql_script[i]
+        if sql_script.startswith('--', i):
+            end = sql_script.find('\n', i)
+            end = n if end == -1 else end
+            current.append(sql_script[i:end])
+            i = end
+        elif sql_script.startswith('/*', i):
+            end = sql_script.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            current.append(sql_script[i:end])
+            i = end
+        elif ch == "'":
+            end = i + 1
+            while end < n:
+                if sql_script[end] == "'" and sql_script.startswith("''", end):
+                    end += 2
+                elif sql_script[end] == "'":
+                    break
+                else:
+                    end += 1
+            current.append(sql_script[i:end + 1])
+            i = end + 1
+        elif ch == '$':
+            tag_end = sql_script.find('$', i + 1)
+            tag = sql_script[i:tag_end + 1] if tag_end != -1 else ''
+            if tag and (tag == '$$' or tag[1:-1].replace('_', '').isalnum()):
+                end = sql_script.find(tag, tag_end + 1)
+                end = n if end == -1 else end + len(tag)
+                current.append(sql_script[i:end])
+                i = end
+            else:
+                current.append(ch)
+                i += 1
+        elif ch == ';':
+            statements.append(''.join(current))
+            current = []
+            i += 1
+        else:
+            current.append(ch)
+            i += 1
+    statements.append(''.join(current))
+
+    def has_code(statement):
+        lines = [line for line in statement.splitlines() if not line.strip().startswith('--')]
+        return bool(''.join(lines).strip())
+
+    return [s.strip() for s in statements if has_code(s)]
+
+
+def statement_condition(statement):
+    """The query from a `-- only-if:` line in the statement's leading comments, or None"""
+    for line in statement.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('-- only-if:'):
+            return stripped[len('-- only-if:'):].strip()
+        if stripped and not stripped.startswith('--'):
+            break
+    return None
+
+
+def execute_migration(cur, sql_script):
+    """
+    Execute a migration script statement by statement (connection must be in autocommit).
+    Returns the first column of each statement's first result row (e.g. status messages).
+    """
+    results = []
+    for statement in split_sql_statements(sql_script):
+        condition = statement_condition(statement)
+        if condition:
+            cur.execute(condition)
+            if not cur.fetchone()[0]:
+                continue
+        cur.execute(statement)
+
+        # Fetch any results
+        if cur.description:
+            result = cur.fetchone()
+            if result:
+                results.append(result[0])
+    return results
+
+
+def main():
+    # Load environment variables
+    load_dotenv()
+
+    db_connection_string = os.getenv('DB_CONNECTION_STRING')
+    if not db_connection_string:
+        print("❌ Error: DB_CONNECTION_STRING not found in .env file")
+        sys.exit(1)
+
+    # Strip SQLAlchemy-style prefix if present
+    if "+psycopg2://" in db_connection_string:
+        db_connection_string = db_connection_string.replace("postgresql+psycopg2://", "postgresql://")
+
+    migration_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MIGRATION
+    print(f"🔄 Running migration {migration_file}...")
+
+    try:
+        # Read SQL file
+        with open(migration_file, 'r') as f:
+            sql_script = f.read()
+
+        # Connect to database
+        conn = psycopg2.connect(db_connection_string)
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        # Execute migration, one statement at a time
+        for result in execute_migration(cur, sql_script):
+            print(f"✅ {result}")
+
+        # Check for notices (RAISE NOTICE output)
+        for notice in conn.notices:
+            print(f"   {notice.strip()}")
+
+        cur.close()
+        conn.close()
+
+        print("\n✅ Migration completed successfully!")
+        if migration_file == DEFAULT_MIGRATION:
+            print("\nNew columns added:")
+            print("   - cached_analysis_basic (TEXT)")
+            print("   - cached_analysis_detailed (TEXT)")
+            print("   - analysis_cached_at (TIMESTAMP WITH TIME ZONE)")
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
+
 
+if __name__ == "__main__":
+    main()
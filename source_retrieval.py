@@ -0,0 +1,252 @@
+"""
+Source Retrieval - BM25 index over the scraped source_document, for small grounded prompts.
+
+base_information.source_document is the ClinVar + MedlinePlus markdown written by the background
+scrape (genetic_web_scraper.search_all_sources), often 50-100 KB. Rather than sending it whole,
+it is split into chunks at markdown headings, indexed with BM25, and each analysis section (or
+patient question) gets only its top-k chunks.
+
+The index is built once when the document is stored and persisted next to it in
+base_information.source_index (JSONB, database_migration_source_index.sql). Chunks are stored as
+character offsets into the document, so the index adds term statistics but no second copy of
+the text. Rows written before the migration (or with a stale index version) are indexed on the
+fly; `python source_retrieval.py --backfill` writes their indexes.
+
+Usage:
+    python source_retrieval.py --backfill
+    python source_retrieval.py --user-id <uuid> --query "screening for relatives"
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+
+INDEX_VERSION = 1
+RETRIEVAL_ENABLED = os.getenv("SOURCE_RETRIEVAL_ENABLED", "true").lower() == "true"
+RETRIEVAL_TOP_K = int(os.getenv("SOURCE_RETRIEVAL_TOP_K", "4"))
+RETRIEVAL_MAX_CHARS = int(os.getenv("SOURCE_RETRIEVAL_MAX_CHARS", "6000"))  # documents this small are sent whole
+CHUNK_MAX_CHARS = 1500
+BM25_K1 = 1.2
+BM25_B = 0.75
+MIN_RELATIVE_SCORE = 0.1  # chunks scoring under this fraction of the best one are noise
+
+# Terms each analysis section is about; gene and variant are added per call (section_query)
+SECTION_QUERIES = {
+    "basic": "condition disease syndrome associated clinical significance classification pathogenic "
+             "benign uncertain risk summary description inheritance",
+    "detailed": "health implications risk cancer symptoms features management screening surveillance "
+                "recommendations treatment prevention surgery testing relatives family inheritance "
+                "resources support organizations",
+}
+SECTION_QUERIES["full"] = SECTION_QUERIES["basic"] + " " + SECTION_QUERIES["detailed"]
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can for from has have if in into is it its may more most no not
+of on or other such that the their them there these they this to was were which will with within
+you your also than then those what when where who how about after before between both each only
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._>+-][a-z0-9]+)*")
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$", re.MULTILINE)
+
+SELECT_MISSING_INDEX_SQL = '''
+    SELECT user_id, source_document
+    FROM gencom.base_information
+    WHERE source_document IS NOT NULL
+      AND (source_index IS NULL OR (source_index->>'version')::int <> %s)
+'''
+
+UPDATE_INDEX_SQL = '''
+    UPDATE gencom.base_information
+    SET source_index = %s::jsonb
+    WHERE user_id = %s AND md5(source_document) = %s
+'''
+
+
+def _stem(token: str) -> str:
+    """Light suffix stripping so "tested" / "testing" / "tests" meet; variant tokens are left alone"""
+    if len(token) <= 4 or not token.isalpha():
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    for suffix in ("ing", "ed", "s"):
+        if token.endswith(suffix) and not token.endswith("ss") and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> list:
+    """Lowercased, lightly stemmed word tokens; variant notation like c.68_69del stays one token"""
+    return [_stem(t) for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def document_hash(document: str) -> str:
+    return hashlib.md5(document.encode("utf-8")).hexdigest()
+
+
+def _split_long(start: int, end: int, document: str) -> list:
+    """(start, end) spans of at most ~CHUNK_MAX_CHARS, cut at paragraph breaks"""
+    spans = []
+    while end - start > CHUNK_MAX_CHARS:
+        cut = document.rfind("\n\n", start + CHUNK_MAX_CHARS // 3, start + CHUNK_MAX_CHARS)
+        if cut == -1:
+            cut = start + CHUNK_MAX_CHARS
+        spans.append((start, cut))
+        start = cut
+    spans.append((start, end))
+    return spans
+
+
+def chunk_document(document: str) -> list:
+    """[start, end, heading path] per chunk; sections split at markdown headings, long ones at paragraphs"""
+    headings = list(_HEADING_RE.finditer(document))
+    boundaries = [(0, [])]
+    path = []
+    for match in headings:
+        level, title = len(match.group(1)), match.group(2).strip()
+        path = path[:level - 1] + [title]
+        boundaries.append((match.start(), list(path)))
+
+    chunks = []
+    for i, (start, heading_path) in enumerate(boundaries):
+        end = boundaries[i + 1][0] if i + 1 < len(boundaries) else len(document)
+        if not document[start:end].strip():
+            continue
+        for span_start, span_end in _split_long(start, end, document):
+            if document[span_start:span_end].strip():
+                chunks.append([span_start, span_end, " > ".join(heading_path)])
+    return chunks
+
+
+def build_index(document: str) -> dict:
+    """JSON-serialisable BM25 index for a document (stored in base_information.source_index)"""
+    chunks = chunk_document(document)
+    term_freqs, lengths, df = [], [], Counter()
+    for start, end, heading in chunks:
+        tokens = tokenize(heading + "\n" + document[start:end])
+        tf = Counter(tokens)
+        term_freqs.append(dict(tf))
+        lengths.append(len(tokens))
+        df.update(tf.keys())
+    return {
+        "version": INDEX_VERSION,
+        "doc_hash": document_hash(document),
+        "chunks": chunks,
+        "tf": term_freqs,
+        "lengths": lengths,
+        "df": dict(df),
+    }
+
+
+def ensure_index(document: str, index: dict | None) -> dict:
+    """The stored index when it matches the document, otherwise a freshly built one"""
+    if (index and index.get("version") == INDEX_VERSION
+            and index.get("doc_hash") == document_hash(document)):
+        return index
+    return build_index(document)
+
+
+def search(index: dict, query: str, k: int = RETRIEVAL_TOP_K) -> list:
+    """(score, chunk number) for the k best chunks by BM25, best first"""
+    terms = set(tokenize(query))
+    n = len(index["chunks"])
+    if not terms or not n:
+        return []
+    avgdl = sum(index["lengths"]) / n or 1.0
+    idf = {t: math.log(1 + (n - index["df"].get(t, 0) + 0.5) / (index["df"].get(t, 0) + 0.5))
+           for t in terms if t in index["df"]}
+    scored = []
+    for i, tf in enumerate(index["tf"]):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * index["lengths"][i] / avgdl)
+        score = sum(w * tf[t] * (BM25_K1 + 1) / (tf[t] + norm) for t, w in idf.items() if t in tf)
+        if score > 0:
+            scored.append((score, i))
+    scored.sort(reverse=True)
+    return [(score, i) for score, i in scored[:k] if score >= scored[0][0] * MIN_RELATIVE_SCORE]
+
+
+def section_query(section: str, gene: str = "", mutation: str = "") -> str:
+    return f"{gene} {mutation} {SECTION_QUERIES.get(section, SECTION_QUERIES['full'])}"
+
+
+def select_context(document: str, index: dict | None, queries: list, k: int = RETRIEVAL_TOP_K,
+                   max_chars: int = RETRIEVAL_MAX_CHARS) -> str:
+    """
+    The parts of the document relevant to the queries, in document order with their headings.
+    Short documents (<= max_chars) are returned whole; the result is capped at max_chars.
+    """
+    if len(document) <= max_chars:
+        return document
+    index = ensure_index(document, index)
+    chosen = {}
+    for query in queries:
+        for score, i in search(index, query, k):
+            chosen[i] = max(score, chosen.get(i, 0.0))
+
+    # Best chunks first until the budget is spent, then print them in document order
+    budget, keep = max_chars, []
+    for i in sorted(chosen, key=chosen.get, reverse=True):
+        start, end, _ = index["chunks"][i]
+        if end - start > budget:
+            continue
+        keep.append(i)
+        budget -= end - start
+    parts = []
+    for i in sorted(keep):
+        start, end, heading = index["chunks"][i]
+        text = document[start:end].strip()
+        if heading and not text.startswith("#"):
+            text = f"[{heading}]\n{text}"
+        parts.append(text)
+    return "\n\n---\n\n".join(parts)
+
+
+def backfill(conn) -> int:
+    """Write indexes for stored documents that have none (or an old version); returns rows updated"""
+    with conn.cursor() as cur:
+        cur.execute(SELECT_MISSING_INDEX_SQL, (INDEX_VERSION,))
+        rows = cur.fetchall()
+    for user_id, document in rows:
+        with conn.cursor() as cur:
+            cur.execute(UPDATE_INDEX_SQL, (json.dumps(build_index(document)), user_id, document_hash(document)))
+        conn.commit()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query source_document BM25 indexes")
+    parser.add_argument("--backfill", action="store_true", help="index every stored document that has no index")
+    parser.add_argument("--user-id", help="show retrieval for this user's document")
+    parser.add_argument("--query", help="free-text query (default: the basic + detailed section queries)")
+    parser.add_argument("--k", type=int, default=RETRIEVAL_TOP_K)
+    args = parser.parse_args()
+
+    import psycopg2
+    conn = psycopg2.connect(os.environ["DB_CONNECTION_STRING"])
+    try:
+        if args.backfill:
+            print(f"✅ Indexed {backfill(conn)} source documents")
+        if args.user_id:
+            with conn.cursor() as cur:
+                cur.execute("SELECT source_document, source_index FROM gencom.base_information WHERE user_id = %s",
+                            (args.user_id,))
+                row = cur.fetchone()
+            if not row or not row[0]:
+                raise SystemExit("❌ No source document for that user")
+            document, index = row[0], ensure_index(row[0], row[1])
+            queries = [args.query] if args.query else [section_query("basic"), section_query("detailed")]
+            print(f"{len(document)} chars, {len(index['chunks'])} chunks")
+            for query in queries:
+                print(f"\n🔎 {query[:80]}")
+                for score, i in search(index, query, args.k):
+                    start, end, heading = index["chunks"][i]
+                    print(f"  {score:6.2f}  #{i:<3} {end - start:>5} chars  {heading[:70]}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -287,32 +287,30 @@ const QAScreen = () => {
     console.log("[Feedback] Starting save process for", Object.keys(feedbackChanges).length, "items");
     
     try {
-      // Save each feedback change and check for success
-      const results = await Promise.all(
-        Object.values(feedbackChanges).map(async (feedback) => {
-          console.log(`[Feedback] 📡 Sending turn ${feedback.conversation_id}-${feedback.ordinal}:`, feedback);
-          const response = await fetch(`${backendBase}/conversations/turn-feedback`, {
-            method: 'POST',
-            headers: {
-              'Authorization': `Bearer ${token}`,
-              'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-              conversation_id: feedback.conversation_id,
-              ordinal: feedback.ordinal,
-              feedback_status: feedback.status,
-              feedback: feedback.text,
-            }),
-          });
+      // Save all feedback changes in one request (saved entirely or not at all)
+      const items = Object.values(feedbackChanges).map((feedback) => ({
+        conversation_id: feedback.conversation_id,
+        ordinal: feedback.ordinal,
+        feedback_status: feedback.status,
+        feedback: feedback.text,
+      }));
+      console.log(`[Feedback] 📡 Sending ${items.length} turn(s):`, items);
+      const response = await fetch(`${backendBase}/conversations/turn-feedback/batch`, {
+        method: 'POST',
+        headers: {
+          'Authorization': `Bearer ${token}`,
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ items }),
+      });
 
-          if (!response.ok) {
-            const errorText = await response.text();
-            console.error(`[Feedback] ❌ Server rejected turn ${feedback.conversation_id}-${feedback.ordinal}:`, errorText);
-            throw new Error(`Failed to save: ${errorText}`);
-          }
-          return response.json();
-        })
-      );
+      if (!response.ok) {
+        const errorText = await response.text();
+        console.error("[Feedback] ❌ Server rejected feedback batch:", errorText);
+        throw new Error(`Failed to save: ${errorText}`);
+      }
+      const result = await response.json();
+      const results = result.turns;
 
       console.log("[Feedback] ✅ All items saved successfully:", results);
       
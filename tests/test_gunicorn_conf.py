@@ -0,0 +1,123 @@
+"""
+Pool sizing in gunicorn.conf.py: DB_POOL_MAXCONN per worker for each worker class,
+the DB_MAX_CONNECTIONS cap (default 80) and an explicit DB_POOL_MAXCONN.
+
+    python -m pytest tests/test_gunicorn_conf.py
+"""
+import importlib.util
+import os
+from pathlib import Path
+
+import pytest
+
+CONF_PATH = Path(__file__).resolve().parent.parent / "gunicorn.conf.py"
+SIZING_ENV = ("GUNICORN_WORKER_CLASS", "WEB_CONCURRENCY", "GUNICORN_THREADS", "GUNICORN_WORKER_CONNECTIONS",
+              "DB_POOL_HEADROOM", "DB_MAX_CONNECTIONS", "DB_POOL_MAXCONN")
+
+
+@pytest.fixture
+def load_conf(monkeypatch):
+    """Import gunicorn.conf.py afresh with only the given sizing variables set"""
+    for name in SIZING_ENV:
+        # set before deleting so monkeypatch also undoes the DB_POOL_MAXCONN the config fills in
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+
+    def load(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        spec = importlib.util.spec_from_file_location("gunicorn_conf_under_test", CONF_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    return load
+
+
+@pytest.mark.parametrize("worker_class, env, in_flight, maxconn", [
+    ("gthread", {"GUNICORN_THREADS": 8}, 8, 10),
+    ("uvicorn", {"GUNICORN_THREADS": 4}, 4, 6),
+    ("gevent", {"GUNICORN_WORKER_CONNECTIONS": 30}, 30, 32),
+    ("sync", {"GUNICORN_THREADS": 8}, 1, 3),
+])
+def test_pool_sized_from_worker_class(load_conf, worker_class, env, in_flight, maxconn):
+    conf = load_conf(GUNICORN_WORKER_CLASS=worker_class, WEB_CONCURRENCY=2, **env)
+    assert conf.requests_per_worker() == in_flight
+    assert conf.db_pool_maxconn() == maxconn
+    assert os.environ["DB_POOL_MAXCONN"] == str(maxconn)
+
+
+def test_defaults(load_conf):
+    conf = load_conf()
+    assert conf.worker_class == "gthread"
+    assert (conf.workers, conf.threads) == (2, 8)
+    assert os.environ["DB_POOL_MAXCONN"] == "10"
+
+
+def test_threads_only_apply_to_threaded_workers(load_conf):
+    conf = load_conf(GUNICORN_WORKER_CLASS="gevent", GUNICORN_THREADS=8)
+    assert conf.threads == 1
+    assert conf.requests_per_worker() == 100
+
+
+def test_headroom(load_conf):
+    conf = load_conf(GUNICORN_WORKER_CLASS="gthread", GUNICORN_THREADS=8, DB_POOL_HEADROOM=0)
+    assert conf.db_pool_maxconn() == 8
+
+
+@pytest.mark.parametrize("worker_class, workers, budget, maxconn", [
+    ("gevent", 4, 20, 5),     # 102 per worker, capped at 20 // 4
+    ("gthread", 3, 100, 10),  # the cap does not bind: 8 threads + 2 headroom
+    ("gthread", 3, 31, 10),   # exactly enough: 31 // 3 = 10
+    ("gthread", 4, 30, 7),
+    ("sync", 8, 4, 1),        # never below one connection per worker
+])
+def test_db_max_connections_caps_the_instance_total(load_conf, worker_class, workers, budget, maxconn):
+    conf = load_conf(GUNICORN_WORKER_CLASS=worker_class, WEB_CONCURRENCY=workers, DB_MAX_CONNECTIONS=budget)
+    assert conf.db_pool_maxconn() == maxconn
+    assert os.environ["DB_POOL_MAXCONN"] == str(maxconn)
+
+
+def test_default_cap_keeps_gevent_inside_stock_postgres(load_conf):
+    # 2 workers x (100 greenlets + 2) would need 204 connections; max_connections is 100 by default
+    conf = load_conf(GUNICORN_WORKER_CLASS="gevent")
+    assert conf.db_pool_maxconn() == 40
+
+
+def test_zero_cap_disables_it(load_conf):
+    conf = load_conf(GUNICORN_WORKER_CLASS="gevent", DB_MAX_CONNECTIONS=0)
+    assert conf.db_pool_maxconn() == 102
+
+
+class _Log:
+    def __init__(self):
+        self.warnings = []
+
+    def info(self, *args):
+        pass
+
+    def warning(self, message, *args):
+        self.warnings.append(message % args)
+
+
+@pytest.mark.parametrize("env, warned", [
+    ({"GUNICORN_WORKER_CLASS": "gevent"}, True),
+    ({"GUNICORN_WORKER_CLASS": "gthread"}, False),
+    ({"GUNICORN_WORKER_CLASS": "gthread", "DB_POOL_MAXCONN": 4}, True),
+])
+def test_when_ready_warns_when_the_pool_is_capped(load_conf, env, warned):
+    conf = load_conf(**env)
+    server = type("Server", (), {"log": _Log()})()
+    conf.when_ready(server)
+    assert bool(server.log.warnings) == warned
+
+
+def test_explicit_db_pool_maxconn_wins(load_conf):
+    conf = load_conf(GUNICORN_WORKER_CLASS="gevent", DB_MAX_CONNECTIONS=20, DB_POOL_MAXCONN=7)
+    assert conf.db_pool_maxconn() == 10  # what the config would have chosen
+    assert os.environ["DB_POOL_MAXCONN"] == "7"
+
+
+def test_unknown_worker_class(load_conf):
+    with pytest.raises(ValueError, match="GUNICORN_WORKER_CLASS"):
+        load_conf(GUNICORN_WORKER_CLASS="eventlet")
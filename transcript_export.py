@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Bulk export of conversation transcripts and feedback (QA review, model evaluation)
+
+Rows are produced by Postgres with COPY ... TO STDOUT and written out as they arrive,
+so memory stays constant no matter how many turns are exported. Used by the
+GET /conversations/export endpoint in app.py and as a CLI:
+
+    python transcript_export.py --email someone@example.com [--format ndjson] [--out turns.ndjson]
+    python transcript_export.py --company-id 1 --since 2026-01-01 --until 2026-02-01 --out january.csv
+
+Columns: tavus_conversation_id, conversation_id, ordinal, created_at, user_email, user_id,
+role, content (JSON), feedback, feedback_status. Turns are ordered by created_at.
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+import psycopg2
+from dotenv import load_dotenv
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+# Same joins as database_scripts/Conversation_Turns.sql; the CT.created_at range lets a
+# partitioned conversation_turns prune months outside the export window
+EXPORT_SQL = """
+    SELECT
+        C.tavus_conversation_id,
+        C.id AS conversation_id,
+        CT.ordinal,
+        CT.created_at,
+        U.user_email,
+        CU.user_id,
+        CT.role,
+        CT.content,
+        CT.feedback,
+        CT.feedback_status
+    FROM public.conversations_users CU
+    INNER JOIN public.users U ON CU.user_id = U.id
+    INNER JOIN public.conversations C ON C.tavus_conversation_id = CU.tavus_conversation_id
+    INNER JOIN public.conversation_turns CT ON CT.conversation_id = C.id
+    WHERE {scope_filter}
+      AND CT.created_at >= %(since)s
+      AND CT.created_at < %(until)s
+    ORDER BY CT.created_at, C.id, CT.ordinal
+"""
+
+SCOPE_FILTERS = {
+    "user": "CU.user_id = %(user_id)s",
+    "company": "U.company_id = %(company_id)s",
+}
+
+STREAM_CHUNK_BYTES = 64 * 1024
+STREAM_QUEUE_CHUNKS = 16
+
+
+def build_copy_sql(cur, export_format: str, scope: str, params: dict) -> str:
+    """
+    COPY ... TO STDOUT statement for an export (COPY takes no bind parameters, so they
+    are inlined with cursor.mogrify).
+
+    NDJSON emits one row_to_json() per line through the CSV writer with QUOTE/DELIMITER set
+    to control bytes: JSON text never contains raw control characters, so nothing is quoted
+    or escaped (the text format would double every backslash in the JSON).
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {sorted(EXPORT_FORMATS)}")
+    if scope not in SCOPE_FILTERS:
+        raise ValueError(f"scope must be one of {sorted(SCOPE_FILTERS)}")
+
+    query = cur.mogrify(EXPORT_SQL.format(scope_filter=SCOPE_FILTERS[scope]), params).decode("utf-8")
+    if export_format == "csv":
+        return f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+    return (
+        f"COPY (SELECT row_to_json(export_row) FROM ({query}) export_row) "
+        "TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+    )
+
+
+class _QueueWriter:
+    """File-like target for copy_expert that hands fixed-size chunks to a bounded queue"""
+
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event):
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._buffer = []
+        self._buffered = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= STREAM_CHUNK_BYTES:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        chunk = b"".join(self._buffer)
+        self._buffer, self._buffered = [], 0
+        # Blocks while the client is slower than Postgres (back-pressure)
+        while True:
+            if self._cancelled.is_set():
+                raise RuntimeError("export cancelled")
+            try:
+                self._chunks.put(chunk, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+
+_DONE = object()
+
+
+def stream_copy(conn, copy_sql: str):
+    """
+    Generator of byte chunks from a COPY ... TO STDOUT statement.
+
+    copy_expert only writes to a file, so it runs on a worker thread feeding a bounded
+    queue; at most STREAM_QUEUE_CHUNKS x STREAM_CHUNK_BYTES are buffered. Closing the
+    generator early (client disconnect) cancels the COPY on the server.
+    The caller owns conn and must roll it back (or discard it) afterwards.
+    """
+    chunks = queue.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+
+    def produce():
+        try:
+            writer = _QueueWriter(chunks, cancelled)
+            with conn.cursor() as cur:
+                cur.copy_expert(copy_sql, writer, size=STREAM_CHUNK_BYTES)
+            writer.flush()
+            chunks.put(_DONE)
+        except Exception as e:
+            if not cancelled.is_set():
+                chunks.put(e)
+
+    producer = threading.Thread(target=produce, name="transcript-export", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        if producer.is_alive():
+            cancelled.set()
+            conn.cancel()
+            # Unblock a producer waiting on a full queue
+            while producer.is_alive():
+                try:
+                    chunks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        producer.join()
+
+
+def parse_export_date(value, default):
+    """ISO date/datetime string -> aware datetime (UTC when no offset is given)"""
+    if not value:
+        return default
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export conversation transcripts and feedback")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--email", help="export one user's transcripts")
+    target.add_argument("--company-id", type=int, help="export every user of a company")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+    parser.add_argument("--since", help="ISO date/datetime, inclusive (default: all history)")
+    parser.add_argument("--until", help="ISO date/datetime, exclusive (default: now)")
+    parser.add_argument("--out", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    db_connection_string = os.getenv('DB_CONNECTION_STRING')
+    if not db_connection_string:
+        print("❌ Error: DB_CONNECTION_STRING not found in .env file", file=sys.stderr)
+        sys.exit(1)
+    # Strip SQLAlchemy-style prefix if present
+    if "+psycopg2://" in db_connection_string:
+        db_connection_string = db_connection_string.replace("postgresql+psycopg2://", "postgresql://")
+
+    try:
+        params = {
+            "since": parse_export_date(args.since, datetime.min.replace(tzinfo=timezone.utc)),
+            "until": parse_export_date(args.until, datetime.now(timezone.utc)),
+        }
+    except ValueError as e:
+        print(f"❌ Invalid date: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    conn = psycopg2.connect(db_connection_string)
+    try:
+        with conn.cursor() as cur:
+            if args.email:
+                cur.execute("SELECT id FROM public.users WHERE user_email = %s", (args.email,))
+                row = cur.fetchone()
+                if not row:
+                    print(f"❌ No user with email {args.email}", file=sys.stderr)
+                    sys.exit(1)
+                scope, params["user_id"] = "user", row[0]
+            else:
+                scope, params["company_id"] = "company", args.company_id
+
+            copy_sql = build_copy_sql(cur, args.format, scope, params)
+            out = open(args.out, "wb") if args.out else sys.stdout.buffer
+            try:
+                # Written straight to the file as rows arrive - no thread needed here
+                cur.copy_expert(copy_sql, out, size=STREAM_CHUNK_BYTES)
+                rows = cur.rowcount
+            finally:
+                if args.out:
+                    out.close()
+        print(f"✅ Exported {rows} row(s) ({args.format}, {scope} scope)", file=sys.stderr)
+    except Exception as e:
+        print(f"❌ Export failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()